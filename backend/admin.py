@@ -250,6 +250,17 @@ class CommentAdmin(admin.ModelAdmin):
     def has_parent(self, obj):
         return '是' if obj.parent_comment else '否'
     has_parent.short_description = '是回复'
+    
+    def get_readonly_fields(self, request, obj=None):
+        # 修改父评论会使子树的物化路径失效，已发布的评论不允许修改
+        if obj is not None:
+            return self.readonly_fields + ('parent_comment', 'path', 'depth')
+        return self.readonly_fields + ('path', 'depth')
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change:
+            obj.assign_path()
 
 
 @admin.register(CommentLike)
@@ -0,0 +1,142 @@
+"""
+延迟聚合模式（settings.AGGREGATE_MODE = 'deferred'）
+
+热门AI发布时大量评分集中写入，同步模式下每次写入都要更新同一批汇总行，
+请求会在这些行上排队。延迟模式下评分写入只保存评分本身，并在 DirtyAI 表中
+把AI标记为待重算；后台worker每轮取出待重算的AI（同一AI无论被标记多少次
+都只有一行），对每个AI只重算一次全部聚合。
+
+worker 可以用 run_aggregate_worker 命令单独运行，也可以设置
+AGGREGATE_WORKER_THREAD 在Web进程内以后台线程运行。worker每轮还会检查榜单的
+贝叶斯得分是否被标记为需要重算（两种聚合模式下都会标记），全量计算只在worker中进行。
+聚合落后超过 AGGREGATE_MAX_STALENESS 秒时，下一次写入会同步重算该AI。
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .aggregates import refresh_rating_aggregates
+from .cache import bump_catalogue_version
+from .models import DirtyAI
+from .rankings import process_rank_scores
+
+
+logger = logging.getLogger(__name__)
+
+_worker_thread = None
+_worker_lock = threading.Lock()
+
+
+def aggregates_deferred():
+    """当前是否为延迟聚合模式"""
+    return settings.AGGREGATE_MODE == 'deferred'
+
+
+def defer_rating_aggregates(ai_id):
+    """
+    把AI标记为待重算，需要在评分写入的同一个事务中调用
+
+    已经标记过的AI不会重复插入；若它等待的时间已超过 AGGREGATE_MAX_STALENESS，
+    说明worker没有跟上，此时直接在当前事务中重算该AI。
+    """
+    now = timezone.now()
+    mark = DirtyAI.objects.filter(ai_id=ai_id).first()
+    if mark is None:
+        DirtyAI.objects.bulk_create([DirtyAI(ai_id=ai_id, marked_at=now)], ignore_conflicts=True)
+        ensure_worker_thread()
+    elif now - mark.marked_at > timedelta(seconds=settings.AGGREGATE_MAX_STALENESS):
+        process_dirty_ais(ai_ids=[ai_id])
+
+
+def process_dirty_ais(limit=None, min_delay=None, ai_ids=None):
+    """
+    重算一批待重算的AI（worker的一轮），返回重算的AI数量
+
+    按标记时间从早到晚最多取 limit 个（默认 AGGREGATE_BATCH_SIZE），只处理标记已超过
+    min_delay 秒（默认 AGGREGATE_MIN_DELAY）的AI；ai_ids 不为None时只处理指定AI。
+    先删除标记再从评分表重算，重算期间新写入的评分会重新标记，留到下一轮处理。
+    """
+    if limit is None:
+        limit = settings.AGGREGATE_BATCH_SIZE
+    if min_delay is None:
+        min_delay = settings.AGGREGATE_MIN_DELAY
+
+    with transaction.atomic():
+        # 多个worker同时运行时跳过其他worker已经锁定的行
+        marks = DirtyAI.objects.select_for_update(skip_locked=True).order_by('marked_at')
+        if ai_ids is not None:
+            marks = marks.filter(ai_id__in=ai_ids)
+        else:
+            cutoff = timezone.now() - timedelta(seconds=min_delay)
+            marks = marks.filter(marked_at__lte=cutoff)[:limit]
+        claimed = list(marks.values_list('ai_id', flat=True))
+        if not claimed:
+            return 0
+        DirtyAI.objects.filter(ai_id__in=claimed).delete()
+        refresh_rating_aggregates(claimed)
+        bump_catalogue_version()
+    return len(claimed)
+
+
+def queue_stats():
+    """
+    待重算队列的指标
+
+    depth 为等待重算的AI数量，oldest_age 为最早一个标记已等待的秒数（队列为空时为None）。
+    """
+    stats = DirtyAI.objects.aggregate(depth=Count('pk'), oldest=Min('marked_at'))
+    oldest = stats['oldest']
+    return {
+        'mode': settings.AGGREGATE_MODE,
+        'depth': stats['depth'],
+        'oldest_age': round((timezone.now() - oldest).total_seconds(), 3) if oldest else None,
+        'max_staleness': settings.AGGREGATE_MAX_STALENESS,
+    }
+
+
+def run_worker_loop(interval=None, stop_event=None, on_tick=None):
+    """
+    worker主循环：每隔 interval 秒处理一轮待重算的AI和榜单贝叶斯得分，直到 stop_event 被设置
+
+    on_tick(重算数量, 耗时秒数) 在每轮结束后调用，用于输出指标。单轮出错只记录日志，不退出。
+    """
+    if interval is None:
+        interval = settings.AGGREGATE_WORKER_INTERVAL
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        started = time.perf_counter()
+        try:
+            processed = process_dirty_ais()
+        except Exception:
+            logger.exception('聚合重算失败')
+            processed = 0
+        try:
+            process_rank_scores()
+        except Exception:
+            logger.exception('贝叶斯得分计算失败')
+        finally:
+            close_old_connections()
+        elapsed = time.perf_counter() - started
+        if on_tick:
+            on_tick(processed, elapsed)
+        # 本轮处理满一批时说明还有积压，立即进入下一轮
+        if processed < settings.AGGREGATE_BATCH_SIZE:
+            stop_event.wait(max(0, interval - elapsed))
+
+
+def ensure_worker_thread():
+    """启用了 AGGREGATE_WORKER_THREAD 时，确保当前进程中有一个后台worker线程在运行"""
+    global _worker_thread
+    if not settings.AGGREGATE_WORKER_THREAD:
+        return
+    with _worker_lock:
+        if _worker_thread is not None and _worker_thread.is_alive():
+            return
+        _worker_thread = threading.Thread(target=run_worker_loop, name='aggregate-worker', daemon=True)
+        _worker_thread.start()
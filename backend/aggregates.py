@@ -0,0 +1,410 @@
+"""
+AI聚合数据的维护工具
+
+评分写入时通过 apply_rating_change 以增量方式（O(1)）更新 AIScoreSummary 和
+ScoreHistogram，rebuild_score_summaries / rebuild_score_histograms 则从 Rating 表
+整体重算，用于修复数据漂移。
+reconcile_reaction_counts 用一次分组查询校正 AIModel 上的反应计数，
+rebuild_tag_counts 从 AITag 表重建 AITagCount。
+apply_rollup_change / rebuild_monthly_rollups 维护按月汇总的评分（趋势图数据）。
+refresh_rating_aggregates 用于批量导入评分之后，对受影响的AI统一重算一次。
+recompute_ai_aggregates 用少量 GROUP BY 查询校正 AIModel 上的全部冗余字段，
+用于修复通过后台、clear_test_data 或级联删除产生的偏差。
+"""
+from django.db import transaction
+from django.db.models import Case, Count, DateField, F, Q, Sum, Value, When
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import (
+    AIModel, AIScoreSummary, AITag, AITagCount, Favorite, Rating, RatingMonthlyRollup, Reaction, ScoreHistogram,
+    SCORE_BUCKETS, SCORE_FIELDS,
+)
+from .rankings import rebuild_rankings
+
+
+def snapshot_scores(rating):
+    """取出一条评分的各维度分数，rating为None时全部视为空"""
+    return {field: getattr(rating, field, None) if rating else None for field in SCORE_FIELDS}
+
+
+def _is_rated(scores):
+    """评分记录是否至少有一个非空分数"""
+    return any(scores.get(field) is not None for field in SCORE_FIELDS)
+
+
+def apply_rating_change(ai_id, old_scores, new_scores):
+    """
+    根据评分修改前后的分数，增量更新AI的评分汇总和分数直方图，返回最新的汇总行
+
+    需要在评分写入之后、同一个事务中调用。
+    """
+    updates = {}
+    rated_delta = _is_rated(new_scores) - _is_rated(old_scores)
+    if rated_delta:
+        updates['rated_count'] = F('rated_count') + rated_delta
+    for field in SCORE_FIELDS:
+        old = old_scores.get(field)
+        new = new_scores.get(field)
+        sum_delta = (new or 0) - (old or 0)
+        count_delta = (new is not None) - (old is not None)
+        if sum_delta:
+            updates[f'{field}_sum'] = F(f'{field}_sum') + sum_delta
+        if count_delta:
+            updates[f'{field}_count'] = F(f'{field}_count') + count_delta
+
+    if updates:
+        AIScoreSummary.objects.filter(ai_id=ai_id).update(**updates)
+    apply_histogram_change(ai_id, old_scores, new_scores)
+
+    summary = AIScoreSummary.objects.filter(ai_id=ai_id).first()
+    if summary is None:
+        # 汇总行不存在（新AI或尚未重建），直接从评分表计算一次
+        rebuild_score_summaries([ai_id])
+        summary = AIScoreSummary.objects.get(ai_id=ai_id)
+    return summary
+
+
+def _dimension_case(deltas):
+    """按维度取不同增量的CASE表达式，deltas 为 {维度: 增量}，其他维度为0"""
+    return Case(
+        *[When(dimension=field, then=Value(delta)) for field, delta in deltas.items()],
+        default=Value(0),
+    )
+
+
+def apply_histogram_change(ai_id, old_scores, new_scores):
+    """
+    根据评分修改前后的分数，增量更新分数直方图
+
+    每个维度最多一个分档减1、一个分档加1，全部维度合并为一条UPDATE语句；
+    0-10以外的分数不计入直方图。
+    """
+    bucket_deltas = {}
+    for field in SCORE_FIELDS:
+        old = old_scores.get(field)
+        new = new_scores.get(field)
+        if old == new:
+            continue
+        if old in SCORE_BUCKETS:
+            bucket_deltas.setdefault(old, {})[field] = -1
+        if new in SCORE_BUCKETS:
+            bucket_deltas.setdefault(new, {})[field] = 1
+    if not bucket_deltas:
+        return
+
+    dimensions = {field for deltas in bucket_deltas.values() for field in deltas}
+    ScoreHistogram.objects.bulk_create(
+        [ScoreHistogram(ai_id=ai_id, dimension=field) for field in dimensions],
+        ignore_conflicts=True,
+    )
+    ScoreHistogram.objects.filter(ai_id=ai_id, dimension__in=dimensions).update(**{
+        f'bucket_{score}': F(f'bucket_{score}') + _dimension_case(deltas)
+        for score, deltas in bucket_deltas.items()
+    })
+
+
+def rebuild_score_histograms(ai_ids=None):
+    """
+    从Rating表重建分数直方图，ai_ids为None时重建全部
+
+    只执行一次 GROUP BY ai_id 查询，返回写入的行数。
+    """
+    ratings = Rating.objects.all()
+    if ai_ids is not None:
+        ratings = ratings.filter(ai_id__in=ai_ids)
+
+    aggregates = {
+        f'{field}_{score}': Count('pk', filter=Q(**{field: score}))
+        for field in SCORE_FIELDS
+        for score in SCORE_BUCKETS
+    }
+    histograms = []
+    for row in ratings.order_by().values('ai_id').annotate(**aggregates):
+        for field in SCORE_FIELDS:
+            buckets = {f'bucket_{score}': row[f'{field}_{score}'] for score in SCORE_BUCKETS}
+            if any(buckets.values()):
+                histograms.append(ScoreHistogram(ai_id=row['ai_id'], dimension=field, **buckets))
+
+    with transaction.atomic():
+        existing = ScoreHistogram.objects.all()
+        if ai_ids is not None:
+            existing = existing.filter(ai_id__in=ai_ids)
+        existing.delete()
+        ScoreHistogram.objects.bulk_create(histograms, batch_size=500)
+    return len(histograms)
+
+
+def _summary_aggregates():
+    """构造各维度求和与计数的聚合表达式"""
+    rated = Q()
+    for field in SCORE_FIELDS:
+        rated |= Q(**{f'{field}__isnull': False})
+    aggregates = {'rated_count': Count('pk', filter=rated)}
+    for field in SCORE_FIELDS:
+        aggregates[f'{field}_sum'] = Sum(field)
+        aggregates[f'{field}_count'] = Count(field)
+    return aggregates
+
+
+def rebuild_score_summaries(ai_ids=None):
+    """
+    从Rating表重新计算评分汇总，ai_ids为None时重建全部
+
+    只执行一次 GROUP BY ai_id 查询，返回写入的汇总行数。
+    """
+    ais = AIModel.objects.all()
+    ratings = Rating.objects.all()
+    if ai_ids is not None:
+        ais = ais.filter(ai_id__in=ai_ids)
+        ratings = ratings.filter(ai_id__in=ai_ids)
+
+    rows = ratings.order_by().values('ai_id').annotate(**_summary_aggregates())
+    totals = {row.pop('ai_id'): row for row in rows}
+
+    summaries = []
+    for ai_id in ais.values_list('ai_id', flat=True):
+        row = totals.get(ai_id, {})
+        summaries.append(AIScoreSummary(
+            ai_id=ai_id,
+            **{key: value or 0 for key, value in row.items()}
+        ))
+
+    with transaction.atomic():
+        existing = AIScoreSummary.objects.all()
+        if ai_ids is not None:
+            existing = existing.filter(ai_id__in=ai_ids)
+        existing.delete()
+        AIScoreSummary.objects.bulk_create(summaries, batch_size=500)
+    return len(summaries)
+
+
+def rating_month(created_at):
+    """评分归档的月份（当月第一天），与 TruncMonth 一样按当前时区计算"""
+    return timezone.localtime(created_at).date().replace(day=1)
+
+
+def apply_rollup_change(ai_id, created_at, old_scores, new_scores):
+    """
+    根据评分修改前后的分数，增量更新评分创建月份的按月汇总
+
+    需要在评分写入之后、同一个事务中调用；最多执行两条语句。
+    """
+    sum_deltas = {}
+    count_deltas = {}
+    for field in SCORE_FIELDS:
+        old = old_scores.get(field)
+        new = new_scores.get(field)
+        sum_delta = (new or 0) - (old or 0)
+        count_delta = (new is not None) - (old is not None)
+        if sum_delta or count_delta:
+            sum_deltas[field] = sum_delta
+            count_deltas[field] = count_delta
+    if not sum_deltas:
+        return
+
+    month = rating_month(created_at)
+    RatingMonthlyRollup.objects.bulk_create(
+        [RatingMonthlyRollup(ai_id=ai_id, dimension=field, month=month) for field in sum_deltas],
+        ignore_conflicts=True,
+    )
+
+    RatingMonthlyRollup.objects.filter(ai_id=ai_id, month=month, dimension__in=sum_deltas).update(
+        score_sum=F('score_sum') + _dimension_case(sum_deltas),
+        score_count=F('score_count') + _dimension_case(count_deltas),
+    )
+
+
+def rebuild_monthly_rollups(ai_ids=None):
+    """
+    从Rating表重建按月汇总，ai_ids为None时重建全部
+
+    只执行一次 GROUP BY (ai_id, 月份) 查询，返回写入的行数。
+    """
+    ratings = Rating.objects.all()
+    if ai_ids is not None:
+        ratings = ratings.filter(ai_id__in=ai_ids)
+
+    aggregates = {}
+    for field in SCORE_FIELDS:
+        aggregates[f'{field}_sum'] = Sum(field)
+        aggregates[f'{field}_count'] = Count(field)
+    rows = ratings.order_by().annotate(
+        month=TruncMonth('created_at', output_field=DateField())
+    ).values('ai_id', 'month').annotate(**aggregates)
+
+    rollups = []
+    for row in rows:
+        for field in SCORE_FIELDS:
+            if row[f'{field}_count']:
+                rollups.append(RatingMonthlyRollup(
+                    ai_id=row['ai_id'],
+                    dimension=field,
+                    month=row['month'],
+                    score_sum=row[f'{field}_sum'],
+                    score_count=row[f'{field}_count'],
+                ))
+
+    with transaction.atomic():
+        existing = RatingMonthlyRollup.objects.all()
+        if ai_ids is not None:
+            existing = existing.filter(ai_id__in=ai_ids)
+        existing.delete()
+        RatingMonthlyRollup.objects.bulk_create(rollups, batch_size=500)
+    return len(rollups)
+
+
+def refresh_rating_aggregates(ai_ids):
+    """
+    重算一批AI的评分汇总、分数直方图、按月汇总、平均分、评分数量和排行榜得分
+
+    用于批量写入评分之后，每个受影响的AI只重算一次，返回处理的AI数量。
+    """
+    ai_ids = list(ai_ids)
+    if not ai_ids:
+        return 0
+    with transaction.atomic():
+        rebuild_score_summaries(ai_ids)
+        rebuild_score_histograms(ai_ids)
+        rebuild_monthly_rollups(ai_ids)
+        ais = []
+        for summary in AIScoreSummary.objects.filter(ai_id__in=ai_ids):
+            ais.append(AIModel(
+                ai_id=summary.ai_id,
+                avg_score=summary.avg_score(),
+                rating_count=summary.rated_count,
+            ))
+        AIModel.objects.bulk_update(ais, ['avg_score', 'rating_count'], batch_size=500)
+        # 综合榜依赖 avg_score，必须在写回平均分之后重算
+        return rebuild_rankings(ai_ids)
+
+
+# AIModel 上由写入接口维护的冗余字段
+AI_AGGREGATE_FIELDS = ['avg_score', 'rating_count', 'favorite_count', *Reaction.COUNTER_FIELDS.values()]
+
+
+def ai_ids_changed_since(since):
+    """返回 since 之后有新评分或新反应的AI ID集合（收藏没有时间字段，无法按时间筛选）"""
+    ai_ids = set(Rating.objects.filter(created_at__gte=since).order_by().values_list('ai_id', flat=True).distinct())
+    ai_ids.update(Reaction.objects.filter(created_at__gte=since).order_by().values_list('ai_id', flat=True).distinct())
+    return ai_ids
+
+
+def _expected_ai_aggregates(ai_ids=None):
+    """
+    按评分、收藏、反应表计算每个AI冗余字段的正确值，返回 {ai_id: {字段: 值}}
+
+    评分、收藏、反应各执行一次 GROUP BY ai_id 查询；没有出现在结果中的AI各项均为0。
+    """
+    ratings = Rating.objects.all()
+    favorites = Favorite.objects.all()
+    reactions = Reaction.objects.all()
+    if ai_ids is not None:
+        ratings = ratings.filter(ai_id__in=ai_ids)
+        favorites = favorites.filter(ai_id__in=ai_ids)
+        reactions = reactions.filter(ai_id__in=ai_ids)
+
+    expected = {}
+    for row in ratings.order_by().values('ai_id').annotate(**_summary_aggregates()):
+        # 用未保存的汇总对象套用与写入接口相同的平均分规则
+        summary = AIScoreSummary(**{key: value or 0 for key, value in row.items()})
+        expected.setdefault(row['ai_id'], {}).update({
+            'avg_score': summary.avg_score(),
+            'rating_count': summary.rated_count,
+        })
+    for row in favorites.order_by().values('ai_id').annotate(count=Count('pk')):
+        expected.setdefault(row['ai_id'], {})['favorite_count'] = row['count']
+    for row in reactions.order_by().values('ai_id', 'reaction_type').annotate(count=Count('pk')):
+        field = Reaction.COUNTER_FIELDS.get(row['reaction_type'])
+        if field:
+            expected.setdefault(row['ai_id'], {})[field] = row['count']
+    return expected
+
+
+def recompute_ai_aggregates(ai_ids=None, dry_run=False, batch_size=500):
+    """
+    重新计算所有（或指定）AI的冗余字段，返回差异列表 [(ai, 字段, 原值, 新值), ...]
+
+    只把有差异的AI分块 bulk_update 回数据库；dry_run 为True时只计算差异不写入。
+    非 dry_run 时同时重建这些AI的评分汇总、直方图、按月汇总、标签计数和榜单得分。
+    """
+    expected = _expected_ai_aggregates(ai_ids)
+    ais = AIModel.objects.only('ai_id', 'name', *AI_AGGREGATE_FIELDS).order_by('ai_id')
+    if ai_ids is not None:
+        ais = ais.filter(ai_id__in=ai_ids)
+
+    changes = []
+    changed_ais = []
+    for ai in ais:
+        values = expected.get(ai.ai_id, {})
+        changed = False
+        for field in AI_AGGREGATE_FIELDS:
+            old = getattr(ai, field)
+            new = values.get(field, 0)
+            if float(old or 0) != float(new):
+                changes.append((ai, field, old, new))
+                setattr(ai, field, new)
+                changed = True
+        if changed:
+            changed_ais.append(ai)
+
+    if dry_run:
+        return changes
+
+    with transaction.atomic():
+        AIModel.objects.bulk_update(changed_ais, AI_AGGREGATE_FIELDS, batch_size=batch_size)
+        rebuild_score_summaries(ai_ids)
+        rebuild_score_histograms(ai_ids)
+        rebuild_monthly_rollups(ai_ids)
+        rebuild_tag_counts(ai_ids)
+        rebuild_rankings(ai_ids)
+    return changes
+
+
+def reconcile_reaction_counts(ai_ids=None):
+    """
+    按 Reaction 表重新统计各AI的反应计数，只写回有偏差的AI
+
+    只执行一次 GROUP BY 查询，返回被修正的AI数量。
+    """
+    counter_fields = list(Reaction.COUNTER_FIELDS.values())
+    reactions = Reaction.objects.all()
+    ais = AIModel.objects.only('ai_id', *counter_fields)
+    if ai_ids is not None:
+        reactions = reactions.filter(ai_id__in=ai_ids)
+        ais = ais.filter(ai_id__in=ai_ids)
+
+    counts = {}
+    rows = reactions.order_by().values('ai_id', 'reaction_type').annotate(count=Count('pk'))
+    for row in rows:
+        field = Reaction.COUNTER_FIELDS.get(row['reaction_type'])
+        if field:
+            counts.setdefault(row['ai_id'], {})[field] = row['count']
+
+    changed = []
+    for ai in ais:
+        expected = counts.get(ai.ai_id, {})
+        if any(getattr(ai, field) != expected.get(field, 0) for field in counter_fields):
+            for field in counter_fields:
+                setattr(ai, field, expected.get(field, 0))
+            changed.append(ai)
+
+    AIModel.objects.bulk_update(changed, counter_fields, batch_size=500)
+    return len(changed)
+
+
+def rebuild_tag_counts(ai_ids=None):
+    """从AITag表重建(AI, 标签)计数，只执行一次 GROUP BY 查询，返回写入的行数"""
+    aitags = AITag.objects.all()
+    if ai_ids is not None:
+        aitags = aitags.filter(ai_id__in=ai_ids)
+    rows = aitags.order_by().values('ai_id', 'tag_id').annotate(count=Count('pk'))
+    counts = [AITagCount(ai_id=row['ai_id'], tag_id=row['tag_id'], count=row['count']) for row in rows]
+
+    with transaction.atomic():
+        existing = AITagCount.objects.all()
+        if ai_ids is not None:
+            existing = existing.filter(ai_id__in=ai_ids)
+        existing.delete()
+        AITagCount.objects.bulk_create(counts, batch_size=500)
+    return len(counts)
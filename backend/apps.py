@@ -5,3 +5,6 @@ class BackendConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'backend'
 
+    def ready(self):
+        # 注册模型信号
+        from . import signals  # noqa: F401
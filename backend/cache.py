@@ -0,0 +1,85 @@
+"""
+AI目录接口的版本化响应缓存
+
+评分、反应、标签、收藏发生变化时递增目录版本号，缓存键和ETag都由版本号和
+查询参数计算得出，因此判断 If-None-Match 不需要访问数据库；版本号一旦变化，
+旧的缓存条目自然失效。
+
+缓存后端由 settings.CACHES['api'] 决定，可以是 locmem、文件缓存或本地Redis。
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+
+CATALOGUE_VERSION_KEY = 'catalogue:version'
+
+
+def get_api_cache():
+    return caches[settings.API_CACHE_ALIAS]
+
+
+def get_catalogue_version():
+    """读取当前目录版本号，不存在时以当前时间初始化，避免被淘汰后回到旧版本号"""
+    cache = get_api_cache()
+    version = cache.get(CATALOGUE_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOGUE_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(CATALOGUE_VERSION_KEY)
+    return version
+
+
+def _incr_catalogue_version():
+    cache = get_api_cache()
+    try:
+        cache.incr(CATALOGUE_VERSION_KEY)
+    except ValueError:
+        # 版本号不存在（首次写入或已被淘汰）
+        cache.add(CATALOGUE_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def bump_catalogue_version():
+    """在当前事务提交后递增目录版本号，使AI列表缓存失效"""
+    transaction.on_commit(_incr_catalogue_version)
+
+
+def _parse_if_none_match(header):
+    return {tag.strip() for tag in header.split(',') if tag.strip()}
+
+
+class VersionedCacheMixin:
+    """
+    为列表视图提供基于目录版本号的响应缓存和强ETag
+
+    命中 If-None-Match 时直接返回304，不执行任何查询。
+    """
+    cache_namespace = None
+
+    def get_cache_fingerprint(self, request):
+        params = sorted(request.query_params.lists())
+        raw = f'{self.cache_namespace}:{get_catalogue_version()}:{params!r}'
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def list(self, request, *args, **kwargs):
+        fingerprint = self.get_cache_fingerprint(request)
+        etag = f'"{fingerprint}"'
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            tags = _parse_if_none_match(if_none_match)
+            if etag in tags or '*' in tags:
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        cache = get_api_cache()
+        cache_key = f'{self.cache_namespace}:{fingerprint}'
+        data = cache.get(cache_key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(cache_key, data, timeout=settings.API_CACHE_TIMEOUT)
+        return Response(data, headers=headers)
@@ -0,0 +1,118 @@
+"""
+评论串的读取
+
+列表接口的每条评论附带回复总数和最早的几条回复（with_reply_preview），
+单条评论的回复串按物化路径（Comment.path）做范围查询，以 path 为游标分页取出子树
+（get_comment_subtree），再由 build_comment_tree 在一次遍历中按 parent_comment_id
+组装成嵌套结构。
+图片统一用 prefetch_related('images') 批量读取，每个接口的查询数与评论数量无关。
+"""
+import base64
+
+from django.db import transaction
+from django.db.models import Count, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment
+
+
+# 评论列表中每条评论附带的回复条数
+COMMENT_REPLY_PREVIEW = 3
+# 回复串接口每页的默认和最大评论条数
+COMMENT_THREAD_PAGE_SIZE = 100
+COMMENT_THREAD_MAX_LIMIT = 500
+
+
+def with_reply_preview(queryset):
+    """
+    为评论注解回复总数，并预取每条评论最早的 COMMENT_REPLY_PREVIEW 条回复（reply_list）
+
+    回复数是按 parent_comment 索引计数的子查询，前几条回复用切片 Prefetch 一次查询取出，
+    每页的查询数固定，与评论总数无关。
+    """
+    reply_counts = Comment.objects.filter(parent_comment=OuterRef('pk')).order_by().values('parent_comment').annotate(
+        count=Count('pk')
+    ).values('count')
+    replies = Comment.objects.select_related('ai', 'user').prefetch_related('images').annotate(
+        reply_count=Coalesce(Subquery(reply_counts), 0)
+    ).order_by('created_at', 'comment_id')
+    return queryset.annotate(reply_count=Coalesce(Subquery(reply_counts), 0)).prefetch_related(
+        'images',
+        Prefetch('children', queryset=replies[:COMMENT_REPLY_PREVIEW], to_attr='reply_list'),
+    )
+
+
+def get_comment_subtree(root, limit=None, after=None):
+    """
+    按 path 顺序取出以 root 为根的评论子树的一页（含根评论），返回 (评论列表, 是否还有更多)
+
+    root 只需要加载 path 字段。按 path 排序即深度优先、同级按ID（发布先后）排列。
+    limit 为本页最多的评论条数，after 为上一页最后一条评论的 path（游标），只取其后的评论。
+    本页评论的父评论如果不在本页，一定是 after 或它的祖先，这些评论的ID直接从 after 的
+    各级路径得到并一并取出（不计入 limit），因此每一页都能组装成以 root 为根的树。
+    """
+    comments = (
+        Comment.objects.filter(root.subtree_filter())
+        .select_related('ai', 'user')
+        .prefetch_related('images')
+        .order_by('path')
+    )
+    page = comments.filter(path__gt=after) if after else comments
+    if limit is None:
+        return list(page), False
+    page = list(page[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    ancestors = []
+    if after:
+        ancestor_ids = [int(segment) for segment in after.split('/') if segment]
+        ancestors = list(comments.filter(comment_id__in=ancestor_ids))
+    return ancestors + page, has_more
+
+
+def count_comment_replies(root):
+    """root 下全部回复（整棵子树，不含自身）的数量，按 path 索引做一次范围计数"""
+    return Comment.objects.filter(root.subtree_filter()).count() - 1
+
+
+def encode_path_cursor(path):
+    return base64.urlsafe_b64encode(path.encode('ascii')).decode('ascii')
+
+
+def decode_path_cursor(cursor):
+    """解析回复串的游标，返回 path，格式不对时返回None"""
+    try:
+        path = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('ascii')
+    except (ValueError, UnicodeError):
+        return None
+    if not path.endswith('/') or not all(segment.isdigit() for segment in path[:-1].split('/')):
+        return None
+    return path
+
+
+def create_comment(ai, user, content, parent_comment=None):
+    """创建评论并在同一事务中写入物化路径和深度"""
+    with transaction.atomic():
+        comment = Comment.objects.create(ai=ai, user=user, content=content, parent_comment=parent_comment)
+        comment.assign_path()
+    return comment
+
+
+def build_comment_tree(comments, root_id):
+    """
+    把一组评论组装成以 root_id 为根的树，返回根评论（不存在时为None）
+
+    每条评论的直接回复按原顺序放入 reply_list，reply_count 为直接回复数；
+    先建 ID 索引再遍历一次，总耗时 O(n)。
+    """
+    nodes = {comment.comment_id: comment for comment in comments}
+    for comment in comments:
+        comment.reply_list = []
+    for comment in comments:
+        parent = nodes.get(comment.parent_comment_id)
+        if parent is not None and comment.comment_id != root_id:
+            parent.reply_list.append(comment)
+    for comment in comments:
+        comment.reply_count = len(comment.reply_list)
+    return nodes.get(root_id)
@@ -0,0 +1,71 @@
+"""
+对比 /api/ais/ 完整字段与精简字段（?fields=）的查询数和耗时
+用法：
+    python manage.py bench_ai_list
+    python manage.py bench_ai_list --repeat 50 --fields ai_id,name,avg_score --limit 100
+"""
+import time
+
+from django.db import connection, reset_queries
+from django.core.management.base import BaseCommand
+from django.test.utils import CaptureQueriesContext
+from rest_framework import generics
+from rest_framework.test import APIRequestFactory
+
+from backend.views import AIModelList
+
+
+class UncachedAIModelList(AIModelList):
+    """跳过目录版本化响应缓存的AI列表，每次请求都执行查询"""
+
+    def list(self, request, *args, **kwargs):
+        return generics.ListAPIView.list(self, request, *args, **kwargs)
+
+
+class Command(BaseCommand):
+    help = '对比AI列表完整字段和精简字段的查询数与耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='每种字段组合请求的次数',
+        )
+        parser.add_argument(
+            '--fields',
+            type=str,
+            default='ai_id,name,avg_score,rating_count',
+            help='精简字段组合（逗号分隔）',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=100,
+            help='每页AI数量',
+        )
+
+    def handle(self, *args, **options):
+        # 响应缓存会让第二次起的请求不执行查询，这里绕过缓存测量查询本身的开销
+        view = UncachedAIModelList.as_view()
+        factory = APIRequestFactory()
+        cases = [
+            ('完整字段', {'limit': options['limit']}),
+            ('精简字段', {'limit': options['limit'], 'fields': options['fields']}),
+        ]
+
+        for label, params in cases:
+            queries = 0
+            start = time.perf_counter()
+            for _ in range(options['repeat']):
+                request = factory.get('/api/ais/', params, HTTP_HOST='localhost')
+                reset_queries()
+                with CaptureQueriesContext(connection) as ctx:
+                    response = view(request)
+                    response.render()
+                queries = len(ctx.captured_queries)
+            elapsed = (time.perf_counter() - start) / options['repeat'] * 1000
+
+            self.stdout.write(
+                f'{label}: {queries} 条查询, 平均 {elapsed:.2f} ms, 响应 {len(response.content)} 字节'
+            )
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
-from backend.models import AITag
+from backend.cache import bump_catalogue_version
+from backend.models import AITag, AITagCount
 
 
 class Command(BaseCommand):
@@ -9,6 +10,8 @@ class Command(BaseCommand):
         count = AITag.objects.all().count()
         if count > 0:
             AITag.objects.all().delete()
+            AITagCount.objects.all().delete()
+            bump_catalogue_version()
             self.stdout.write(self.style.SUCCESS(f"成功清空 {count} 条标签关联"))
         else:
             self.stdout.write(self.style.WARNING("没有标签关联需要清空"))
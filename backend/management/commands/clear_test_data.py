@@ -6,7 +6,9 @@
     python manage.py clear_test_data --reset       # 重置整个数据库
 """
 from django.core.management.base import BaseCommand
-from backend.models import User, Rating, Comment, CommentLike, CommentImage, Favorite
+from backend.aggregates import recompute_ai_aggregates
+from backend.cache import bump_catalogue_version
+from backend.models import User, Rating, Comment, CommentLike, CommentImage, Favorite, AITag, Reaction
 
 
 class Command(BaseCommand):
@@ -96,8 +98,10 @@ class Command(BaseCommand):
             'favorites': Favorite.objects.count(),
         }
 
-        # 删除所有用户（级联删除会自动删除相关数据）
+        # 删除所有用户（级联删除会自动删除相关数据），再校正AI上的评分、收藏等计数
         User.objects.all().delete()
+        recompute_ai_aggregates()
+        bump_catalogue_version()
 
         self.stdout.write(self.style.SUCCESS(
             f'✅ 已删除所有用户数据！'
@@ -139,8 +143,12 @@ class Command(BaseCommand):
             'favorites': Favorite.objects.filter(user=user).count(),
         }
 
-        # 删除用户（级联删除会自动删除相关数据）
+        # 删除用户（级联删除会自动删除相关数据），再只校正该用户评分、收藏、标签或反应过的AI
+        ai_ids = self.affected_ai_ids(user)
         user.delete()
+        if ai_ids:
+            recompute_ai_aggregates(sorted(ai_ids))
+            bump_catalogue_version()
 
         self.stdout.write(self.style.SUCCESS(
             f'✅ 已删除用户 "{username}" 及其所有数据！'
@@ -149,3 +157,9 @@ class Command(BaseCommand):
             f'\n  - {count["favorites"]} 个收藏'
         ))
 
+    def affected_ai_ids(self, user):
+        """该用户评分、收藏、添加标签或做出反应过的AI的ID集合"""
+        ai_ids = set()
+        for model in (Rating, Favorite, AITag, Reaction):
+            ai_ids.update(model.objects.filter(user=user).order_by().values_list('ai_id', flat=True).distinct())
+        return ai_ids
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from backend.models import DirtyRankScores
+from backend.rankings import compute_rank_scores
+
+
+class Command(BaseCommand):
+    help = "批量计算所有榜单的贝叶斯得分和Wilson置信下界（建议定时执行）"
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        # 清除评分写入留下的标记，worker不必再计算一次
+        DirtyRankScores.objects.all().delete()
+        count = compute_rank_scores()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"成功更新 {count} 条排行榜得分，用时 {elapsed:.2f} 秒"))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from backend.similarity import SIMILAR_TOP_N, SIMILARITY_MEMORY_MB, compute_similar_ais
+
+
+class Command(BaseCommand):
+    help = "根据评分、收藏和反应计算每个AI最相似的AI，重建相似AI表（建议定时执行）"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-n',
+            type=int,
+            default=SIMILAR_TOP_N,
+            help=f'每个AI保存的相似AI数量（默认{SIMILAR_TOP_N}）',
+        )
+        parser.add_argument(
+            '--memory-mb',
+            type=int,
+            default=SIMILARITY_MEMORY_MB,
+            help=f'计算相似度时的内存预算，单位MB（默认{SIMILARITY_MEMORY_MB}）',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = compute_similar_ais(options['top_n'], options['memory_mb'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"成功写入 {count} 条相似AI，用时 {elapsed:.2f} 秒"))
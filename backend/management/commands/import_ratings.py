@@ -0,0 +1,52 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.rating_import import IMPORT_CHUNK_SIZE, import_ratings
+
+
+class Command(BaseCommand):
+    help = "从CSV或JSON文件批量导入评分（合作方问卷等），每个受影响的AI只重算一次聚合"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='CSV文件（表头为 user_id/username、ai_id 和评分字段）或JSON文件（对象数组）',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=IMPORT_CHUNK_SIZE,
+            help='每个事务写入的行数',
+        )
+
+    def read_rows(self, path):
+        try:
+            with open(path, encoding='utf-8-sig', newline='') as f:
+                if path.lower().endswith('.json'):
+                    rows = json.load(f)
+                    if not isinstance(rows, list):
+                        raise CommandError("JSON文件应为对象数组")
+                    return rows
+                # CSV中的空单元格视为未提供该字段
+                return [
+                    {key: value for key, value in row.items() if value != ''}
+                    for row in csv.DictReader(f)
+                ]
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"无法读取文件：{exc}")
+
+    def handle(self, *args, **options):
+        rows = self.read_rows(options['path'])
+        result = import_ratings(rows, chunk_size=max(options['chunk_size'], 1))
+
+        # CSV的第一行是表头，数据行号从2开始
+        offset = 1 if options['path'].lower().endswith('.json') else 2
+        for error in result['errors']:
+            self.stdout.write(self.style.WARNING(f"第 {error['row'] + offset} 行：{error['error']}"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"新建 {result['created']} 条评分，更新 {result['updated']} 条，"
+            f"失败 {len(result['errors'])} 条，重算 {result['ai_count']} 个AI的聚合"
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from backend.rankings import rebuild_rankings
+
+
+class Command(BaseCommand):
+    help = "重新计算所有AI的排行榜得分（例如修改了价格或榜单规则之后）"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ai-ids',
+            type=int,
+            nargs='+',
+            help='只重算指定AI的排行榜得分',
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_rankings(options['ai_ids'])
+        self.stdout.write(self.style.SUCCESS(f"成功重算 {count} 个AI的排行榜得分"))
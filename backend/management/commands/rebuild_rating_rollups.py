@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from backend.aggregates import rebuild_monthly_rollups
+
+
+class Command(BaseCommand):
+    help = "从评分表重建按月评分汇总（RatingMonthlyRollup），用于回填历史数据或修复偏差"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ai-ids',
+            type=int,
+            nargs='+',
+            help='只重建指定AI的按月汇总',
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_monthly_rollups(options['ai_ids'])
+        self.stdout.write(self.style.SUCCESS(f"成功重建 {count} 条按月评分汇总"))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from backend.aggregates import rebuild_score_histograms, rebuild_score_summaries
+from backend.cache import bump_catalogue_version
+
+
+class Command(BaseCommand):
+    help = "从评分表重建AI评分汇总（AIScoreSummary）和分数直方图（ScoreHistogram），用于修复增量维护产生的偏差"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ai-ids',
+            type=int,
+            nargs='+',
+            help='只重建指定AI的汇总和直方图',
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_score_summaries(options['ai_ids'])
+        histogram_count = rebuild_score_histograms(options['ai_ids'])
+        bump_catalogue_version()
+        self.stdout.write(self.style.SUCCESS(f"成功重建 {count} 条评分汇总、{histogram_count} 条分数直方图"))
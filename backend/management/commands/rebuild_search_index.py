@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from backend.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "从AI和评论表重建全文搜索索引（索引由触发器自动同步，仅在索引损坏或批量导入后需要执行）"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--no-optimize',
+            action='store_true',
+            help='重建后不合并索引段',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        counts = rebuild_search_index(optimize=not options['no_optimize'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"成功重建搜索索引：{counts['ai']} 个AI，{counts['comment']} 条评论，用时 {elapsed:.2f} 秒"
+        ))
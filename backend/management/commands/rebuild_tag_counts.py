@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from backend.aggregates import rebuild_tag_counts
+from backend.cache import bump_catalogue_version
+
+
+class Command(BaseCommand):
+    help = "从标签关联重建每个AI的标签计数（AITagCount）"
+
+    def handle(self, *args, **options):
+        count = rebuild_tag_counts()
+        bump_catalogue_version()
+        self.stdout.write(self.style.SUCCESS(f"成功重建 {count} 条标签计数"))
@@ -0,0 +1,75 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from backend.aggregates import ai_ids_changed_since, recompute_ai_aggregates
+from backend.cache import bump_catalogue_version
+
+
+class Command(BaseCommand):
+    help = (
+        "用 GROUP BY 查询重新计算AI的平均分、评分数量、收藏数量和反应计数，"
+        "修复通过后台、clear_test_data 或级联删除产生的偏差，并重建相关的汇总表和排行榜"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ai-ids',
+            type=int,
+            nargs='+',
+            help='只重算指定AI',
+        )
+        parser.add_argument(
+            '--since',
+            type=str,
+            help='只重算该时间（YYYY-MM-DD 或 ISO 时间）之后有新评分或新反应的AI；'
+                 '删除和收藏变化不会被筛选到，修复删除造成的偏差时请不加此参数',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只打印差异，不写入数据库',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='bulk_update 每批写入的AI数量（默认500）',
+        )
+
+    def handle(self, *args, **options):
+        ai_ids = options['ai_ids']
+        if options['since']:
+            since = self.parse_since(options['since'])
+            changed = ai_ids_changed_since(since)
+            ai_ids = sorted(changed if ai_ids is None else changed.intersection(ai_ids))
+            if not ai_ids:
+                self.stdout.write(self.style.SUCCESS('指定时间之后没有AI需要重算'))
+                return
+
+        changes = recompute_ai_aggregates(ai_ids, dry_run=options['dry_run'], batch_size=options['batch_size'])
+        for ai, field, old, new in changes:
+            self.stdout.write(f"AI {ai.ai_id}（{ai.name}）：{field} {old} -> {new}")
+
+        ai_count = len({ai.ai_id for ai, _, _, _ in changes})
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"共 {ai_count} 个AI、{len(changes)} 个字段存在偏差（未写入）"))
+            return
+        bump_catalogue_version()
+        self.stdout.write(self.style.SUCCESS(f"成功修正 {ai_count} 个AI、{len(changes)} 个字段"))
+
+    def parse_since(self, value):
+        try:
+            since = parse_datetime(value)
+            day = None if since else parse_date(value)
+        except ValueError:
+            since = day = None
+        if since is None:
+            if day is None:
+                raise CommandError(f'无法解析时间：{value}')
+            since = datetime.combine(day, time.min)
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        return since
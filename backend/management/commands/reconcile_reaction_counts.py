@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from backend.aggregates import reconcile_reaction_counts
+from backend.cache import bump_catalogue_version
+
+
+class Command(BaseCommand):
+    help = "按反应表重新统计AI的反应计数（点赞、点踩、惊叹、差评），修复计数偏差"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ai-ids',
+            type=int,
+            nargs='+',
+            help='只校正指定AI的反应计数',
+        )
+
+    def handle(self, *args, **options):
+        count = reconcile_reaction_counts(options['ai_ids'])
+        if count > 0:
+            bump_catalogue_version()
+            self.stdout.write(self.style.SUCCESS(f"已修正 {count} 个AI的反应计数"))
+        else:
+            self.stdout.write(self.style.SUCCESS("反应计数与反应表一致，无需修正"))
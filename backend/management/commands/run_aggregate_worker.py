@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from backend.aggregate_worker import process_dirty_ais, queue_stats, run_worker_loop
+from backend.rankings import process_rank_scores
+
+
+class Command(BaseCommand):
+    help = "运行聚合worker：合并待重算的AI，每轮每个AI只重算一次；并按 RANK_SCORES_INTERVAL 计算榜单贝叶斯得分"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=settings.AGGREGATE_WORKER_INTERVAL,
+            help='每轮的间隔（秒）',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='只处理一轮后退出（例如由cron定时调用）',
+        )
+
+    def report(self, processed, elapsed):
+        stats = queue_stats()
+        if not processed and not stats['depth']:
+            return
+        oldest = f"{stats['oldest_age']:.1f} 秒" if stats['oldest_age'] is not None else '-'
+        self.stdout.write(
+            f"重算 {processed} 个AI，用时 {elapsed:.2f} 秒；队列剩余 {stats['depth']} 个，最早等待 {oldest}"
+        )
+
+    def handle(self, *args, **options):
+        if settings.AGGREGATE_MODE != 'deferred':
+            self.stdout.write(self.style.WARNING("当前 AGGREGATE_MODE 不是 deferred，评分写入不会产生待重算的AI，worker只计算榜单贝叶斯得分"))
+
+        if options['once']:
+            processed = process_dirty_ais()
+            updated = process_rank_scores()
+            self.stdout.write(self.style.SUCCESS(f"成功重算 {processed} 个AI的聚合，更新 {updated or 0} 条排行榜得分"))
+            return
+
+        self.stdout.write(self.style.SUCCESS(f"聚合worker已启动，每 {options['interval']} 秒处理一轮"))
+        try:
+            run_worker_loop(interval=options['interval'], on_tick=self.report)
+        except KeyboardInterrupt:
+            self.stdout.write("聚合worker已停止")
@@ -1,6 +1,8 @@
 from django.core.management.base import BaseCommand
 
+from backend.aggregates import rebuild_score_summaries
 from backend.models import AIModel
+from backend.rankings import rebuild_rankings
 
 
 MODELS = [
@@ -304,6 +306,7 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         created = 0
+        created_ids = []
         for data in MODELS:
             obj, is_created = AIModel.objects.get_or_create(
                 name=data["name"],
@@ -319,6 +322,13 @@ class Command(BaseCommand):
                 },
             )
             created += 1 if is_created else 0
+            if is_created:
+                created_ids.append(obj.ai_id)
+
+        # 为新建的AI生成评分汇总和排行榜得分
+        if created_ids:
+            rebuild_score_summaries(created_ids)
+            rebuild_rankings(created_ids)
 
         self.stdout.write(self.style.SUCCESS(f"Seed completed. Created {created} AI models."))
 
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+SCORE_FIELDS = [
+    'overall_score',
+    'versatility_score',
+    'image_generation_score',
+    'information_query_score',
+    'study_assistance_score',
+    'value_for_money_score',
+]
+
+
+def backfill_score_summaries(apps, schema_editor):
+    """根据已有评分为每个AI生成汇总行"""
+    from django.db.models import Count, Sum
+
+    AIModel = apps.get_model('backend', 'AIModel')
+    Rating = apps.get_model('backend', 'Rating')
+    AIScoreSummary = apps.get_model('backend', 'AIScoreSummary')
+
+    aggregates = {}
+    for field in SCORE_FIELDS:
+        aggregates[f'{field}_sum'] = Sum(field)
+        aggregates[f'{field}_count'] = Count(field)
+    rows = Rating.objects.order_by().values('ai_id').annotate(**aggregates)
+    totals = {row.pop('ai_id'): row for row in rows}
+
+    AIScoreSummary.objects.bulk_create([
+        AIScoreSummary(ai_id=ai_id, **{key: value or 0 for key, value in totals.get(ai_id, {}).items()})
+        for ai_id in AIModel.objects.values_list('ai_id', flat=True)
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0008_rename_backend_re_ai_id_abc123_idx_backend_rea_ai_id_3d45e5_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AIScoreSummary',
+            fields=[
+                ('ai', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score_summary', serialize=False, to='backend.aimodel')),
+                ('overall_score_sum', models.PositiveBigIntegerField(default=0)),
+                ('overall_score_count', models.PositiveIntegerField(default=0)),
+                ('versatility_score_sum', models.PositiveBigIntegerField(default=0)),
+                ('versatility_score_count', models.PositiveIntegerField(default=0)),
+                ('image_generation_score_sum', models.PositiveBigIntegerField(default=0)),
+                ('image_generation_score_count', models.PositiveIntegerField(default=0)),
+                ('information_query_score_sum', models.PositiveBigIntegerField(default=0)),
+                ('information_query_score_count', models.PositiveIntegerField(default=0)),
+                ('study_assistance_score_sum', models.PositiveBigIntegerField(default=0)),
+                ('study_assistance_score_count', models.PositiveIntegerField(default=0)),
+                ('value_for_money_score_sum', models.PositiveBigIntegerField(default=0)),
+                ('value_for_money_score_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_score_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0009_aiscoresummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='aimodel',
+            index=models.Index(fields=['name', 'ai_id'], name='backend_aim_name_0e2dec_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='aimodel',
+            index=models.Index(fields=['rating_count', 'ai_id'], name='backend_aim_rating__64918f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='aimodel',
+            index=models.Index(fields=['avg_score', 'ai_id'], name='backend_aim_avg_sco_209118_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# 榜单ID -> 对应的评分维度，None 表示按 AIModel.avg_score 计算
+RANKING_BOARD_DIMENSIONS = {
+    'overall': None,
+    'students': 'study_assistance_score',
+    'value': 'value_for_money_score',
+    'image': 'image_generation_score',
+    'versatility': 'versatility_score',
+    'information': 'information_query_score',
+}
+
+
+def backfill_rankings(apps, schema_editor):
+    """为已有的每个AI生成各榜单的得分行，没有评分的AI得分为0"""
+    AIModel = apps.get_model('backend', 'AIModel')
+    AIScoreSummary = apps.get_model('backend', 'AIScoreSummary')
+    RankingScore = apps.get_model('backend', 'RankingScore')
+
+    summaries = {summary.ai_id: summary for summary in AIScoreSummary.objects.all()}
+    rows = []
+    for ai in AIModel.objects.all():
+        summary = summaries.get(ai.ai_id)
+        for board, dimension in RANKING_BOARD_DIMENSIONS.items():
+            if dimension is None:
+                score = float(ai.avg_score or 0)
+            else:
+                count = getattr(summary, f'{dimension}_count', 0)
+                score = round(getattr(summary, f'{dimension}_sum') / count, 1) if count else 0.0
+                if board == 'value':
+                    # 与 rankings._value_score 一致，收费工具折算为1/5
+                    score /= 1 if '免费' in (ai.price_text or '') else 5
+            rows.append(RankingScore(board=board, ai_id=ai.ai_id, score=score))
+    RankingScore.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0010_aimodel_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board', models.CharField(max_length=32)),
+                ('score', models.FloatField(default=0)),
+                ('ai', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ranking_scores', to='backend.aimodel')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['board', '-score', 'ai'], name='backend_ran_board_bbcde1_idx')],
+                'unique_together': {('board', 'ai')},
+            },
+        ),
+        migrations.RunPython(backfill_rankings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:37
+
+from django.db import migrations, models
+
+
+COUNTER_FIELDS = {
+    'thumbUp': 'reactions_thumb_up',
+    'thumbDown': 'reactions_thumb_down',
+    'amazing': 'reactions_amazing',
+    'bad': 'reactions_bad',
+}
+
+
+def backfill_reaction_counters(apps, schema_editor):
+    """用一次分组查询统计已有反应，回填到AI的计数字段"""
+    from django.db.models import Count
+
+    AIModel = apps.get_model('backend', 'AIModel')
+    Reaction = apps.get_model('backend', 'Reaction')
+
+    counts = {}
+    rows = Reaction.objects.order_by().values('ai_id', 'reaction_type').annotate(count=Count('pk'))
+    for row in rows:
+        field = COUNTER_FIELDS.get(row['reaction_type'])
+        if field:
+            counts.setdefault(row['ai_id'], {})[field] = row['count']
+
+    ais = list(AIModel.objects.filter(ai_id__in=counts.keys()))
+    for ai in ais:
+        for field, count in counts[ai.ai_id].items():
+            setattr(ai, field, count)
+    AIModel.objects.bulk_update(ais, list(COUNTER_FIELDS.values()), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0011_rankingscore'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aimodel',
+            name='reactions_amazing',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='aimodel',
+            name='reactions_bad',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='aimodel',
+            name='reactions_thumb_down',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='aimodel',
+            name='reactions_thumb_up',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_reaction_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_tag_counts(apps, schema_editor):
+    """按已有的标签关联统计每个(AI, 标签)的数量"""
+    from django.db.models import Count
+
+    AITag = apps.get_model('backend', 'AITag')
+    AITagCount = apps.get_model('backend', 'AITagCount')
+
+    rows = AITag.objects.order_by().values('ai_id', 'tag_id').annotate(count=Count('pk'))
+    AITagCount.objects.bulk_create([
+        AITagCount(ai_id=row['ai_id'], tag_id=row['tag_id'], count=row['count'])
+        for row in rows
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0012_aimodel_reaction_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AITagCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('ai', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_counts', to='backend.aimodel')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ai_counts', to='backend.tag')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ai', '-count'], name='backend_ait_ai_id_5d75ba_idx')],
+                'unique_together': {('ai', 'tag')},
+            },
+        ),
+        migrations.RunPython(backfill_tag_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:40
+
+from django.db import migrations, models
+
+
+SCORE_FIELDS = [
+    'overall_score',
+    'versatility_score',
+    'image_generation_score',
+    'information_query_score',
+    'study_assistance_score',
+    'value_for_money_score',
+]
+
+
+def backfill_rated_count(apps, schema_editor):
+    """统计每个AI至少有一个非空评分的评分记录数"""
+    from django.db.models import Count, Q
+
+    Rating = apps.get_model('backend', 'Rating')
+    AIScoreSummary = apps.get_model('backend', 'AIScoreSummary')
+
+    rated = Q()
+    for field in SCORE_FIELDS:
+        rated |= Q(**{f'{field}__isnull': False})
+    rows = Rating.objects.filter(rated).order_by().values('ai_id').annotate(count=Count('pk'))
+    for row in rows:
+        AIScoreSummary.objects.filter(ai_id=row['ai_id']).update(rated_count=row['count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0013_aitagcount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aiscoresummary',
+            name='rated_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rated_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+SCORE_FIELDS = [
+    'overall_score',
+    'versatility_score',
+    'image_generation_score',
+    'information_query_score',
+    'study_assistance_score',
+    'value_for_money_score',
+]
+
+
+def backfill_monthly_rollups(apps, schema_editor):
+    """按评分创建月份汇总已有评分"""
+    from django.db.models import Count, DateField, Sum
+    from django.db.models.functions import TruncMonth
+
+    Rating = apps.get_model('backend', 'Rating')
+    RatingMonthlyRollup = apps.get_model('backend', 'RatingMonthlyRollup')
+
+    aggregates = {}
+    for field in SCORE_FIELDS:
+        aggregates[f'{field}_sum'] = Sum(field)
+        aggregates[f'{field}_count'] = Count(field)
+    rows = Rating.objects.order_by().annotate(
+        month=TruncMonth('created_at', output_field=DateField())
+    ).values('ai_id', 'month').annotate(**aggregates)
+
+    RatingMonthlyRollup.objects.bulk_create([
+        RatingMonthlyRollup(
+            ai_id=row['ai_id'],
+            dimension=field,
+            month=row['month'],
+            score_sum=row[f'{field}_sum'],
+            score_count=row[f'{field}_count'],
+        )
+        for row in rows
+        for field in SCORE_FIELDS
+        if row[f'{field}_count']
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0014_aiscoresummary_rated_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingMonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(max_length=32)),
+                ('month', models.DateField()),
+                ('score_sum', models.PositiveBigIntegerField(default=0)),
+                ('score_count', models.PositiveIntegerField(default=0)),
+                ('ai', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_rollups', to='backend.aimodel')),
+            ],
+            options={
+                'unique_together': {('ai', 'dimension', 'month')},
+            },
+        ),
+        migrations.RunPython(backfill_monthly_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:46
+
+from django.db import migrations, models
+
+
+# 榜单ID -> 对应的评分维度
+RANKING_BOARD_DIMENSIONS = {
+    'overall': 'overall_score',
+    'students': 'study_assistance_score',
+    'value': 'value_for_money_score',
+    'image': 'image_generation_score',
+    'versatility': 'versatility_score',
+    'information': 'information_query_score',
+}
+MAX_SCORE = 10
+WILSON_Z = 1.96
+
+
+def backfill_rank_scores(apps, schema_editor):
+    """按已有评分汇总计算各榜单的贝叶斯收缩均值和Wilson置信下界，与 rankings.compute_rank_scores 相同"""
+    import numpy as np
+
+    AIScoreSummary = apps.get_model('backend', 'AIScoreSummary')
+    RankingScore = apps.get_model('backend', 'RankingScore')
+
+    summaries = {summary.ai_id: summary for summary in AIScoreSummary.objects.select_related('ai')}
+    if not summaries:
+        return
+    ai_ids = sorted(summaries)
+    free = np.array(['免费' in (summaries[ai_id].ai.price_text or '') for ai_id in ai_ids])
+    values = {}
+    for board, dimension in RANKING_BOARD_DIMENSIONS.items():
+        sums = np.array([getattr(summaries[ai_id], f'{dimension}_sum') for ai_id in ai_ids], dtype=np.float64)
+        counts = np.array([getattr(summaries[ai_id], f'{dimension}_count') for ai_id in ai_ids], dtype=np.float64)
+        rated = counts > 0
+        if not rated.any():
+            continue
+        prior_mean = sums.sum() / counts.sum()
+        prior_weight = counts[rated].mean()
+        bayes = np.where(rated, (prior_weight * prior_mean + sums) / (prior_weight + counts), 0.0)
+        n = np.where(rated, counts, 1.0)
+        p = np.clip(sums / n / MAX_SCORE, 0.0, 1.0)
+        z2 = WILSON_Z ** 2
+        lower = (p + z2 / (2 * n) - WILSON_Z * np.sqrt((p * (1 - p) + z2 / (4 * n)) / n)) / (1 + z2 / n)
+        lower = np.where(rated, lower * MAX_SCORE, 0.0)
+        if board == 'value':
+            scale = np.where(free, 1.0, 0.2)
+            bayes, lower = bayes * scale, lower * scale
+        for ai_id, b, l in zip(ai_ids, bayes.tolist(), lower.tolist()):
+            values[(board, ai_id)] = (b, l)
+
+    rows = []
+    for row in RankingScore.objects.all():
+        if (row.board, row.ai_id) in values:
+            row.bayes_score, row.lower_bound = values[(row.board, row.ai_id)]
+            rows.append(row)
+    RankingScore.objects.bulk_update(rows, ['bayes_score', 'lower_bound'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0015_ratingmonthlyrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rankingscore',
+            name='bayes_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='rankingscore',
+            name='lower_bound',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='rankingscore',
+            index=models.Index(fields=['board', '-bayes_score', 'ai'], name='backend_ran_board_8422c6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rankingscore',
+            index=models.Index(fields=['board', '-lower_bound', 'ai'], name='backend_ran_board_6d2049_idx'),
+        ),
+        migrations.RunPython(backfill_rank_scores, migrations.RunPython.noop),
+    ]
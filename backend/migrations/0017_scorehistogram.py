@@ -0,0 +1,68 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+SCORE_FIELDS = [
+    'overall_score',
+    'versatility_score',
+    'image_generation_score',
+    'information_query_score',
+    'study_assistance_score',
+    'value_for_money_score',
+]
+
+
+def backfill_histograms(apps, schema_editor):
+    """按已有评分统计每个(AI, 维度)的0-10分分档数量"""
+    from django.db.models import Count, Q
+
+    Rating = apps.get_model('backend', 'Rating')
+    ScoreHistogram = apps.get_model('backend', 'ScoreHistogram')
+
+    aggregates = {
+        f'{field}_{score}': Count('pk', filter=Q(**{field: score}))
+        for field in SCORE_FIELDS
+        for score in range(11)
+    }
+    histograms = []
+    for row in Rating.objects.order_by().values('ai_id').annotate(**aggregates):
+        for field in SCORE_FIELDS:
+            buckets = {f'bucket_{score}': row[f'{field}_{score}'] for score in range(11)}
+            if any(buckets.values()):
+                histograms.append(ScoreHistogram(ai_id=row['ai_id'], dimension=field, **buckets))
+    ScoreHistogram.objects.bulk_create(histograms, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0016_rankingscore_bayes_lower_bound'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreHistogram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(max_length=32)),
+                ('bucket_0', models.PositiveIntegerField(default=0)),
+                ('bucket_1', models.PositiveIntegerField(default=0)),
+                ('bucket_2', models.PositiveIntegerField(default=0)),
+                ('bucket_3', models.PositiveIntegerField(default=0)),
+                ('bucket_4', models.PositiveIntegerField(default=0)),
+                ('bucket_5', models.PositiveIntegerField(default=0)),
+                ('bucket_6', models.PositiveIntegerField(default=0)),
+                ('bucket_7', models.PositiveIntegerField(default=0)),
+                ('bucket_8', models.PositiveIntegerField(default=0)),
+                ('bucket_9', models.PositiveIntegerField(default=0)),
+                ('bucket_10', models.PositiveIntegerField(default=0)),
+                ('ai', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_histograms', to='backend.aimodel')),
+            ],
+            options={
+                'unique_together': {('ai', 'dimension')},
+            },
+        ),
+        migrations.RunPython(backfill_histograms, migrations.RunPython.noop),
+    ]
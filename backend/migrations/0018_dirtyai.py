@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0017_scorehistogram'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirtyAI',
+            fields=[
+                ('ai', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='dirty_mark', serialize=False, to='backend.aimodel')),
+                ('marked_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
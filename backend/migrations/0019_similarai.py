@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0018_dirtyai'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarAI',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('ai', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_ais', to='backend.aimodel')),
+                ('similar_ai', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='backend.aimodel')),
+            ],
+            options={
+                'unique_together': {('ai', 'rank')},
+            },
+        ),
+    ]
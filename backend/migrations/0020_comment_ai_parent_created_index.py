@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0019_similarai'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['ai', 'parent_comment', 'created_at'], name='backend_com_ai_id_86fa10_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:33
+
+from django.db import migrations, models
+
+
+COMMENT_PATH_WIDTH = 10
+
+
+def backfill_paths(apps, schema_editor):
+    """按 parent_comment 关系为已有评论计算物化路径和深度"""
+    Comment = apps.get_model('backend', 'Comment')
+
+    parents = dict(Comment.objects.values_list('comment_id', 'parent_comment_id'))
+    paths = {}
+
+    def resolve(comment_id):
+        # 沿父评论向上找到第一个已计算的祖先，再向下依次填充，避免递归过深
+        chain = []
+        while comment_id is not None and comment_id not in paths:
+            chain.append(comment_id)
+            comment_id = parents.get(comment_id)
+        prefix, depth = paths.get(comment_id, ('', -1))
+        for current in reversed(chain):
+            prefix += f'{current:0{COMMENT_PATH_WIDTH}d}/'
+            depth += 1
+            paths[current] = (prefix, depth)
+
+    for comment_id in parents:
+        resolve(comment_id)
+
+    comments = [Comment(comment_id=comment_id, path=path, depth=depth) for comment_id, (path, depth) in paths.items()]
+    Comment.objects.bulk_update(comments, ['path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0020_comment_ai_parent_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=1100),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations
+
+
+# (索引表, 内容表, 主键, 索引列, bm25 各列权重)
+SEARCH_TABLES = [
+    ('backend_ai_search', 'backend_aimodel', 'ai_id', ['name', 'developer', 'description'], [10.0, 5.0, 1.0]),
+    ('backend_comment_search', 'backend_comment', 'comment_id', ['content'], [1.0]),
+]
+
+
+def create_sql(table, content, pk, columns, weights):
+    """外部内容的 FTS5 trigram 索引表，以及在内容表增删改时同步索引的触发器"""
+    cols = ', '.join(columns)
+    new_values = ', '.join(f'new.{col}' for col in columns)
+    old_values = ', '.join(f'old.{col}' for col in columns)
+    insert = f'INSERT INTO {table}(rowid, {cols}) VALUES (new.{pk}, {new_values});'
+    delete = f"INSERT INTO {table}({table}, rowid, {cols}) VALUES ('delete', old.{pk}, {old_values});"
+    return [
+        f"CREATE VIRTUAL TABLE {table} USING fts5({cols}, content='{content}', content_rowid='{pk}', tokenize='trigram')",
+        f'CREATE TRIGGER {table}_ai AFTER INSERT ON {content} BEGIN {insert} END',
+        f'CREATE TRIGGER {table}_ad AFTER DELETE ON {content} BEGIN {delete} END',
+        # 只在索引列被写入时触发，点赞数、平均分等计数更新不会重建索引
+        f'CREATE TRIGGER {table}_au AFTER UPDATE OF {cols} ON {content} BEGIN {delete} {insert} END',
+        f"INSERT INTO {table}({table}, rank) VALUES ('rank', 'bm25({', '.join(map(str, weights))})')",
+        f"INSERT INTO {table}({table}) VALUES ('rebuild')",
+    ]
+
+
+def drop_sql(table, content, pk, columns, weights):
+    return [
+        f'DROP TRIGGER IF EXISTS {table}_ai',
+        f'DROP TRIGGER IF EXISTS {table}_ad',
+        f'DROP TRIGGER IF EXISTS {table}_au',
+        f'DROP TABLE IF EXISTS {table}',
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0021_comment_path_depth'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=create_sql(*spec),
+            reverse_sql=drop_sql(*spec),
+        )
+        for spec in SEARCH_TABLES
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:10
+
+from django.db import migrations
+
+
+COUNTER_FIELDS = {
+    'thumbUp': 'reactions_thumb_up',
+    'thumbDown': 'reactions_thumb_down',
+    'amazing': 'reactions_amazing',
+    'bad': 'reactions_bad',
+}
+
+
+def remove_duplicate_reactions(apps, schema_editor):
+    """同一用户对同一AI有多个反应时只保留最新的一个，并按剩余的反应重新统计受影响AI的计数"""
+    from django.db.models import Count
+
+    AIModel = apps.get_model('backend', 'AIModel')
+    Reaction = apps.get_model('backend', 'Reaction')
+
+    duplicated = Reaction.objects.order_by().values('user_id', 'ai_id').annotate(count=Count('pk')).filter(count__gt=1)
+    stale_ids = []
+    ai_ids = set()
+    for row in duplicated:
+        ids = list(
+            Reaction.objects.filter(user_id=row['user_id'], ai_id=row['ai_id'])
+            .order_by('-created_at', '-reaction_id')
+            .values_list('reaction_id', flat=True)
+        )
+        stale_ids.extend(ids[1:])
+        ai_ids.add(row['ai_id'])
+    if not stale_ids:
+        return
+    Reaction.objects.filter(reaction_id__in=stale_ids).delete()
+
+    counts = {}
+    rows = Reaction.objects.filter(ai_id__in=ai_ids).order_by().values('ai_id', 'reaction_type').annotate(count=Count('pk'))
+    for row in rows:
+        field = COUNTER_FIELDS.get(row['reaction_type'])
+        if field:
+            counts.setdefault(row['ai_id'], {})[field] = row['count']
+    ais = list(AIModel.objects.filter(ai_id__in=ai_ids))
+    for ai in ais:
+        for field in COUNTER_FIELDS.values():
+            setattr(ai, field, counts.get(ai.ai_id, {}).get(field, 0))
+    AIModel.objects.bulk_update(ais, list(COUNTER_FIELDS.values()), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0022_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_reactions, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='reaction',
+            unique_together={('user', 'ai')},
+        ),
+    ]
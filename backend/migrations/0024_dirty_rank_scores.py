@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0023_reaction_one_per_user_ai'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirtyRankScores',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('marked_at', models.DateTimeField()),
+            ],
+        ),
+    ]
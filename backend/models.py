@@ -1,4 +1,19 @@
 from django.db import models
+from django.db.models import Q
+
+
+# 参与平均分计算的评分字段（总评分 + 五个细则）
+SCORE_FIELDS = [
+    'overall_score',
+    'versatility_score',
+    'image_generation_score',
+    'information_query_score',
+    'study_assistance_score',
+    'value_for_money_score',
+]
+
+# 评分取值为0-10的整数，分数直方图每档一个计数
+SCORE_BUCKETS = range(11)
 
 
 class User(models.Model):
@@ -72,8 +87,21 @@ class AIModel(models.Model):
     avg_score = models.DecimalField(max_digits=4, decimal_places=2, default=0)
     rating_count = models.PositiveIntegerField(default=0)
     favorite_count = models.PositiveIntegerField(default=0)
+    # 各类反应的数量，由 toggle_reaction 在同一事务中原子更新
+    reactions_thumb_up = models.PositiveIntegerField(default=0)
+    reactions_thumb_down = models.PositiveIntegerField(default=0)
+    reactions_amazing = models.PositiveIntegerField(default=0)
+    reactions_bad = models.PositiveIntegerField(default=0)
     tags = models.ManyToManyField(Tag, through='AITag', related_name='ai_models')
 
+    class Meta:
+        # 列表排序和游标分页使用 (排序字段, ai_id) 组合索引
+        indexes = [
+            models.Index(fields=['name', 'ai_id']),
+            models.Index(fields=['rating_count', 'ai_id']),
+            models.Index(fields=['avg_score', 'ai_id']),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -96,6 +124,160 @@ class Rating(models.Model):
         unique_together = ('user', 'ai')
 
 
+class AIScoreSummary(models.Model):
+    """每个AI一行的评分汇总表，保存各维度的累计和与非空数量，评分写入时增量维护"""
+    ai = models.OneToOneField(AIModel, on_delete=models.CASCADE, primary_key=True, related_name='score_summary')
+    # 至少有一个非空评分的评分记录数，即 AIModel.rating_count
+    rated_count = models.PositiveIntegerField(default=0)
+    overall_score_sum = models.PositiveBigIntegerField(default=0)
+    overall_score_count = models.PositiveIntegerField(default=0)
+    versatility_score_sum = models.PositiveBigIntegerField(default=0)
+    versatility_score_count = models.PositiveIntegerField(default=0)
+    image_generation_score_sum = models.PositiveBigIntegerField(default=0)
+    image_generation_score_count = models.PositiveIntegerField(default=0)
+    information_query_score_sum = models.PositiveBigIntegerField(default=0)
+    information_query_score_count = models.PositiveIntegerField(default=0)
+    study_assistance_score_sum = models.PositiveBigIntegerField(default=0)
+    study_assistance_score_count = models.PositiveIntegerField(default=0)
+    value_for_money_score_sum = models.PositiveBigIntegerField(default=0)
+    value_for_money_score_count = models.PositiveIntegerField(default=0)
+
+    def average(self, field):
+        """返回某个评分维度的平均值，没有评分时返回None"""
+        count = getattr(self, f'{field}_count')
+        if not count:
+            return None
+        return getattr(self, f'{field}_sum') / count
+
+    def avg_score(self):
+        """
+        AI的综合平均分（保留一位小数）
+
+        有总评分时取总评分的平均值，否则取五个细则平均值的平均值，都没有时为0。
+        """
+        overall = self.average('overall_score')
+        if overall is not None:
+            return round(overall, 1)
+        details = [self.average(field) for field in SCORE_FIELDS if field != 'overall_score']
+        details = [avg for avg in details if avg is not None]
+        if details:
+            return round(sum(details) / len(details), 1)
+        return 0.0
+
+    def __str__(self):
+        return f'Score summary of {self.ai_id}'
+
+
+class ScoreHistogram(models.Model):
+    """
+    每个(AI, 维度)一行的分数直方图，bucket_N 为该维度打了N分的评分数
+
+    评分写入时由 apply_rating_change 增量维护（最多改动两个分档），
+    分布、中位数和百分位数都只由这11个数计算，不需要扫描评分表。
+    """
+    ai = models.ForeignKey(AIModel, on_delete=models.CASCADE, related_name='score_histograms')
+    dimension = models.CharField(max_length=32)
+    bucket_0 = models.PositiveIntegerField(default=0)
+    bucket_1 = models.PositiveIntegerField(default=0)
+    bucket_2 = models.PositiveIntegerField(default=0)
+    bucket_3 = models.PositiveIntegerField(default=0)
+    bucket_4 = models.PositiveIntegerField(default=0)
+    bucket_5 = models.PositiveIntegerField(default=0)
+    bucket_6 = models.PositiveIntegerField(default=0)
+    bucket_7 = models.PositiveIntegerField(default=0)
+    bucket_8 = models.PositiveIntegerField(default=0)
+    bucket_9 = models.PositiveIntegerField(default=0)
+    bucket_10 = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('ai', 'dimension')
+
+    def counts(self):
+        """返回0-10分每档的评分数"""
+        return [getattr(self, f'bucket_{score}') for score in SCORE_BUCKETS]
+
+    def percentile(self, p):
+        """返回第p百分位数（0-100，保留两位小数），与 numpy.percentile 默认的线性插值一致，没有评分时返回None"""
+        counts = self.counts()
+        total = sum(counts)
+        if not total:
+            return None
+        position = (total - 1) * p / 100
+        lower = int(position)
+        upper = min(lower + 1, total - 1)
+
+        def value_at(rank):
+            cumulative = 0
+            for score, count in zip(SCORE_BUCKETS, counts):
+                cumulative += count
+                if rank < cumulative:
+                    return score
+
+        low_value = value_at(lower)
+        return round(low_value + (value_at(upper) - low_value) * (position - lower), 2)
+
+    def median(self):
+        return self.percentile(50)
+
+    def __str__(self):
+        return f'{self.ai_id} - {self.dimension}: {self.counts()}'
+
+
+class RankingScore(models.Model):
+    """
+    排行榜得分，每个(榜单, AI)一行，评分变化时增量更新，按索引直接读取前K名
+
+    score 为原始平均分；bayes_score（贝叶斯收缩均值）和 lower_bound（Wilson置信下界）
+    由 compute_rank_scores 批量计算，评分人数很少的AI不会仅凭一两个高分排到前面。
+    """
+    board = models.CharField(max_length=32)
+    ai = models.ForeignKey(AIModel, on_delete=models.CASCADE, related_name='ranking_scores')
+    score = models.FloatField(default=0)
+    bayes_score = models.FloatField(default=0)
+    lower_bound = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ('board', 'ai')
+        indexes = [
+            models.Index(fields=['board', '-score', 'ai']),
+            models.Index(fields=['board', '-bayes_score', 'ai']),
+            models.Index(fields=['board', '-lower_bound', 'ai']),
+        ]
+
+    def __str__(self):
+        return f'{self.board} - {self.ai_id}: {self.score}'
+
+
+class RatingMonthlyRollup(models.Model):
+    """
+    按月汇总的评分，每个(AI, 维度, 月份)一行，评分写入时增量维护
+
+    月份按评分的创建时间（当前时区）归档，保存该月创建的评分在此维度上的
+    当前分数之和与非空数量，趋势接口通过 (ai, dimension, month) 唯一索引按范围读取。
+    """
+    ai = models.ForeignKey(AIModel, on_delete=models.CASCADE, related_name='monthly_rollups')
+    dimension = models.CharField(max_length=32)
+    # 当月第一天
+    month = models.DateField()
+    score_sum = models.PositiveBigIntegerField(default=0)
+    score_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('ai', 'dimension', 'month')
+
+    def __str__(self):
+        return f'{self.ai_id} - {self.dimension} - {self.month:%Y-%m}: {self.score_sum}/{self.score_count}'
+
+
+# 评论物化路径中每级ID的位数，每级以 / 结尾；回复最多嵌套 COMMENT_MAX_DEPTH 层
+COMMENT_PATH_WIDTH = 10
+COMMENT_MAX_DEPTH = 99
+
+
+def comment_path_segment(comment_id):
+    return f'{comment_id:0{COMMENT_PATH_WIDTH}d}/'
+
+
 class Comment(models.Model):
     comment_id = models.AutoField(primary_key=True)
     ai = models.ForeignKey(AIModel, on_delete=models.CASCADE, related_name='comments')
@@ -110,10 +292,34 @@ class Comment(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     upvotes = models.PositiveIntegerField(default=0)
+    # 物化路径：从顶层评论到本评论各级的ID，如 0000000012/0000000045/，顶层评论的 depth 为0
+    path = models.CharField(max_length=(COMMENT_PATH_WIDTH + 1) * (COMMENT_MAX_DEPTH + 1), blank=True, default='', db_index=True)
+    depth = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        # 按AI分页读取顶层评论（parent_comment 为空）或某条评论的回复，按 (created_at, comment_id) 排序
+        indexes = [
+            models.Index(fields=['ai', 'parent_comment', 'created_at']),
+        ]
 
     def __str__(self):
         return f'Comment {self.id} on {self.ai_id}'
 
+    def assign_path(self):
+        """根据父评论计算物化路径和深度并写入数据库，需要在评论插入（取得ID）之后调用"""
+        parent = self.parent_comment
+        self.depth = parent.depth + 1 if parent else 0
+        self.path = (parent.path if parent else '') + comment_path_segment(self.comment_id)
+        Comment.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+
+    def subtree_filter(self):
+        """
+        本评论及其全部回复的筛选条件：path 在 [本路径, 本路径去掉末尾的 / 再加 0) 区间内
+
+        '0' 紧跟在 '/' 之后，因此这是 path 索引上的一次范围查询。
+        """
+        return Q(path__gte=self.path, path__lt=self.path[:-1] + '0')
+
 
 class CommentLike(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comment_likes')
@@ -138,6 +344,22 @@ class AITag(models.Model):
         unique_together = ('ai', 'tag', 'user')
 
 
+class AITagCount(models.Model):
+    """每个(AI, 标签)被多少用户添加过，add_tag_to_ai 原子更新，列表页按页批量读取"""
+    ai = models.ForeignKey(AIModel, on_delete=models.CASCADE, related_name='tag_counts')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='ai_counts')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('ai', 'tag')
+        indexes = [
+            models.Index(fields=['ai', '-count']),
+        ]
+
+    def __str__(self):
+        return f'{self.ai_id} - {self.tag_id}: {self.count}'
+
+
 class Favorite(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='favorites')
     ai = models.ForeignKey(AIModel, on_delete=models.CASCADE, related_name='favorited_by')
@@ -154,6 +376,13 @@ class Reaction(models.Model):
         ('amazing', '惊叹'),
         ('bad', '差评'),
     ]
+    # 反应类型 -> AIModel 上对应的计数字段
+    COUNTER_FIELDS = {
+        'thumbUp': 'reactions_thumb_up',
+        'thumbDown': 'reactions_thumb_down',
+        'amazing': 'reactions_amazing',
+        'bad': 'reactions_bad',
+    }
     
     reaction_id = models.AutoField(primary_key=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reactions')
@@ -162,7 +391,8 @@ class Reaction(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        unique_together = ('user', 'ai', 'reaction_type')
+        # 每个用户对每个AI最多一个反应，切换类型时修改已有的行
+        unique_together = ('user', 'ai')
         indexes = [
             models.Index(fields=['ai', 'reaction_type']),
         ]
@@ -170,3 +400,47 @@ class Reaction(models.Model):
     def __str__(self):
         return f'{self.user.username} - {self.ai.name} - {self.reaction_type}'
 
+
+
+class DirtyAI(models.Model):
+    """
+    延迟聚合模式下等待重算的AI，每个AI最多一行
+
+    marked_at 为第一次被标记（且尚未重算）的时间，用于合并写入和计算聚合落后的时间。
+    """
+    ai = models.OneToOneField(AIModel, on_delete=models.CASCADE, primary_key=True, related_name='dirty_mark')
+    marked_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f'{self.ai_id} @ {self.marked_at}'
+
+
+class DirtyRankScores(models.Model):
+    """
+    榜单的贝叶斯得分和置信下界需要重新计算的标记，最多一行（主键固定为1）
+
+    评分写入时插入（已存在则不变），聚合worker或 compute_rank_scores 命令计算前删除。
+    marked_at 为第一次被标记（且尚未计算）的时间。
+    """
+    marked_at = models.DateTimeField()
+
+    def __str__(self):
+        return f'rank scores @ {self.marked_at}'
+
+
+class SimilarAI(models.Model):
+    """
+    与某个AI最相似的AI（按用户交互计算的余弦相似度），每个AI保存前N个
+
+    由 compute_similar_ais 离线整体重建，详情页按 (ai, rank) 索引读取。
+    """
+    ai = models.ForeignKey(AIModel, on_delete=models.CASCADE, related_name='similar_ais')
+    similar_ai = models.ForeignKey(AIModel, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ('ai', 'rank')
+
+    def __str__(self):
+        return f'{self.ai_id} #{self.rank}: {self.similar_ai_id} ({self.score:.3f})'
@@ -0,0 +1,125 @@
+"""
+基于游标（keyset）的分页
+
+按 (排序字段, 主键) 组合定位下一页，翻页代价与页码无关，
+不会像 OFFSET 分页那样随着翻页越来越慢。
+"""
+import base64
+import json
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    游标分页，默认只有请求带 limit 或 cursor 参数时才启用，否则保持返回完整列表；
+    paginate_by_default 为True时总是分页
+
+    视图需要实现 get_sort(request)，返回 (排序字段, 是否降序)。
+    """
+    paginate_by_default = False
+    default_limit = 20
+    max_limit = 100
+    limit_query_param = 'limit'
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        requested = self.limit_query_param in params or self.cursor_query_param in params
+        if not (requested or self.paginate_by_default):
+            return None
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.sort_field, self.descending = view.get_sort(request)
+        pk_name = queryset.model._meta.pk.name
+
+        cursor = params.get(self.cursor_query_param)
+        if cursor:
+            value, pk = self.decode_cursor(cursor, queryset.model)
+            lookup = 'lt' if self.descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.sort_field}__{lookup}': value}) |
+                Q(**{self.sort_field: value, f'{pk_name}__{lookup}': pk})
+            )
+
+        prefix = '-' if self.descending else ''
+        queryset = queryset.order_by(*dict.fromkeys([f'{prefix}{self.sort_field}', f'{prefix}{pk_name}']))
+
+        # 多取一条用于判断是否还有下一页
+        rows = list(queryset[:self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        rows = rows[:self.limit]
+
+        self.next_cursor = None
+        if self.has_next and rows:
+            last = rows[-1]
+            self.next_cursor = self.encode_cursor(getattr(last, self.sort_field), last.pk)
+        return rows
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get(self.limit_query_param, self.default_limit))
+        except (TypeError, ValueError):
+            return self.default_limit
+        if limit <= 0:
+            return self.default_limit
+        return min(limit, self.max_limit)
+
+    def encode_cursor(self, value, pk):
+        if isinstance(value, Decimal):
+            value = str(value)
+        elif hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        payload = json.dumps([self.sort_field, value, pk], ensure_ascii=False)
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, cursor, model):
+        """
+        解析游标，返回 (排序字段值, 主键)
+
+        游标由客户端提交，排序字段值按模型字段转换类型、主键转换为整数，
+        格式或类型不对时一律视为无效游标。
+        """
+        try:
+            payload = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+            sort_field, value, pk = json.loads(payload)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound('无效的游标')
+        if sort_field != self.sort_field:
+            raise NotFound('游标与当前排序方式不匹配')
+        if value is None or pk is None or isinstance(value, (dict, list, bool)) or isinstance(pk, (bool, float)):
+            raise NotFound('无效的游标')
+        try:
+            value = model._meta.get_field(sort_field).to_python(value)
+            pk = int(pk)
+        except (DjangoValidationError, TypeError, ValueError):
+            raise NotFound('无效的游标')
+        # 超出64位整数范围的值无法作为 SQLite 查询参数
+        if value is None or any(isinstance(v, int) and abs(v) >= 2 ** 63 for v in (value, pk)):
+            raise NotFound('无效的游标')
+        return value, pk
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next_cursor': self.next_cursor,
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+
+class AlwaysKeysetPagination(KeysetPagination):
+    """总是分页的游标分页，用于数据量随时间增长的子资源"""
+    paginate_by_default = True
@@ -0,0 +1,312 @@
+"""
+服务端排行榜
+
+每个榜单的得分保存在 RankingScore 表中，评分变化时只重算该AI在各榜单的得分并
+upsert 一行，读取时通过 (board, -score, ai) 索引直接取前K名，不需要扫描全部AI。
+
+原始平均分会让只有一个10分评价的AI排在几千人评出9.4分的AI前面，因此
+compute_rank_scores 用 NumPy 对全部AI一次性计算贝叶斯收缩均值和Wilson置信下界，
+榜单可以通过 ?order= 改为按这两列排序。先验由全站数据决定，任何评分变化都会影响
+所有AI，因此评分写入时只由 mark_rank_scores_dirty 记录一个标记，全量计算不在Web请求中进行，
+而是由聚合worker（run_aggregate_worker）合并标记后每 RANK_SCORES_INTERVAL 秒最多计算一次，
+或由 compute_rank_scores 命令定时计算。
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, Exists, IntegerField, OuterRef, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import AIModel, AIScoreSummary, DirtyRankScores, RankingScore, SCORE_FIELDS
+
+
+# 每个榜单对外提供的最大名次
+RANKING_TOP_K = 100
+
+
+def _average(summary, field):
+    if summary is None:
+        return 0.0
+    avg = summary.average(field)
+    return round(avg, 1) if avg is not None else 0.0
+
+
+def _value_score(ai, summary):
+    """性价比得分：免费工具的性价比评分按原值计，收费工具折算为1/5"""
+    value = _average(summary, 'value_for_money_score')
+    return value / (1 if '免费' in (ai.price_text or '') else 5)
+
+
+# 榜单ID -> (榜单名称, 得分计算函数)
+RANKING_BOARDS = {
+    'overall': ('综合排行榜', lambda ai, summary: float(ai.avg_score or 0)),
+    'students': ('最适合学生', lambda ai, summary: _average(summary, 'study_assistance_score')),
+    'value': ('性价比最高', _value_score),
+    'image': ('最佳图像生成', lambda ai, summary: _average(summary, 'image_generation_score')),
+    'versatility': ('最万能', lambda ai, summary: _average(summary, 'versatility_score')),
+    'information': ('最佳信息查询', lambda ai, summary: _average(summary, 'information_query_score')),
+}
+
+
+# 榜单ID -> 贝叶斯得分和置信下界使用的评分维度
+# 综合榜与原始得分（AIModel.avg_score）口径相同，没有总评分的AI改用细则评分，见 _overall_sums_and_counts
+RANKING_BOARD_DIMENSIONS = {
+    'overall': 'overall_score',
+    'students': 'study_assistance_score',
+    'value': 'value_for_money_score',
+    'image': 'image_generation_score',
+    'versatility': 'versatility_score',
+    'information': 'information_query_score',
+}
+
+# 榜单可用的排序方式 -> RankingScore 字段
+RANKING_ORDERS = {
+    'score': 'score',
+    'bayes': 'bayes_score',
+    'lower_bound': 'lower_bound',
+}
+
+# 评分满分，Wilson下界按 平均分/满分 作为比例计算
+MAX_SCORE = 10
+
+# Wilson置信下界的z值（95%置信度）
+WILSON_Z = 1.96
+
+
+def compute_board_scores(ai, summary):
+    """计算一个AI在所有榜单上的得分"""
+    return {board: compute(ai, summary) for board, (_, compute) in RANKING_BOARDS.items()}
+
+
+def update_ai_rankings(ai, summary):
+    """评分变化后更新该AI在各榜单的得分，一条 upsert 语句完成"""
+    rows = [
+        RankingScore(board=board, ai_id=ai.ai_id, score=score)
+        for board, score in compute_board_scores(ai, summary).items()
+    ]
+    RankingScore.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['board', 'ai'],
+        update_fields=['score'],
+    )
+    mark_rank_scores_dirty()
+
+
+def _board_score_rows(ai_ids=None):
+    """计算所有（或指定）AI在各榜单的原始得分，返回 (RankingScore 行列表, AI数量)"""
+    ais = AIModel.objects.select_related('score_summary')
+    if ai_ids is not None:
+        ais = ais.filter(ai_id__in=ai_ids)
+
+    rows = []
+    count = 0
+    for ai in ais:
+        try:
+            summary = ai.score_summary
+        except AIScoreSummary.DoesNotExist:
+            summary = None
+        for board, score in compute_board_scores(ai, summary).items():
+            rows.append(RankingScore(board=board, ai_id=ai.ai_id, score=score))
+        count += 1
+    return rows, count
+
+
+def _upsert_board_scores(ai_ids):
+    """写入指定AI的原始得分，没有得分行的AI补上，保留已有的贝叶斯得分和置信下界"""
+    rows, count = _board_score_rows(ai_ids)
+    RankingScore.objects.bulk_create(
+        rows,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['board', 'ai'],
+        update_fields=['score'],
+    )
+    return count
+
+
+def rebuild_rankings(ai_ids=None):
+    """重新计算所有（或指定）AI的榜单得分，返回处理的AI数量"""
+    if ai_ids is not None:
+        # 只重算部分AI时只更新原始得分，贝叶斯得分和置信下界随后由worker批量计算更新
+        count = _upsert_board_scores(ai_ids)
+        mark_rank_scores_dirty()
+        return count
+
+    rows, count = _board_score_rows()
+
+    with transaction.atomic():
+        RankingScore.objects.all().delete()
+        RankingScore.objects.bulk_create(rows, batch_size=500)
+    # 全部重建后需要补上贝叶斯得分和置信下界
+    compute_rank_scores()
+    return count
+
+
+def _load_rank_inputs():
+    """一次查询取出全部AI的评分汇总，返回 (升序的ai_id数组, 列名 -> float数组)"""
+    columns = ['is_free', 'rated_count']
+    annotations = {
+        'is_free': Case(When(price_text__contains='免费', then=Value(1)), default=Value(0), output_field=IntegerField()),
+        'rated_count': Coalesce('score_summary__rated_count', 0),
+    }
+    for field in SCORE_FIELDS:
+        for suffix in ('sum', 'count'):
+            annotations[f'{field}_{suffix}'] = Coalesce(f'score_summary__{field}_{suffix}', 0)
+            columns.append(f'{field}_{suffix}')
+
+    rows = AIModel.objects.order_by('ai_id').annotate(**annotations).values_list('ai_id', *columns)
+    data = np.array(list(rows), dtype=np.float64).reshape(-1, len(columns) + 1)
+    ai_ids = data[:, 0].astype(np.int64)
+    return ai_ids, {name: np.nan_to_num(data[:, index + 1]) for index, name in enumerate(columns)}
+
+
+def _bayes_and_lower_bound(sums, counts):
+    """
+    对一个维度的全部AI同时计算贝叶斯收缩均值和Wilson置信下界
+
+    先验均值取全站该维度的平均分，先验权重取有评分AI的平均评分人数；
+    没有评分的AI两项都为0。
+    """
+    rated = counts > 0
+    if not rated.any():
+        return np.zeros_like(sums), np.zeros_like(sums)
+
+    prior_mean = sums.sum() / counts.sum()
+    prior_weight = counts[rated].mean()
+    bayes = np.where(rated, (prior_weight * prior_mean + sums) / (prior_weight + counts), 0.0)
+
+    n = np.where(rated, counts, 1.0)
+    p = np.clip(sums / n / MAX_SCORE, 0.0, 1.0)
+    z2 = WILSON_Z ** 2
+    lower = (p + z2 / (2 * n) - WILSON_Z * np.sqrt((p * (1 - p) + z2 / (4 * n)) / n)) / (1 + z2 / n)
+    lower = np.where(rated, lower * MAX_SCORE, 0.0)
+    return bayes, lower
+
+
+def _overall_sums_and_counts(columns):
+    """
+    综合榜的评分和与评分数量，与 AIScoreSummary.avg_score 的口径相同
+
+    有总评分的AI取总评分的和与数量；没有总评分的AI以各细则平均值的平均值为均值、
+    有评分的人数（rated_count）为数量，换算出等价的评分和。
+    """
+    sums = columns['overall_score_sum']
+    counts = columns['overall_score_count']
+    detail_total = np.zeros_like(sums)
+    detail_fields = np.zeros_like(sums)
+    for field in SCORE_FIELDS:
+        if field == 'overall_score':
+            continue
+        field_counts = columns[f'{field}_count']
+        rated = field_counts > 0
+        detail_total += np.where(rated, columns[f'{field}_sum'] / np.where(rated, field_counts, 1.0), 0.0)
+        detail_fields += rated
+    detail_only = (counts == 0) & (detail_fields > 0)
+    detail_counts = np.where(detail_only, columns['rated_count'], 0.0)
+    detail_sums = detail_total / np.maximum(detail_fields, 1.0) * detail_counts
+    return np.where(detail_only, detail_sums, sums), np.where(detail_only, detail_counts, counts)
+
+
+def _changed_rows(board, ai_ids, bayes, lower):
+    """
+    与 RankingScore 中已有的值比较，返回需要更新的 (ai_id, 贝叶斯得分, 置信下界) 数组
+
+    已有行一次读出后用 searchsorted 与 ai_ids（升序）对齐。
+    """
+    existing = np.array(
+        list(RankingScore.objects.filter(board=board).order_by('ai_id').values_list('ai_id', 'bayes_score', 'lower_bound')),
+        dtype=np.float64,
+    ).reshape(-1, 3)
+    positions = np.searchsorted(ai_ids, existing[:, 0].astype(np.int64))
+    positions = np.minimum(positions, len(ai_ids) - 1)
+    found = ai_ids[positions] == existing[:, 0]
+    positions = positions[found]
+    existing = existing[found]
+    changed = (bayes[positions] != existing[:, 1]) | (lower[positions] != existing[:, 2])
+    positions = positions[changed]
+    return ai_ids[positions], bayes[positions], lower[positions]
+
+
+def compute_rank_scores():
+    """
+    批量计算所有榜单的贝叶斯得分和置信下界并写回 RankingScore，返回实际更新的行数
+
+    全部AI的汇总数据一次读入NumPy数组，每个榜单做一次向量运算，不逐个AI循环计算；
+    还没有得分行的AI（如 bulk_create 创建的）先补上，之后只更新数值有变化的 (榜单, AI) 行。
+    """
+    missing = AIModel.objects.filter(~Exists(RankingScore.objects.filter(ai=OuterRef('pk'))))
+    missing_ids = list(missing.values_list('ai_id', flat=True))
+    if missing_ids:
+        _upsert_board_scores(missing_ids)
+
+    ai_ids, columns = _load_rank_inputs()
+    if not len(ai_ids):
+        return 0
+
+    params = []
+    for board, dimension in RANKING_BOARD_DIMENSIONS.items():
+        if board == 'overall':
+            sums, counts = _overall_sums_and_counts(columns)
+        else:
+            counts = columns[f'{dimension}_count']
+            sums = columns[f'{dimension}_sum']
+        bayes, lower = _bayes_and_lower_bound(sums, counts)
+        if board == 'value':
+            # 与原始得分一致，收费工具折算为1/5
+            scale = np.where(columns['is_free'] > 0, 1.0, 0.2)
+            bayes, lower = bayes * scale, lower * scale
+        changed_ids, bayes, lower = _changed_rows(board, ai_ids, bayes, lower)
+        params.extend(zip(bayes.tolist(), lower.tolist(), [board] * len(changed_ids), changed_ids.tolist()))
+
+    if params:
+        table = connection.ops.quote_name(RankingScore._meta.db_table)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(
+                f'UPDATE {table} SET bayes_score = %s, lower_bound = %s WHERE board = %s AND ai_id = %s',
+                params,
+            )
+    return len(params)
+
+
+def mark_rank_scores_dirty():
+    """
+    评分变化后调用：标记贝叶斯得分和置信下界需要重新计算，只写入一行，不在当前请求中计算
+
+    已有标记时保留原来的标记时间，多次调用合并为一次计算。
+    """
+    DirtyRankScores.objects.bulk_create([DirtyRankScores(pk=1, marked_at=timezone.now())], ignore_conflicts=True)
+
+
+def process_rank_scores(min_interval=None):
+    """
+    标记已超过 min_interval 秒（默认 RANK_SCORES_INTERVAL）时删除标记并重新计算，由聚合worker每轮调用
+
+    返回更新的行数，没有需要计算的标记时返回None；RANK_SCORES_INTERVAL 为None时worker不计算，
+    只能通过 compute_rank_scores 命令更新。先删除标记再计算，计算期间的评分写入会重新标记，留到之后处理。
+    """
+    if min_interval is None:
+        min_interval = settings.RANK_SCORES_INTERVAL
+        if min_interval is None:
+            return None
+    cutoff = timezone.now() - timedelta(seconds=min_interval)
+    # 多个worker同时运行时只有删除成功的一个进行计算
+    deleted, _ = DirtyRankScores.objects.filter(marked_at__lte=cutoff).delete()
+    if not deleted:
+        return None
+    return compute_rank_scores()
+
+
+def get_ranking_page(board, offset, limit, order='score'):
+    """
+    读取榜单的一页，返回 [(名次, ai_id, 得分, 贝叶斯得分, 置信下界), ...]
+
+    order 为 RANKING_ORDERS 中的排序方式，只读取 offset + limit 条索引记录。
+    每个AI的得分行由迁移回填、新建AI时的信号和评分写入维护，读取时不再重建。
+    """
+    entries = RankingScore.objects.filter(board=board).order_by(f'-{RANKING_ORDERS[order]}', 'ai_id')
+    page = entries.values_list('ai_id', 'score', 'bayes_score', 'lower_bound')[offset:offset + limit]
+    return [(offset + index + 1, *row) for index, row in enumerate(page)]
@@ -0,0 +1,191 @@
+"""
+评分批量导入
+
+合作方问卷的评分以 (用户, AI, 各维度分数) 行的形式批量写入：
+先整体校验（用户和AI各用一次 IN 查询解析），再按块在独立事务中用
+bulk_create(update_conflicts=True) upsert，最后对受影响的AI统一重算一次聚合。
+单行错误只记录到结果中，不会中断整批导入。
+"""
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+
+from .aggregates import refresh_rating_aggregates
+from .cache import bump_catalogue_version
+from .models import AIModel, Rating, User, SCORE_FIELDS
+
+
+# 每个事务写入的评分行数
+IMPORT_CHUNK_SIZE = 500
+
+MIN_SCORE = 0
+MAX_SCORE = 10
+
+
+def _parse_score(value):
+    """解析单个分数，空值返回None，非法值抛出 ValueError"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool):
+        raise ValueError
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError
+    score = int(value)
+    if not MIN_SCORE <= score <= MAX_SCORE:
+        raise ValueError
+    return score
+
+
+def _parse_id(value):
+    """解析用户ID或AI ID，空值返回None，非整数（包括 1.5 这样的小数）抛出 ValueError"""
+    if value is None or value == '' or isinstance(value, bool):
+        return None
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError
+    return int(value)
+
+
+def _validate_rows(rows):
+    """
+    逐行检查格式，返回 (有效行列表, 错误列表)
+
+    有效行为 (行号, 用户ID或用户名, AI ID, 分数字典)，分数字典只包含该行提供的字段。
+    """
+    valid = []
+    errors = []
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({'row': index, 'error': '格式错误，每行应为对象'})
+            continue
+        try:
+            user_id = _parse_id(row.get('user_id'))
+            ai_id = _parse_id(row.get('ai_id'))
+        except (TypeError, ValueError):
+            errors.append({'row': index, 'error': '用户ID或AI ID无效'})
+            continue
+        username = row.get('username') or None
+        if user_id is None and username is None:
+            errors.append({'row': index, 'error': '请提供用户ID或用户名'})
+            continue
+        if ai_id is None:
+            errors.append({'row': index, 'error': '请提供AI ID'})
+            continue
+
+        scores = {}
+        invalid = []
+        for field in SCORE_FIELDS:
+            if field not in row:
+                continue
+            try:
+                scores[field] = _parse_score(row[field])
+            except (TypeError, ValueError):
+                invalid.append(field)
+        if invalid:
+            errors.append({'row': index, 'error': f'评分必须是{MIN_SCORE}-{MAX_SCORE}的整数：{", ".join(invalid)}'})
+            continue
+        if not scores:
+            errors.append({'row': index, 'error': '请至少提供一个评分'})
+            continue
+
+        valid.append((index, user_id if user_id is not None else username, ai_id, scores))
+    return valid, errors
+
+
+def _resolve_references(valid):
+    """用两次 IN 查询把用户名解析为用户ID，并确认用户和AI存在"""
+    user_ids = {user for _, user, _, _ in valid if isinstance(user, int)}
+    usernames = {user for _, user, _, _ in valid if not isinstance(user, int)}
+    ai_ids = {ai_id for _, _, ai_id, _ in valid}
+
+    users = {}
+    if user_ids or usernames:
+        matches = User.objects.filter(Q(user_id__in=user_ids) | Q(username__in=usernames))
+        for user_id, username in matches.values_list('user_id', 'username'):
+            users[user_id] = user_id
+            users[username] = user_id
+    existing_ais = set(AIModel.objects.filter(ai_id__in=ai_ids).values_list('ai_id', flat=True))
+
+    resolved = []
+    errors = []
+    for index, user, ai_id, scores in valid:
+        if user not in users:
+            errors.append({'row': index, 'error': '用户不存在'})
+        elif ai_id not in existing_ais:
+            errors.append({'row': index, 'error': 'AI不存在'})
+        else:
+            resolved.append((index, users[user], ai_id, scores))
+    return resolved, errors
+
+
+def _write_chunk(entries):
+    """
+    在一个事务中 upsert 一块评分，返回 (新建数, 更新数)
+
+    同一 (用户, AI) 在块内出现多次时按顺序合并，后出现的分数覆盖先出现的；
+    未提供的字段取已有评分的原值（读取时加锁），因此整块只需一条 upsert 语句。
+    """
+    merged = {}
+    for _, user_id, ai_id, scores in entries:
+        merged.setdefault((user_id, ai_id), {}).update(scores)
+
+    with transaction.atomic():
+        existing = {
+            (row['user_id'], row['ai_id']): row
+            for row in Rating.objects.select_for_update().filter(
+                user_id__in={user_id for user_id, _ in merged},
+                ai_id__in={ai_id for _, ai_id in merged},
+            ).values('user_id', 'ai_id', *SCORE_FIELDS)
+        }
+        ratings = []
+        for (user_id, ai_id), scores in merged.items():
+            current = existing.get((user_id, ai_id), {})
+            values = {field: scores.get(field, current.get(field)) for field in SCORE_FIELDS}
+            ratings.append(Rating(user_id=user_id, ai_id=ai_id, **values))
+        Rating.objects.bulk_create(
+            ratings,
+            update_conflicts=True,
+            unique_fields=['user', 'ai'],
+            update_fields=SCORE_FIELDS,
+        )
+    created = len(merged.keys() - existing.keys())
+    return created, len(merged) - created
+
+
+def import_ratings(rows, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    批量导入评分
+
+    rows 中每行是一个字典，包含 user_id（或 username）、ai_id 和任意评分字段，
+    与 /api/ratings/ 一样只更新提供的字段。返回
+    {'created': 新建数, 'updated': 更新数, 'ai_count': 重算的AI数, 'errors': [{'row': 行号, 'error': 原因}]}，
+    行号从0开始。
+    """
+    rows = list(rows)
+    valid, errors = _validate_rows(rows)
+    resolved, reference_errors = _resolve_references(valid)
+    errors.extend(reference_errors)
+
+    created = updated = 0
+    touched = set()
+    for start in range(0, len(resolved), chunk_size):
+        chunk = resolved[start:start + chunk_size]
+        try:
+            chunk_created, chunk_updated = _write_chunk(chunk)
+        except DatabaseError as exc:
+            # 整块回滚，块内每行都记为失败，继续处理下一块
+            errors.extend({'row': index, 'error': f'写入失败：{exc}'} for index, _, _, _ in chunk)
+            continue
+        created += chunk_created
+        updated += chunk_updated
+        touched.update(ai_id for _, _, ai_id, _ in chunk)
+
+    ai_count = refresh_rating_aggregates(sorted(touched))
+    if touched:
+        bump_catalogue_version()
+
+    errors.sort(key=lambda error: error['row'])
+    return {
+        'created': created,
+        'updated': updated,
+        'ai_count': ai_count,
+        'errors': errors,
+    }
@@ -0,0 +1,228 @@
+"""
+个性化推荐（隐式反馈的交替最小二乘矩阵分解）
+
+train_recommender 把评分（平均分达到 HIGH_RATING 的视为喜欢）和收藏构造成
+用户×AI 的交互矩阵，用 ALS 分解为用户因子和AI因子：交互权重 w 转换为置信度
+1 + alpha * w，偏好为1，未交互的 (用户, AI) 置信度为1、偏好为0。
+
+训练结果以 float32 的 .npy 文件保存在 settings.RECOMMENDER_DIR 的版本子目录中，
+CURRENT 文件记录当前版本；服务端以内存映射方式打开，每个请求只做一次
+AI因子矩阵与用户因子向量的乘法再取前K个。
+"""
+import os
+import shutil
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .similarity import build_interaction_matrix
+
+
+RECOMMENDER_FACTORS = 32
+RECOMMENDER_ITERATIONS = 10
+RECOMMENDER_REGULARIZATION = 0.1
+RECOMMENDER_ALPHA = 10.0
+# 每次批量求解时展开的交互条数上限，决定 (条数, k, k) 临时数组的大小
+ALS_BLOCK_ENTRIES = 8192
+# 保留的历史版本数量（含当前版本），正在使用旧版本的进程可以继续读取
+RECOMMENDER_KEEP_VERSIONS = 2
+
+_MODEL_FILES = ('user_ids', 'ai_ids', 'user_factors', 'item_factors')
+_loaded = {'version': None, 'model': None}
+
+
+def _transpose(indptr, rows, cols, weights, n_cols):
+    """把CSR矩阵转置为按列组织的CSR，返回 (indptr, rows, cols, weights)"""
+    order = np.argsort(cols, kind='stable')
+    t_rows = cols[order]
+    t_indptr = np.searchsorted(t_rows, np.arange(n_cols + 1)).astype(np.int64)
+    return t_indptr, t_rows, rows[order], weights[order]
+
+
+def _als_step(indptr, cols, confidence, other, regularization):
+    """
+    固定另一侧的因子 other，求解每一行的因子
+
+    第 u 行的方程为 (Y^T Y + Y_u^T (C_u - I) Y_u + λI) x_u = Y_u^T C_u p_u，
+    Y^T Y 所有行共用，其余部分按块用 reduceat 对连续的行一次性求和后批量求解。
+    """
+    n_rows = len(indptr) - 1
+    k = other.shape[1]
+    gram = other.T @ other + regularization * np.eye(k)
+    result = np.zeros((n_rows, k))
+
+    start = 0
+    while start < n_rows:
+        stop = int(np.searchsorted(indptr, indptr[start] + ALS_BLOCK_ENTRIES, side='right')) - 1
+        stop = min(max(stop, start + 1), n_rows)
+        low, high = indptr[start], indptr[stop]
+        # 没有交互的行解为0，reduceat 只对有交互的行分段
+        nonempty = np.flatnonzero(np.diff(indptr[start:stop + 1]) > 0)
+        if len(nonempty):
+            y = other[cols[low:high]]
+            c = confidence[low:high]
+            offsets = indptr[start + nonempty] - low
+            a = gram + np.add.reduceat((c - 1)[:, None, None] * y[:, :, None] * y[:, None, :], offsets, axis=0)
+            b = np.add.reduceat(c[:, None] * y, offsets, axis=0)
+            result[start + nonempty] = np.linalg.solve(a, b[..., None])[..., 0]
+        start = stop
+    return result
+
+
+def train_als(indptr, rows, cols, weights, n_items, factors=RECOMMENDER_FACTORS,
+              iterations=RECOMMENDER_ITERATIONS, regularization=RECOMMENDER_REGULARIZATION,
+              alpha=RECOMMENDER_ALPHA, seed=0):
+    """在CSR交互矩阵上训练ALS，返回 (用户因子, AI因子)，均为 float32"""
+    n_users = len(indptr) - 1
+    confidence = 1 + alpha * weights.astype(np.float64)
+    t_indptr, _, t_cols, t_confidence = _transpose(indptr, rows, cols, confidence, n_items)
+
+    rng = np.random.default_rng(seed)
+    user_factors = rng.normal(scale=0.01, size=(n_users, factors))
+    item_factors = rng.normal(scale=0.01, size=(n_items, factors))
+    for _ in range(iterations):
+        user_factors = _als_step(indptr, cols, confidence, item_factors, regularization)
+        item_factors = _als_step(t_indptr, t_cols, t_confidence, user_factors, regularization)
+    return user_factors.astype(np.float32), item_factors.astype(np.float32)
+
+
+def _top_k(scores, k, exclude):
+    """取分数最高的前k个下标（按分数降序），exclude 中的下标不参与"""
+    scores = scores.copy()
+    scores[exclude] = -np.inf
+    k = min(k, int(np.isfinite(scores).sum()))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind='stable')]
+
+
+def _split_holdout(indptr, rows, test_fraction, seed):
+    """随机留出一部分交互作为测试集，每个用户至少保留一条训练交互，返回测试集掩码"""
+    rng = np.random.default_rng(seed)
+    test = rng.random(len(rows)) < test_fraction
+    train_counts = np.bincount(rows[~test], minlength=len(indptr) - 1)
+    test[indptr[:-1][train_counts == 0]] = False
+    return test
+
+
+def _subset(indptr, rows, cols, weights, mask):
+    """取出CSR中 mask 为True的交互，保持行数不变"""
+    rows, cols, weights = rows[mask], cols[mask], weights[mask]
+    indptr = np.searchsorted(rows, np.arange(len(indptr))).astype(np.int64)
+    return indptr, rows, cols, weights
+
+
+def _precision_at_k(score_rows, train, test, k):
+    """score_rows(用户下标) 返回该用户对全部AI的分数；对有测试交互的用户计算平均 precision@k"""
+    t_indptr, _, t_cols, _ = test
+    indptr, _, cols, _ = train
+    users = np.flatnonzero(np.diff(t_indptr) > 0)
+    hits = 0
+    for user in users:
+        top = _top_k(score_rows(user), k, cols[indptr[user]:indptr[user + 1]])
+        hits += np.isin(top, t_cols[t_indptr[user]:t_indptr[user + 1]]).sum()
+    return hits / (len(users) * k) if len(users) else 0.0, len(users)
+
+
+def evaluate_recommender(k=10, test_fraction=0.2, seed=0, **params):
+    """
+    离线评估：随机留出 test_fraction 的交互，用其余交互训练后计算 precision@k
+
+    同时给出按热度推荐的基线，返回 {'precision', 'baseline_precision', 'users', 'train_seconds'}。
+    """
+    _, ai_ids, indptr, rows, cols, weights = build_interaction_matrix(reaction_weights={})
+    test_mask = _split_holdout(indptr, rows, test_fraction, seed)
+    train = _subset(indptr, rows, cols, weights, ~test_mask)
+    test = _subset(indptr, rows, cols, weights, test_mask)
+
+    started = time.perf_counter()
+    user_factors, item_factors = train_als(*train, n_items=len(ai_ids), seed=seed, **params)
+    train_seconds = time.perf_counter() - started
+
+    precision, users = _precision_at_k(lambda user: item_factors @ user_factors[user], train, test, k)
+    popularity = np.bincount(train[2], minlength=len(ai_ids)).astype(np.float64)
+    baseline, _ = _precision_at_k(lambda user: popularity, train, test, k)
+    return {
+        'precision': precision,
+        'baseline_precision': baseline,
+        'users': users,
+        'train_seconds': train_seconds,
+    }
+
+
+def save_model(user_ids, ai_ids, user_factors, item_factors, directory=None):
+    """把因子数组写入新的版本子目录，再原子地切换 CURRENT，返回版本名"""
+    directory = directory or settings.RECOMMENDER_DIR
+    version = time.strftime('%Y%m%d%H%M%S') + f'-{os.getpid()}'
+    target = os.path.join(directory, version)
+    os.makedirs(target)
+    arrays = {
+        'user_ids': user_ids.astype(np.int64),
+        'ai_ids': ai_ids.astype(np.int64),
+        'user_factors': np.ascontiguousarray(user_factors, dtype=np.float32),
+        'item_factors': np.ascontiguousarray(item_factors, dtype=np.float32),
+    }
+    for name in _MODEL_FILES:
+        np.save(os.path.join(target, f'{name}.npy'), arrays[name])
+
+    pointer = os.path.join(directory, 'CURRENT')
+    with open(pointer + '.tmp', 'w') as fp:
+        fp.write(version)
+    os.replace(pointer + '.tmp', pointer)
+
+    versions = sorted(name for name in os.listdir(directory) if os.path.isdir(os.path.join(directory, name)))
+    for old in versions[:-RECOMMENDER_KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(directory, old), ignore_errors=True)
+    return version
+
+
+def train_recommender(**params):
+    """用全部评分和收藏训练并保存模型，返回 (版本名, 用户数, AI数, 交互数)"""
+    user_ids, ai_ids, indptr, rows, cols, weights = build_interaction_matrix(reaction_weights={})
+    user_factors, item_factors = train_als(indptr, rows, cols, weights, n_items=len(ai_ids), **params)
+    version = save_model(user_ids, ai_ids, user_factors, item_factors)
+    return version, len(user_ids), len(ai_ids), len(rows)
+
+
+def load_model():
+    """
+    以内存映射方式打开当前版本的模型，返回字典；尚未训练时返回None
+
+    CURRENT 变化（重新训练）后下一个请求自动切换到新版本。
+    """
+    try:
+        with open(os.path.join(settings.RECOMMENDER_DIR, 'CURRENT')) as fp:
+            version = fp.read().strip()
+    except FileNotFoundError:
+        return None
+    if version != _loaded['version']:
+        directory = os.path.join(settings.RECOMMENDER_DIR, version)
+        _loaded['model'] = {
+            name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r')
+            for name in _MODEL_FILES
+        }
+        _loaded['version'] = version
+    return _loaded['model']
+
+
+def recommend_for_user(user_id, k, exclude_ai_ids=()):
+    """
+    为用户计算前k个推荐，返回 [(ai_id, 分数), ...]；没有模型或用户不在模型中时返回None
+
+    exclude_ai_ids 中的AI（如已评分、已收藏的）不会被推荐。
+    """
+    model = load_model()
+    if model is None:
+        return None
+    user_ids, ai_ids = model['user_ids'], model['ai_ids']
+    row = int(np.searchsorted(user_ids, user_id))
+    if row >= len(user_ids) or user_ids[row] != user_id:
+        return None
+
+    scores = model['item_factors'] @ model['user_factors'][row]
+    excluded = np.fromiter(exclude_ai_ids, dtype=np.int64)
+    positions = np.minimum(np.searchsorted(ai_ids, excluded), len(ai_ids) - 1)
+    top = _top_k(scores, k, positions[ai_ids[positions] == excluded])
+    return [(int(ai_ids[index]), float(scores[index])) for index in top]
@@ -0,0 +1,121 @@
+"""
+全文搜索（SQLite FTS5）
+
+backend_ai_search 索引 AIModel 的名称、开发商和简介，backend_comment_search 索引评论内容，
+两张表都是外部内容表（只保存索引，不重复保存文本），由迁移 0022 创建的触发器在内容表
+增删改时同步更新，bulk_create、queryset.update 等绕过信号的写入也能保持一致。
+
+分词器为 trigram，按连续三个字符建索引，中文不需要分词即可做子串匹配；
+不足三个字符的关键词无法走索引，退化为 LIKE 过滤。结果按 bm25 相关度排序，
+AI 的名称、开发商、简介权重分别为 10、5、1（由迁移写入索引表的 rank 配置）。
+"""
+import re
+
+from django.db import connection
+
+
+# 搜索类型 -> (索引表, 内容表, 主键, 索引列)
+SEARCH_INDEXES = {
+    'ai': ('backend_ai_search', 'backend_aimodel', 'ai_id', ('name', 'developer', 'description')),
+    'comment': ('backend_comment_search', 'backend_comment', 'comment_id', ('content',)),
+}
+
+# trigram 分词器能通过索引匹配的最短关键词长度
+SEARCH_MIN_TERM_LENGTH = 3
+# 一次搜索最多使用的关键词数量，多余的忽略
+SEARCH_MAX_TERMS = 8
+# 每页最多返回的结果数
+SEARCH_MAX_LIMIT = 50
+# 未限定AI时，命中过多的关键词只对最新的这么多条命中计算相关度，避免对几十万条命中逐条打分
+SEARCH_MAX_CANDIDATES = 10000
+# 未限定AI时，只有短关键词的搜索只扫描主键最大的这么多行
+SEARCH_LIKE_SCAN_ROWS = 200000
+
+# 用户输入中的 "带引号的短语" 或不含空白的单个词
+_QUERY_TOKEN_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def parse_search_query(query):
+    """
+    把用户输入按空白拆成关键词，返回 (FTS5 MATCH 表达式或None, 短关键词列表)
+
+    双引号括起的部分（可含空格）作为一个关键词，其余按空白拆分，未配对的引号忽略；
+    每个长关键词作为带引号的短语，多个关键词之间为 AND；用户输入中的 FTS5 语法字符不会生效。
+    """
+    terms = (
+        phrase.strip() if phrase else word.replace('"', '')
+        for phrase, word in _QUERY_TOKEN_RE.findall(query)
+    )
+    terms = list(dict.fromkeys(term for term in terms if term))[:SEARCH_MAX_TERMS]
+    long_terms = [term for term in terms if len(term) >= SEARCH_MIN_TERM_LENGTH]
+    short_terms = [term for term in terms if len(term) < SEARCH_MIN_TERM_LENGTH]
+    match = ' '.join('"{}"'.format(term.replace('"', '""')) for term in long_terms) or None
+    return match, short_terms
+
+
+def _like_pattern(term):
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def search_hits(kind, query, offset=0, limit=20, ai_id=None):
+    """
+    搜索 AI（kind='ai'）或评论（kind='comment'），返回按相关度排序的 [(主键, 得分), ...]
+
+    得分为 bm25 相关度（越大越相关）；只有短关键词时没有相关度，得分为0，按主键倒序（最新在前）。
+    ai_id 只对评论搜索有效，限定为某个AI下的评论。未限定AI时，相关度只在最新的
+    SEARCH_MAX_CANDIDATES 条命中中排序，只有短关键词时只扫描最新的 SEARCH_LIKE_SCAN_ROWS 行。
+    """
+    table, content, pk, columns = SEARCH_INDEXES[kind]
+    match, short_terms = parse_search_query(query)
+    if match is None and not short_terms:
+        return []
+    scoped = kind == 'comment' and ai_id is not None
+
+    conditions, params = [], []
+    if match is not None:
+        source = f'{table} JOIN {content} c ON c.{pk} = {table}.rowid'
+        conditions.append(f'{table} MATCH %s')
+        params.append(match)
+        if not scoped:
+            # 按 rowid 倒序跳过 N 条命中只需读取倒排列表，取得第 N 条命中的 rowid 作为下界
+            conditions.append(
+                f'{table}.rowid >= COALESCE((SELECT rowid FROM {table} WHERE {table} MATCH %s '
+                f'ORDER BY rowid DESC LIMIT 1 OFFSET %s), 0)'
+            )
+            params.extend([match, SEARCH_MAX_CANDIDATES - 1])
+        score, order = f'-{table}.rank', f'{table}.rank, c.{pk}'
+    else:
+        source = f'{content} c'
+        if not scoped:
+            conditions.append(f'c.{pk} > (SELECT MAX({pk}) FROM {content}) - %s')
+            params.append(SEARCH_LIKE_SCAN_ROWS)
+        score, order = '0.0', f'c.{pk} DESC'
+
+    for term in short_terms:
+        conditions.append('(' + ' OR '.join(f"c.{column} LIKE %s ESCAPE '\\'" for column in columns) + ')')
+        params.extend([_like_pattern(term)] * len(columns))
+    if scoped:
+        conditions.append('c.ai_id = %s')
+        params.append(ai_id)
+
+    sql = (
+        f'SELECT c.{pk}, {score} FROM {source} WHERE {" AND ".join(conditions)} '
+        f'ORDER BY {order} LIMIT %s OFFSET %s'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*params, limit, offset])
+        return [(row_id, float(row_score)) for row_id, row_score in cursor.fetchall()]
+
+
+def rebuild_search_index(optimize=True):
+    """从内容表重建全部搜索索引，返回 {搜索类型: 索引行数}；optimize 为True时合并索引段"""
+    counts = {}
+    with connection.cursor() as cursor:
+        for kind, (table, content, _, _) in SEARCH_INDEXES.items():
+            cursor.execute(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+            if optimize:
+                cursor.execute(f"INSERT INTO {table}({table}) VALUES ('optimize')")
+            cursor.execute(f'SELECT COUNT(*) FROM {content}')
+            counts[kind] = cursor.fetchone()[0]
+    return counts
@@ -1,8 +1,41 @@
 from rest_framework import serializers
 from django.contrib.auth.hashers import make_password, check_password
-from django.db.models import Avg
+from django.db import models, transaction
 
-from .models import AIModel, Comment, Tag, User, Rating, AITag, Reaction
+from .cache import bump_catalogue_version
+from .rankings import update_ai_rankings
+from .aggregates import apply_rating_change, apply_rollup_change, snapshot_scores
+from .aggregate_worker import aggregates_deferred, defer_rating_aggregates
+from .models import AIModel, AIScoreSummary, AITagCount, Comment, CommentLike, Tag, User, Rating, Reaction, SCORE_FIELDS
+
+
+def get_sparse_fields(query_params, field_names):
+    """
+    解析 ?fields= / ?exclude= 参数，返回需要输出的字段名集合
+
+    两个参数都是逗号分隔的字段名，未知字段会被忽略。
+    """
+    selected = set(field_names)
+    fields = [name.strip() for name in query_params.get('fields', '').split(',') if name.strip()]
+    if fields:
+        selected &= set(fields)
+    exclude = [name.strip() for name in query_params.get('exclude', '').split(',') if name.strip()]
+    selected -= set(exclude)
+    return selected
+
+
+class SparseFieldsMixin:
+    """按请求的 ?fields= / ?exclude= 裁剪序列化器字段，未请求的字段不会被计算"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None:
+            return
+        selected = get_sparse_fields(request.query_params, self.fields.keys())
+        for name in list(self.fields):
+            if name not in selected:
+                self.fields.pop(name)
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -11,7 +44,18 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ['tag_id', 'tag_name']
 
 
-class AIModelSerializer(serializers.ModelSerializer):
+class AIModelListSerializer(serializers.ListSerializer):
+    """批量序列化AI时，一次性预取整页AI的标签统计"""
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        iterable = list(iterable)
+        if 'tags' in self.child.fields:
+            self.child.prefetch_tags(iterable)
+        return super().to_representation(iterable)
+
+
+class AIModelSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     tags = serializers.SerializerMethodField()
     overall_score = serializers.SerializerMethodField()
     versatility_score = serializers.SerializerMethodField()
@@ -19,13 +63,10 @@ class AIModelSerializer(serializers.ModelSerializer):
     information_query_score = serializers.SerializerMethodField()
     study_assistance_score = serializers.SerializerMethodField()
     value_for_money_score = serializers.SerializerMethodField()
-    reactions_thumb_up = serializers.SerializerMethodField()
-    reactions_thumb_down = serializers.SerializerMethodField()
-    reactions_amazing = serializers.SerializerMethodField()
-    reactions_bad = serializers.SerializerMethodField()
 
     class Meta:
         model = AIModel
+        list_serializer_class = AIModelListSerializer
         fields = [
             'ai_id',
             'name',
@@ -50,63 +91,76 @@ class AIModelSerializer(serializers.ModelSerializer):
             'reactions_bad',
         ]
     
+    @staticmethod
+    def setup_eager_loading(queryset, fields=None, extra_columns=()):
+        """
+        为列表查询关联评分汇总表，避免每行单独查询
+
+        fields 为需要输出的字段集合，未请求任何评分字段时不做关联；
+        指定 fields 时只读取其中的数据库列和主键（如不读取较长的 description），
+        extra_columns 为额外需要读取的列，例如分页游标使用的排序字段。
+        反应数量是AIModel上的计数字段，不需要额外查询。
+        """
+        if fields is None or not fields.isdisjoint(SCORE_FIELDS):
+            queryset = queryset.select_related('score_summary')
+        if fields is not None:
+            columns = {field.name for field in AIModel._meta.concrete_fields}
+            queryset = queryset.only('ai_id', *sorted(columns & (set(fields) | set(extra_columns))))
+        return queryset
+
+    @staticmethod
+    def prefetch_tags(ais):
+        """一次查询取出一批AI的标签统计，挂到每个对象的 _tag_counts 上"""
+        ais = [ai for ai in ais if not hasattr(ai, '_tag_counts')]
+        if not ais:
+            return
+        tag_counts = {ai.ai_id: [] for ai in ais}
+        rows = AITagCount.objects.filter(ai_id__in=tag_counts.keys(), count__gt=0).values(
+            'ai_id',
+            'tag__tag_id',
+            'tag__tag_name',
+            'count'
+        ).order_by('-count')
+        for row in rows:
+            tag_counts[row['ai_id']].append({
+                'tag_id': row['tag__tag_id'],
+                'tag_name': row['tag__tag_name'],
+                'count': row['count']
+            })
+        for ai in ais:
+            ai._tag_counts = tag_counts[ai.ai_id]
+
+    def _get_score_avg(self, obj, field):
+        """从评分汇总表读取平均分，没有汇总行时视为尚无评分"""
+        try:
+            avg = obj.score_summary.average(field)
+        except AIScoreSummary.DoesNotExist:
+            avg = None
+        return round(float(avg), 1) if avg is not None else 0.0
+
     def get_overall_score(self, obj):
-        """计算总评分的平均值（通用性评价）"""
-        result = Rating.objects.filter(ai=obj, overall_score__isnull=False).aggregate(avg=Avg('overall_score'))
-        return round(float(result['avg']), 1) if result['avg'] is not None else 0.0
+        """总评分的平均值（通用性评价）"""
+        return self._get_score_avg(obj, 'overall_score')
     
     def get_versatility_score(self, obj):
-        """计算万能性评分的平均值"""
-        result = Rating.objects.filter(ai=obj, versatility_score__isnull=False).aggregate(avg=Avg('versatility_score'))
-        return round(float(result['avg']), 1) if result['avg'] is not None else 0.0
+        """万能性评分的平均值"""
+        return self._get_score_avg(obj, 'versatility_score')
     
     def get_image_generation_score(self, obj):
-        """计算图像生成评分的平均值"""
-        result = Rating.objects.filter(ai=obj, image_generation_score__isnull=False).aggregate(avg=Avg('image_generation_score'))
-        return round(float(result['avg']), 1) if result['avg'] is not None else 0.0
+        """图像生成评分的平均值"""
+        return self._get_score_avg(obj, 'image_generation_score')
     
     def get_information_query_score(self, obj):
-        """计算信息查询评分的平均值"""
-        result = Rating.objects.filter(ai=obj, information_query_score__isnull=False).aggregate(avg=Avg('information_query_score'))
-        return round(float(result['avg']), 1) if result['avg'] is not None else 0.0
+        """信息查询评分的平均值"""
+        return self._get_score_avg(obj, 'information_query_score')
     
     def get_study_assistance_score(self, obj):
-        """计算学习辅助评分的平均值"""
-        result = Rating.objects.filter(ai=obj, study_assistance_score__isnull=False).aggregate(avg=Avg('study_assistance_score'))
-        return round(float(result['avg']), 1) if result['avg'] is not None else 0.0
+        """学习辅助评分的平均值"""
+        return self._get_score_avg(obj, 'study_assistance_score')
     
     def get_value_for_money_score(self, obj):
-        """计算性价比评分的平均值"""
-        result = Rating.objects.filter(ai=obj, value_for_money_score__isnull=False).aggregate(avg=Avg('value_for_money_score'))
-        return round(float(result['avg']), 1) if result['avg'] is not None else 0.0
-    
-    def get_reactions_thumb_up(self, obj):
-        """点赞数"""
-        try:
-            return Reaction.objects.filter(ai=obj, reaction_type='thumbUp').count()
-        except Exception:
-            return 0
-    
-    def get_reactions_thumb_down(self, obj):
-        """点踩数"""
-        try:
-            return Reaction.objects.filter(ai=obj, reaction_type='thumbDown').count()
-        except Exception:
-            return 0
-    
-    def get_reactions_amazing(self, obj):
-        """惊叹数"""
-        try:
-            return Reaction.objects.filter(ai=obj, reaction_type='amazing').count()
-        except Exception:
-            return 0
-    
-    def get_reactions_bad(self, obj):
-        """差评数"""
-        try:
-            return Reaction.objects.filter(ai=obj, reaction_type='bad').count()
-        except Exception:
-            return 0
+        """性价比评分的平均值"""
+        return self._get_score_avg(obj, 'value_for_money_score')
     
     def get_user_reaction(self, obj):
         """获取当前用户的反应类型"""
@@ -121,32 +175,32 @@ class AIModelSerializer(serializers.ModelSerializer):
     
     def get_tags(self, obj):
         """获取AI的所有标签及其数量（所有用户添加的标签）"""
-        # 返回所有用户为该AI添加的标签及其数量
-        from django.db.models import Count
-        all_tags = AITag.objects.filter(ai=obj).select_related('tag').values(
-            'tag__tag_id', 
-            'tag__tag_name'
-        ).annotate(
-            count=Count('tag_id')
-        ).order_by('-count')
-        return [
-            {
-                'tag_id': tag['tag__tag_id'], 
-                'tag_name': tag['tag__tag_name'],
-                'count': tag['count']
-            } 
-            for tag in all_tags
-        ]
+        # 列表序列化时由 AIModelListSerializer 批量预取
+        self.prefetch_tags([obj])
+        return obj._tag_counts
+
+
+class CommentListSerializer(serializers.ListSerializer):
+    """批量序列化评论时，一次性查询当前用户对整页评论（含已加载的回复）的点赞状态"""
 
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        iterable = list(iterable)
+        if 'liked' in self.child.fields:
+            self.child.prefetch_liked(iterable)
+        return super().to_representation(iterable)
 
-class CommentSerializer(serializers.ModelSerializer):
+
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = serializers.SerializerMethodField()
     ai = serializers.SerializerMethodField()
     ai_id = serializers.IntegerField(source='ai.ai_id', read_only=True)
     images = serializers.SerializerMethodField()
+    liked = serializers.SerializerMethodField()
     
     class Meta:
         model = Comment
+        list_serializer_class = CommentListSerializer
         fields = [
             'comment_id',
             'ai_id',
@@ -158,6 +212,8 @@ class CommentSerializer(serializers.ModelSerializer):
             'created_at',
             'upvotes',
             'images',
+            'depth',
+            'liked',
         ]
     
     def get_user(self, obj):
@@ -177,10 +233,52 @@ class CommentSerializer(serializers.ModelSerializer):
         return None
     
     def get_images(self, obj):
-        # 获取评论的图片
-        from .models import CommentImage
-        images = CommentImage.objects.filter(comment=obj)
-        return [img.url for img in images]
+        # 获取评论的图片，列表接口通过 prefetch_related('images') 批量读取
+        return [img.url for img in obj.images.all()]
+    
+    def prefetch_liked(self, comments):
+        """一次 IN 查询取出当前用户对一批评论及其已加载回复（reply_list）的点赞状态，挂到 _liked 上"""
+        pending = []
+        stack = list(comments)
+        while stack:
+            comment = stack.pop()
+            if not hasattr(comment, '_liked'):
+                pending.append(comment)
+            stack.extend(getattr(comment, 'reply_list', []))
+        if not pending:
+            return
+        
+        liked = set()
+        request = self.context.get('request')
+        if request and request.user.is_authenticated:
+            liked = set(CommentLike.objects.filter(
+                user=request.user,
+                comment_id__in=[comment.comment_id for comment in pending]
+            ).values_list('comment_id', flat=True))
+        for comment in pending:
+            comment._liked = comment.comment_id in liked
+    
+    def get_liked(self, obj):
+        """当前用户是否已点赞该评论，未登录时为False"""
+        self.prefetch_liked([obj])
+        return obj._liked
+
+
+class CommentThreadSerializer(CommentSerializer):
+    """
+    带回复的评论，附带回复总数（reply_count）和回复（replies，可嵌套）
+
+    回复来自 reply_list：列表接口预取最早的几条，回复串接口为完整的子树；没有时为空列表。
+    """
+    reply_count = serializers.IntegerField(read_only=True)
+    replies = serializers.SerializerMethodField()
+
+    class Meta(CommentSerializer.Meta):
+        fields = CommentSerializer.Meta.fields + ['reply_count', 'replies']
+
+    def get_replies(self, obj):
+        replies = getattr(obj, 'reply_list', [])
+        return CommentThreadSerializer(replies, many=True, context=self.context).data
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -258,40 +356,42 @@ class RatingSerializer(serializers.ModelSerializer):
             'value_for_money_score': validated_data.get('value_for_money_score', 0),
         }
         
-        # 使用update_or_create来更新或创建评分
-        rating, created = Rating.objects.update_or_create(
-            user=user,
-            ai=ai,
-            defaults=update_data
-        )
-        
-        # 如果已存在，强制刷新以获取最新数据
-        if not created:
-            rating.refresh_from_db()
-        
-        # 更新AI的平均分和评分数量
-        from django.db.models import Avg
-        ratings = Rating.objects.filter(ai=ai)
-        ai.rating_count = ratings.count()
-        
-        avg_scores = ratings.aggregate(
-            versatility=Avg('versatility_score'),
-            image_generation=Avg('image_generation_score'),
-            information_query=Avg('information_query_score'),
-            study_assistance=Avg('study_assistance_score'),
-            value_for_money=Avg('value_for_money_score')
-        )
-        
-        total_avg = (
-            (avg_scores['versatility'] or 0) +
-            (avg_scores['image_generation'] or 0) +
-            (avg_scores['information_query'] or 0) +
-            (avg_scores['study_assistance'] or 0) +
-            (avg_scores['value_for_money'] or 0)
-        ) / 5
-        
-        ai.avg_score = round(total_avg, 2)
-        ai.save()
+        with transaction.atomic():
+            # 锁定并记录修改前的分数，用于增量更新评分汇总
+            old_scores = snapshot_scores(Rating.objects.select_for_update().filter(user=user, ai=ai).first())
+            
+            # 使用update_or_create来更新或创建评分
+            rating, created = Rating.objects.update_or_create(
+                user=user,
+                ai=ai,
+                defaults=update_data
+            )
+            
+            # 如果已存在，强制刷新以获取最新数据
+            if not created:
+                rating.refresh_from_db()
+            
+            if aggregates_deferred():
+                # 延迟聚合模式只标记AI，由worker合并后统一重算
+                defer_rating_aggregates(ai.ai_id)
+                return rating
+            
+            new_scores = snapshot_scores(rating)
+            summary = apply_rating_change(ai.ai_id, old_scores, new_scores)
+            apply_rollup_change(ai.ai_id, rating.created_at, old_scores, new_scores)
+            
+            # 更新AI的平均分和评分数量（直接读取评分汇总）
+            ai.rating_count = summary.rated_count
+            
+            total_avg = sum(
+                summary.average(field) or 0
+                for field in SCORE_FIELDS
+                if field != 'overall_score'
+            ) / 5
+            
+            ai.avg_score = round(total_avg, 2)
+            update_ai_rankings(ai, summary)
+            ai.save(update_fields=['avg_score', 'rating_count'])
+            bump_catalogue_version()
         
         return rating
-
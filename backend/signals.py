@@ -0,0 +1,34 @@
+"""
+模型信号
+
+AIModel 新建时（后台添加、脚本创建等）立即为它写入各榜单的得分行，
+没有评分的AI也会出现在榜单中；bulk_create 不发送信号，批量创建后需要调用 rebuild_rankings。
+
+AI、标签以及AI与标签的关联在后台被修改或删除时递增目录版本号，使AI列表的缓存和ETag失效；
+写入接口自己也会递增版本号，这里重复递增没有副作用。
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_catalogue_version
+from .models import AIModel, AITag, Tag
+from .rankings import update_ai_rankings
+
+
+@receiver(post_save, sender=AIModel, dispatch_uid='backend.create_ranking_rows')
+def create_ranking_rows(sender, instance, created, raw=False, **kwargs):
+    """新AI还没有评分汇总，各榜单得分按0写入"""
+    if created and not raw:
+        update_ai_rankings(instance, None)
+
+
+@receiver(post_save, sender=AIModel, dispatch_uid='backend.bump_catalogue_on_ai_save')
+@receiver(post_delete, sender=AIModel, dispatch_uid='backend.bump_catalogue_on_ai_delete')
+@receiver(post_save, sender=Tag, dispatch_uid='backend.bump_catalogue_on_tag_save')
+@receiver(post_delete, sender=Tag, dispatch_uid='backend.bump_catalogue_on_tag_delete')
+@receiver(post_save, sender=AITag, dispatch_uid='backend.bump_catalogue_on_ai_tag_save')
+@receiver(post_delete, sender=AITag, dispatch_uid='backend.bump_catalogue_on_ai_tag_delete')
+def invalidate_catalogue(sender, raw=False, **kwargs):
+    """目录中的AI或标签发生变化"""
+    if not raw:
+        bump_catalogue_version()
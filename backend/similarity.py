@@ -0,0 +1,193 @@
+"""
+相似AI推荐（"给这个AI打高分的用户也喜欢……"）
+
+compute_similar_ais 离线读取评分、收藏和反应，构造 用户×AI 的稀疏交互矩阵
+（按用户排序的CSR数组：indptr / cols / weights），计算AI之间的余弦相似度，
+把每个AI最相似的前N个写入 SimilarAI 表；详情页通过 (ai, rank) 索引一次读取。
+
+相似度矩阵按AI分片计算：每片只保存 全部AI×片内AI 的共现累加值，共现对按块展开，
+因此除交互数组本身（每条交互约16字节）外，计算过程的内存不超过 memory_mb。
+"""
+import itertools
+
+import numpy as np
+from django.db import transaction
+
+from .models import Favorite, Rating, Reaction, SimilarAI, SCORE_FIELDS
+
+
+# 每个AI保存的相似AI数量
+SIMILAR_TOP_N = 20
+# 计算相似度时的内存预算（MB），不含交互数组本身
+SIMILARITY_MEMORY_MB = 256
+# 两个AI至少要有多少个共同用户才计算相似度，避免一两个用户造成的偶然高相似
+MIN_COMMON_USERS = 2
+# 评分平均分达到该值才视为喜欢，权重为 平均分/10
+HIGH_RATING = 6
+FAVORITE_WEIGHT = 1.0
+REACTION_WEIGHTS = {'thumbUp': 0.5, 'amazing': 0.5}
+# 同一用户对同一AI的多种交互权重相加后的上限
+MAX_INTERACTION_WEIGHT = 2.0
+# 从数据库流式读取交互时每批的行数
+INTERACTION_CHUNK_SIZE = 50000
+
+
+def _iter_chunks(queryset, columns):
+    """按 INTERACTION_CHUNK_SIZE 行一批流式读取，每批返回一个 float64 二维数组（NULL 为 nan）"""
+    rows = queryset.order_by().values_list(*columns).iterator(chunk_size=INTERACTION_CHUNK_SIZE)
+    while True:
+        chunk = list(itertools.islice(rows, INTERACTION_CHUNK_SIZE))
+        if not chunk:
+            return
+        yield np.array(chunk, dtype=np.float64).reshape(-1, len(columns))
+
+
+def _load_interactions(reaction_weights):
+    """读取全部正向交互，返回 (user_id数组, ai_id数组, 权重数组)，同一(用户, AI)可能出现多次"""
+    users, ais, weights = [], [], []
+
+    def add(user_col, ai_col, weight):
+        keep = weight > 0
+        users.append(user_col[keep].astype(np.int64))
+        ais.append(ai_col[keep].astype(np.int64))
+        weights.append(weight[keep].astype(np.float32))
+
+    for chunk in _iter_chunks(Rating.objects.all(), ['user_id', 'ai_id', *SCORE_FIELDS]):
+        scores = chunk[:, 2:]
+        counts = (~np.isnan(scores)).sum(axis=1)
+        means = np.nansum(scores, axis=1) / np.maximum(counts, 1)
+        add(chunk[:, 0], chunk[:, 1], np.where((counts > 0) & (means >= HIGH_RATING), means / 10, 0.0))
+
+    for chunk in _iter_chunks(Favorite.objects.all(), ['user_id', 'ai_id']):
+        add(chunk[:, 0], chunk[:, 1], np.full(len(chunk), FAVORITE_WEIGHT))
+
+    for reaction_type, weight in reaction_weights.items():
+        reactions = Reaction.objects.filter(reaction_type=reaction_type)
+        for chunk in _iter_chunks(reactions, ['user_id', 'ai_id']):
+            add(chunk[:, 0], chunk[:, 1], np.full(len(chunk), weight))
+
+    if not users:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0, np.float32)
+    return np.concatenate(users), np.concatenate(ais), np.concatenate(weights)
+
+
+def build_interaction_matrix(reaction_weights=REACTION_WEIGHTS):
+    """
+    构造 用户×AI 交互矩阵的CSR表示
+
+    返回 (user_ids, ai_ids, indptr, rows, cols, weights)：user_ids / ai_ids 为行、列对应的
+    用户ID和AI ID（均升序），第 u 个用户的交互为 cols/weights[indptr[u]:indptr[u+1]]，
+    rows 为每条交互所属的用户下标。reaction_weights 为空时只使用评分和收藏。
+    """
+    user_ids, ai_ids, weights = _load_interactions(reaction_weights)
+    ai_index_ids, cols = np.unique(ai_ids, return_inverse=True)
+    user_index_ids, rows = np.unique(user_ids, return_inverse=True)
+    n_ai = len(ai_index_ids)
+
+    # 合并同一(用户, AI)的多条交互；键按用户优先排序，得到CSR顺序
+    keys, inverse = np.unique(rows.astype(np.int64) * n_ai + cols, return_inverse=True)
+    weights = np.minimum(np.bincount(inverse, weights=weights), MAX_INTERACTION_WEIGHT).astype(np.float32)
+    rows = (keys // max(n_ai, 1)).astype(np.int32)
+    cols = (keys % max(n_ai, 1)).astype(np.int32)
+    n_users = int(rows[-1]) + 1 if len(rows) else 0
+    indptr = np.searchsorted(rows, np.arange(n_users + 1)).astype(np.int64)
+    return user_index_ids, ai_index_ids, indptr, rows, cols, weights
+
+
+def _cooccurrence_slab(indptr, rows, cols, weights, n_ai, start, stop, max_pairs):
+    """
+    计算 W^T W 的第 start:stop 列，返回 (加权共现, 共同用户数)，形状均为 (n_ai, stop - start)
+
+    对片内的每条交互 (u, j)，与用户 u 的全部交互 (u, i) 组成一对累加到 [i, j]；
+    共现对按块展开，每块不超过 max_pairs 对。
+    """
+    width = stop - start
+    dots = np.zeros(n_ai * width, dtype=np.float64)
+    common = np.zeros(n_ai * width, dtype=np.float64)
+
+    anchors = np.flatnonzero((cols >= start) & (cols < stop))
+    degrees = indptr[rows[anchors] + 1] - indptr[rows[anchors]]
+    ends = np.cumsum(degrees)
+    position = 0
+    while position < len(anchors):
+        done = ends[position - 1] if position else 0
+        end = max(int(np.searchsorted(ends, done + max_pairs, side='right')), position + 1)
+        block, block_degrees = anchors[position:end], degrees[position:end]
+        total = int(block_degrees.sum())
+
+        anchor = np.repeat(block, block_degrees)
+        offsets = np.arange(total) - np.repeat(np.cumsum(block_degrees) - block_degrees, block_degrees)
+        other = np.repeat(indptr[rows[block]], block_degrees) + offsets
+        cells = cols[other].astype(np.int64) * width + (cols[anchor] - start)
+        dots += np.bincount(cells, weights=weights[anchor].astype(np.float64) * weights[other], minlength=n_ai * width)
+        common += np.bincount(cells, minlength=n_ai * width)
+        position = end
+    return dots.reshape(n_ai, width), common.reshape(n_ai, width)
+
+
+def _top_neighbours(similarity, top_n):
+    """对相似度矩阵的每一列取前 top_n 个正值，返回每列的 [(行下标, 相似度), ...]"""
+    n_rows, width = similarity.shape
+    k = min(top_n, n_rows)
+    if k < n_rows:
+        candidates = np.argpartition(-similarity, k - 1, axis=0)[:k]
+    else:
+        candidates = np.broadcast_to(np.arange(n_rows)[:, None], (n_rows, width))
+    scores = np.take_along_axis(similarity, candidates, axis=0)
+    order = np.argsort(-scores, axis=0, kind='stable')
+    candidates = np.take_along_axis(candidates, order, axis=0)
+    scores = np.take_along_axis(scores, order, axis=0)
+    return [
+        [(int(row), float(score)) for row, score in zip(candidates[:, col], scores[:, col]) if score > 0]
+        for col in range(width)
+    ]
+
+
+def compute_similar_ais(top_n=SIMILAR_TOP_N, memory_mb=SIMILARITY_MEMORY_MB):
+    """
+    重新计算每个AI最相似的前 top_n 个AI并整体替换 SimilarAI 表，返回写入的行数
+
+    相似度为两个AI在交互矩阵中列向量的余弦相似度，共同用户少于 MIN_COMMON_USERS 的不计。
+    """
+    _, ai_ids, indptr, rows, cols, weights = build_interaction_matrix()
+    n_ai = len(ai_ids)
+    norms = np.sqrt(np.bincount(cols, weights=weights.astype(np.float64) ** 2, minlength=n_ai))
+
+    # 一半预算给分片累加矩阵（共现、共同用户数、相似度各8字节），一半给共现对展开（约64字节/对）
+    budget = int(memory_mb * 1024 * 1024) // 2
+    slab_width = max(1, budget // (24 * max(n_ai, 1)))
+    max_pairs = max(1, budget // 64)
+
+    similar = []
+    for start in range(0, n_ai, slab_width):
+        stop = min(start + slab_width, n_ai)
+        dots, common = _cooccurrence_slab(indptr, rows, cols, weights, n_ai, start, stop, max_pairs)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            similarity = dots / np.outer(norms, norms[start:stop])
+        similarity[(common < MIN_COMMON_USERS) | ~np.isfinite(similarity)] = 0
+        # 排除自身
+        similarity[np.arange(start, stop), np.arange(stop - start)] = 0
+        for offset, neighbours in enumerate(_top_neighbours(similarity, top_n)):
+            ai_id = int(ai_ids[start + offset])
+            similar.extend(
+                SimilarAI(ai_id=ai_id, similar_ai_id=int(ai_ids[row]), rank=rank, score=round(score, 6))
+                for rank, (row, score) in enumerate(neighbours, start=1)
+            )
+
+    with transaction.atomic():
+        SimilarAI.objects.all().delete()
+        SimilarAI.objects.bulk_create(similar, batch_size=1000)
+    return len(similar)
+
+
+def get_similar_ais(ai_id, limit):
+    """按 (ai, rank) 索引读取一个AI的前 limit 个相似AI，连同相似AI的基本信息一次查询取出"""
+    return list(
+        SimilarAI.objects.filter(ai_id=ai_id)
+        .select_related('similar_ai')
+        .only(
+            'rank', 'score', 'similar_ai__ai_id', 'similar_ai__name', 'similar_ai__developer',
+            'similar_ai__avg_score', 'similar_ai__rating_count',
+        )
+        .order_by('rank')[:limit]
+    )
@@ -0,0 +1,1296 @@
+import base64
+import json
+import random
+import tempfile
+import threading
+import time
+from io import StringIO
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import Count
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .aggregate_worker import process_dirty_ais, queue_stats
+from .aggregates import (
+    apply_rating_change, apply_rollup_change, rebuild_monthly_rollups, rebuild_score_histograms, rebuild_score_summaries,
+    rebuild_tag_counts, reconcile_reaction_counts, recompute_ai_aggregates, refresh_rating_aggregates, snapshot_scores,
+)
+from .cache import get_api_cache, get_catalogue_version
+from .models import (
+    AIModel, AIScoreSummary, AITag, AITagCount, Comment, CommentImage, CommentLike, DirtyAI, DirtyRankScores, Favorite, RankingScore,
+    Rating, RatingMonthlyRollup, Reaction, ScoreHistogram, SimilarAI, Tag, User, SCORE_BUCKETS, SCORE_FIELDS, comment_path_segment,
+)
+from .rankings import RANKING_BOARDS, _bayes_and_lower_bound, process_rank_scores, rebuild_rankings
+from .rating_import import _validate_rows
+from .recommender import _loaded, load_model, recommend_for_user, train_als, train_recommender
+from .search import parse_search_query, search_hits
+from .similarity import build_interaction_matrix, compute_similar_ais
+from .views import submit_rating, toggle_favorite, toggle_reaction
+
+
+# 测试使用进程内缓存，避免读写部署环境的文件缓存目录
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'api': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'rateai-api-test'},
+}
+
+
+def make_cursor(*payload):
+    """按分页游标的编码方式构造任意内容的游标，用于模拟客户端篡改"""
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+
+
+def create_users(count, prefix='user'):
+    password_hash = make_password('secret1')
+    return [
+        User.objects.create(username=f'{prefix}{i}', email=f'{prefix}{i}@example.com', password_hash=password_hash)
+        for i in range(count)
+    ]
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AIListQueryCountTests(TestCase):
+    """/api/ais/ 的查询次数不随AI数量增长"""
+
+    def setUp(self):
+        self.users = create_users(3)
+        self.tags = Tag.objects.bulk_create([Tag(tag_name=f'标签{i}') for i in range(3)])
+
+    def create_ais(self, count):
+        """批量创建带评分和标签的AI"""
+        start = AIModel.objects.count()
+        ais = AIModel.objects.bulk_create([AIModel(name=f'AI {start + i}') for i in range(count)])
+        Rating.objects.bulk_create([
+            Rating(user=user, ai=ai, overall_score=(ai.ai_id + index) % 11)
+            for ai in ais
+            for index, user in enumerate(self.users)
+        ])
+        AITag.objects.bulk_create([
+            AITag(ai=ai, tag=tag, user=self.users[0])
+            for ai in ais
+            for tag in self.tags
+        ])
+        AITagCount.objects.bulk_create([
+            AITagCount(ai=ai, tag=tag, count=1)
+            for ai in ais
+            for tag in self.tags
+        ])
+
+    def get(self, path):
+        """清空响应缓存后请求，保证每次都执行查询"""
+        return self.get_page(path)['results']
+
+    def get_page(self, path):
+        get_api_cache().clear()
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def assert_constant_queries(self, path, small=5, large=50):
+        """分别在 small 和 large 个AI时请求 path，两次的查询次数必须相同"""
+        AIModel.objects.all().delete()
+        self.create_ais(small)
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(len(self.get(path)), small)
+
+        self.create_ais(large - small)
+        with self.assertNumQueries(len(context.captured_queries)):
+            self.assertEqual(len(self.get(path)), large)
+
+    def test_paginated_list(self):
+        self.assert_constant_queries('/api/ais/?limit=100')
+
+    def test_default_page(self):
+        """不带 limit 时也分页，每页20条，按 next 翻页直到取完"""
+        self.create_ais(30)
+        page = self.get_page('/api/ais/')
+        self.assertEqual(len(page['results']), 20)
+        rest = self.get_page(page['next'])
+        self.assertEqual(len(rest['results']), 10)
+        self.assertIsNone(rest['next_cursor'])
+        ids = [ai['ai_id'] for ai in page['results'] + rest['results']]
+        self.assertEqual(ids, sorted(AIModel.objects.values_list('ai_id', flat=True)))
+
+    def test_filters(self):
+        self.create_ais(5)
+        ai = AIModel.objects.order_by('ai_id')[2]
+        ai.description = '擅长长文本处理和代码分析'
+        ai.save()
+        self.assertEqual([row['ai_id'] for row in self.get('/api/ais/?q=代码分析&fields=ai_id')], [ai.ai_id])
+        self.assertEqual(len(self.get(f'/api/ais/?ai_ids={ai.ai_id},{ai.ai_id + 1}')), 2)
+        self.assertEqual(len(self.get('/api/ais/?tags=标签1&limit=100')), 5)
+
+    def test_invalid_min_score(self):
+        for value in ['abc', 'NaN', 'sNaN', 'Infinity', '-inf']:
+            with self.subTest(min_score=value):
+                get_api_cache().clear()
+                self.assertEqual(self.client.get('/api/ais/', {'min_score': value}).status_code, 400)
+
+    def test_sparse_fields(self):
+        self.assert_constant_queries('/api/ais/?fields=ai_id,name,tags&limit=100')
+
+    def test_sparse_fields_skip_columns(self):
+        """?fields= 只读取请求的列，分页时额外读取排序字段"""
+        self.create_ais(3)
+        with CaptureQueriesContext(connection) as context:
+            data = self.get('/api/ais/?fields=name,overall_score&sort=score&limit=2')
+        self.assertEqual(set(data[0]), {'name', 'overall_score'})
+        sql = next(query['sql'] for query in context.captured_queries if 'FROM "backend_aimodel"' in query['sql'])
+        self.assertNotIn('"description"', sql)
+        self.assertIn('"avg_score"', sql)
+
+    def test_bad_cursor(self):
+        """篡改过的游标返回 404，而不是 500"""
+        self.create_ais(3)
+        cases = [
+            ('score', make_cursor('avg_score', {'a': 1}, 1)),
+            ('score', make_cursor('avg_score', [1], 1)),
+            ('score', make_cursor('avg_score', 'abc', 1)),
+            ('score', make_cursor('avg_score', 'NaN', 1)),
+            ('alpha', make_cursor('name', None, 1)),
+            ('alpha', make_cursor('name', 'AI 1', 'abc')),
+            ('alpha', make_cursor('name', 'AI 1', 1.5)),
+            ('rating_count', make_cursor('rating_count', 10 ** 30, 1)),
+            ('id', make_cursor('ai_id', 1)),
+            ('id', 'not-base64!'),
+        ]
+        for sort, cursor in cases:
+            with self.subTest(sort=sort, cursor=cursor):
+                get_api_cache().clear()
+                response = self.client.get('/api/ais/', {'sort': sort, 'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+        # 字符串形式的数字仍按字段类型解析
+        response = self.client.get('/api/ais/', {'sort': 'score', 'cursor': make_cursor('avg_score', '5.5', '3')})
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CounterConsistencyTests(TestCase):
+    """写入接口维护的计数与 COUNT(*) 一致"""
+
+    def setUp(self):
+        self.users = create_users(3)
+        self.ai = AIModel.objects.create(name='AI')
+
+    def post(self, user, path, data):
+        self.client.force_login(user)
+        response = self.client.post(path, {'ai_id': self.ai.ai_id, **data}, content_type='application/json')
+        self.assertLess(response.status_code, 400, response.content)
+        return response.json()
+
+    def assert_reaction_counters(self):
+        self.ai.refresh_from_db()
+        for reaction_type, field in Reaction.COUNTER_FIELDS.items():
+            self.assertEqual(getattr(self.ai, field), Reaction.objects.filter(ai=self.ai, reaction_type=reaction_type).count(), field)
+
+    def test_favorite_toggles(self):
+        for user, times in zip(self.users, [1, 2, 3]):
+            for _ in range(times):
+                self.post(user, '/api/favorites/', {})
+                self.ai.refresh_from_db()
+                self.assertEqual(self.ai.favorite_count, Favorite.objects.filter(ai=self.ai).count())
+        self.assertEqual(self.ai.favorite_count, 2)
+
+    def test_reaction_switches(self):
+        user, other = self.users[:2]
+        self.post(other, '/api/reactions/', {'reaction_type': 'thumbUp'})
+        for reaction_type in ['thumbUp', 'thumbDown', 'amazing', 'amazing', 'bad', 'thumbUp']:
+            self.post(user, '/api/reactions/', {'reaction_type': reaction_type})
+            self.assert_reaction_counters()
+        self.assertEqual(Reaction.objects.get(user=user, ai=self.ai).reaction_type, 'thumbUp')
+        self.assertEqual(self.ai.reactions_thumb_up, 2)
+
+    def test_reconcile_reaction_counts(self):
+        for user, reaction_type in zip(self.users, ['thumbUp', 'bad', 'bad']):
+            self.post(user, '/api/reactions/', {'reaction_type': reaction_type})
+        other = AIModel.objects.create(name='其他AI')
+        AIModel.objects.filter(pk=self.ai.pk).update(reactions_bad=0, reactions_amazing=5)
+        self.assertEqual(reconcile_reaction_counts(), 1)
+        self.assert_reaction_counters()
+        self.assertEqual((self.ai.reactions_thumb_up, self.ai.reactions_bad, self.ai.reactions_amazing), (1, 2, 0))
+        self.assertEqual(reconcile_reaction_counts([other.ai_id]), 0)
+        self.assertEqual(reconcile_reaction_counts(), 0)
+
+    def test_tag_counts(self):
+        def counts():
+            return dict(AITagCount.objects.filter(ai=self.ai, count__gt=0).values_list('tag__tag_name', 'count'))
+
+        for user, tag_names in zip(self.users, [['万能', '免费'], ['万能'], ['万能', '长文本']]):
+            for tag_name in tag_names:
+                self.post(user, '/api/tags/add/', {'tag_name': tag_name})
+        # 重复添加同一标签被拒绝，计数不变
+        self.client.force_login(self.users[0])
+        response = self.client.post('/api/tags/add/', {'ai_id': self.ai.ai_id, 'tag_name': '万能'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        expected = {'万能': 3, '免费': 1, '长文本': 1}
+        self.assertEqual(counts(), expected)
+        self.assertEqual(
+            dict(AITag.objects.filter(ai=self.ai).values('tag__tag_name').annotate(n=Count('pk')).values_list('tag__tag_name', 'n')),
+            expected,
+        )
+        get_api_cache().clear()
+        tags = self.client.get(f'/api/ais/?ai_ids={self.ai.ai_id}&fields=tags').json()['results'][0]['tags']
+        self.assertEqual([(tag['tag_name'], tag['count']) for tag in tags][0], ('万能', 3))
+        self.assertEqual({tag['tag_name']: tag['count'] for tag in tags}, expected)
+
+        # 后台删除标签关联后计数偏离，rebuild_tag_counts 按 AITag 表重建
+        AITag.objects.filter(ai=self.ai, tag__tag_name='万能', user=self.users[1]).delete()
+        rebuild_tag_counts([self.ai.ai_id])
+        self.assertEqual(counts(), {**expected, '万能': 2})
+        # 删除后重新添加，计数恢复
+        self.post(self.users[1], '/api/tags/add/', {'tag_name': '万能'})
+        self.assertEqual(counts(), expected)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CatalogueCacheTests(TestCase):
+    """AI列表的版本化响应缓存和ETag"""
+
+    def setUp(self):
+        get_api_cache().clear()
+        self.ai = AIModel.objects.create(name='AI')
+        self.tag = Tag.objects.create(tag_name='标签')
+        self.user = create_users(1)[0]
+
+    def get(self, etag=None):
+        response = self.client.get('/api/ais/', headers={'If-None-Match': etag} if etag else {})
+        self.assertIn(response.status_code, (200, 304))
+        return response
+
+    def assert_bumps(self, write):
+        """write 提交后目录版本号递增：下一次请求重新查询，并返回新的ETag"""
+        etag = self.get()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+        with CaptureQueriesContext(connection) as context:
+            response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertTrue(context.captured_queries)
+
+    def test_repeated_get_same_etag(self):
+        first = self.get()
+        with self.assertNumQueries(0):
+            second = self.get()
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertEqual(first.json(), second.json())
+
+    def test_if_none_match(self):
+        etag = self.get()['ETag']
+        with self.assertNumQueries(0):
+            response = self.get(etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        # 不同查询参数的ETag不同
+        self.assertEqual(self.client.get('/api/ais/?limit=5', headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_ai_save_bumps_version(self):
+        def write():
+            self.ai.name = 'AI 改名'
+            self.ai.save()
+        self.assert_bumps(write)
+
+    def test_tag_save_bumps_version(self):
+        def write():
+            self.tag.tag_name = '新标签'
+            self.tag.save()
+        self.assert_bumps(write)
+
+    def test_ai_tag_save_bumps_version(self):
+        self.assert_bumps(lambda: AITag.objects.create(ai=self.ai, tag=self.tag, user=self.user))
+
+    def test_rollback_keeps_version(self):
+        """事务回滚时不递增版本号（版本号在 on_commit 中递增）"""
+        etag = self.get()['ETag']
+        version = get_catalogue_version()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    self.ai.name = 'AI 改名'
+                    self.ai.save()
+                    raise RuntimeError('rollback')
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertEqual(get_catalogue_version(), version)
+        self.assertEqual(self.get(etag).status_code, 304)
+
+
+class IncrementalAggregateTests(TestCase):
+    """评分写入时增量维护的聚合数据与从评分表整体重建的结果相同"""
+
+    # 评分的创建月份，跨年且包含月末最后一秒
+    MONTHS = [
+        datetime(2025, 11, 30, 23, 59, 59, tzinfo=dt_timezone.utc),
+        datetime(2025, 12, 15, tzinfo=dt_timezone.utc),
+        datetime(2026, 1, 1, tzinfo=dt_timezone.utc),
+    ]
+
+    def setUp(self):
+        self.users = create_users(8)
+        self.ais = [AIModel.objects.create(name=f'AI {i}') for i in range(3)]
+
+    def write_rating(self, user, ai, created_at=None, **scores):
+        """与 submit_rating 相同：保存评分后按修改前后的分数增量更新汇总、直方图和按月汇总"""
+        rating = Rating.objects.filter(user=user, ai=ai).first()
+        old_scores = snapshot_scores(rating)
+        if rating is None:
+            rating = Rating.objects.create(user=user, ai=ai, **scores)
+            if created_at is not None:
+                Rating.objects.filter(pk=rating.pk).update(created_at=created_at)
+                rating.created_at = created_at
+        else:
+            for field, value in scores.items():
+                setattr(rating, field, value)
+            rating.save(update_fields=list(scores))
+        new_scores = snapshot_scores(rating)
+        apply_rating_change(ai.ai_id, old_scores, new_scores)
+        apply_rollup_change(ai.ai_id, rating.created_at, old_scores, new_scores)
+
+    def random_writes(self, count=300, seed=0):
+        """随机创建、修改和清空评分（分数为None即清空该维度）"""
+        rnd = random.Random(seed)
+        for _ in range(count):
+            scores = {field: rnd.choice([None, 0, 3, 7, 10]) for field in rnd.sample(SCORE_FIELDS, rnd.randint(1, 3))}
+            self.write_rating(rnd.choice(self.users), rnd.choice(self.ais), rnd.choice(self.MONTHS), **scores)
+
+    def test_summaries_match_rebuild(self):
+        self.random_writes(seed=2)
+        columns = ['ai_id', 'rated_count', *(f'{field}_{part}' for field in SCORE_FIELDS for part in ('sum', 'count'))]
+
+        def snapshot():
+            return set(AIScoreSummary.objects.values_list(*columns))
+        incremental = snapshot()
+        self.assertEqual(len(incremental), len(self.ais))
+        self.assertTrue(any(row[1] for row in incremental))
+        rebuild_score_summaries()
+        self.assertEqual(incremental, snapshot())
+
+    def test_monthly_rollups_match_rebuild(self):
+        self.random_writes()
+
+        def snapshot():
+            # 评分全部清空后增量维护会留下计数为0的行，重建时不会生成
+            return set(RatingMonthlyRollup.objects.filter(score_count__gt=0).values_list(
+                'ai_id', 'dimension', 'month', 'score_sum', 'score_count',
+            ))
+        incremental = snapshot()
+        self.assertEqual({row[2].month for row in incremental}, {11, 12, 1})
+        rebuild_monthly_rollups()
+        self.assertEqual(incremental, snapshot())
+
+    def histogram_snapshot(self):
+        # 评分全部清空后增量维护会留下全为0的行，重建时不会生成
+        return {
+            (histogram.ai_id, histogram.dimension): histogram.counts()
+            for histogram in ScoreHistogram.objects.all()
+            if any(histogram.counts())
+        }
+
+    def test_histograms_match_rebuild(self):
+        self.random_writes(seed=1)
+        incremental = self.histogram_snapshot()
+        self.assertTrue(all(len(counts) == len(SCORE_BUCKETS) == 11 for counts in incremental.values()))
+        rebuild_score_histograms()
+        self.assertEqual(incremental, self.histogram_snapshot())
+
+    def test_histogram_create_update_clear(self):
+        ai, user = self.ais[0], self.users[0]
+        self.write_rating(self.users[1], ai, overall_score=10)
+
+        def overall():
+            return ScoreHistogram.objects.get(ai=ai, dimension='overall_score').counts()
+
+        self.write_rating(user, ai, overall_score=3)
+        self.assertEqual(overall(), [0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 1])
+        self.write_rating(user, ai, overall_score=7)
+        self.assertEqual(overall(), [0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 1])
+        self.write_rating(user, ai, overall_score=None)
+        self.assertEqual(overall(), [0] * 10 + [1])
+        self.write_rating(user, ai, overall_score=0)
+        self.assertEqual(overall(), [1] + [0] * 9 + [1])
+
+        data = self.client.get(f'/api/ais/{ai.ai_id}/distribution/?dimension=overall_score').json()
+        self.assertEqual(data['distribution']['overall_score'], overall())
+        self.assertEqual(data['stats']['overall_score']['median'], 5.0)
+
+    def test_trend_endpoint(self):
+        ai = self.ais[0]
+        self.write_rating(self.users[0], ai, self.MONTHS[0], overall_score=6)
+        self.write_rating(self.users[1], ai, self.MONTHS[0], overall_score=9)
+        self.write_rating(self.users[2], ai, self.MONTHS[2], overall_score=4)
+        # 修改评分只影响评分创建的月份
+        self.write_rating(self.users[2], ai, overall_score=5)
+        data = self.client.get(f'/api/ais/{ai.ai_id}/trend/').json()
+        self.assertEqual(data['trend'], [
+            {'month': '2025-11', 'score': 7.5, 'count': 2},
+            {'month': '2026-01', 'score': 5.0, 'count': 1},
+        ])
+
+
+@override_settings(CACHES=TEST_CACHES, AGGREGATE_MODE='sync')
+class SubmitRatingTests(TestCase):
+    """submit_rating 增量维护的平均分和评分数量与从评分表重新计算的结果相同，查询次数与已有评分数无关"""
+
+    def setUp(self):
+        self.users = create_users(6)
+        self.ais = [AIModel.objects.create(name=f'AI {i}') for i in range(3)]
+
+    def rate(self, user, ai, **scores):
+        self.client.force_login(user)
+        response = self.client.post('/api/ratings/', {'ai_id': ai.ai_id, **scores}, content_type='application/json')
+        self.assertIn(response.status_code, (200, 201))
+        return response
+
+    def test_matches_recompute(self):
+        rnd = random.Random(3)
+        for _ in range(80):
+            scores = {field: rnd.choice([None, 1, 6, 9]) for field in rnd.sample(SCORE_FIELDS, rnd.randint(1, 3))}
+            self.rate(rnd.choice(self.users), rnd.choice(self.ais), **scores)
+        # 只有细则评分的AI按细则平均值计算平均分
+        detail_only = AIModel.objects.create(name='细则')
+        self.rate(self.users[0], detail_only, versatility_score=7, study_assistance_score=4)
+        self.rate(self.users[1], detail_only, versatility_score=9)
+        detail_only.refresh_from_db()
+        self.assertEqual((float(detail_only.avg_score), detail_only.rating_count), (6.0, 2))
+        self.assertEqual(recompute_ai_aggregates(dry_run=True), [])
+
+    def test_constant_queries(self):
+        small, large = self.ais[:2]
+        voters = create_users(300, prefix='voter')
+        Rating.objects.bulk_create(
+            [Rating(user=user, ai=small, overall_score=5) for user in voters[:2]]
+            + [Rating(user=user, ai=large, overall_score=5) for user in voters]
+        )
+        refresh_rating_aggregates([small.ai_id, large.ai_id])
+
+        self.client.force_login(self.users[0])
+        with CaptureQueriesContext(connection) as context:
+            self.rate(self.users[0], small, overall_score=8)
+        self.client.force_login(self.users[1])
+        with self.assertNumQueries(len(context.captured_queries)):
+            self.rate(self.users[1], large, overall_score=8)
+
+        large.refresh_from_db()
+        self.assertEqual(large.rating_count, 301)
+        self.assertEqual(float(large.avg_score), round((5 * 300 + 8) / 301, 1))
+
+
+@override_settings(
+    CACHES=TEST_CACHES, AGGREGATE_MODE='deferred', AGGREGATE_WORKER_THREAD=False,
+    AGGREGATE_MIN_DELAY=0, AGGREGATE_MAX_STALENESS=30,
+)
+class DeferredAggregateTests(TestCase):
+    """延迟聚合模式：评分写入只标记AI，worker每轮对每个AI只重算一次"""
+
+    def setUp(self):
+        self.users = create_users(5)
+        self.ai = AIModel.objects.create(name='AI')
+        self.other_ai = AIModel.objects.create(name='其他AI')
+        DirtyAI.objects.all().delete()
+
+    def rate(self, user, ai, **scores):
+        self.client.force_login(user)
+        response = self.client.post('/api/ratings/', {'ai_id': ai.ai_id, **scores}, content_type='application/json')
+        self.assertIn(response.status_code, (200, 201))
+
+    def test_ratings_merge_into_one_recompute(self):
+        for index, user in enumerate(self.users):
+            self.rate(user, self.ai, overall_score=index * 2)
+        self.rate(self.users[0], self.ai, overall_score=10)
+        self.assertEqual(list(DirtyAI.objects.values_list('ai_id', flat=True)), [self.ai.ai_id])
+        # 写入时没有更新汇总
+        self.ai.refresh_from_db()
+        self.assertEqual(self.ai.rating_count, 0)
+
+        with mock.patch('backend.aggregate_worker.refresh_rating_aggregates', wraps=refresh_rating_aggregates) as refresh:
+            self.assertEqual(process_dirty_ais(), 1)
+            self.assertEqual(process_dirty_ais(), 0)
+        refresh.assert_called_once_with([self.ai.ai_id])
+        self.assertFalse(DirtyAI.objects.exists())
+
+        # 分数为 10, 2, 4, 6, 8
+        self.ai.refresh_from_db()
+        self.assertEqual(self.ai.rating_count, 5)
+        self.assertEqual(float(self.ai.avg_score), 6.0)
+        summary = AIScoreSummary.objects.get(ai=self.ai)
+        self.assertEqual((summary.overall_score_sum, summary.overall_score_count), (30, 5))
+        self.assertEqual(RankingScore.objects.get(board='overall', ai=self.ai).score, 6.0)
+
+    def test_queue_stats(self):
+        stats = queue_stats()
+        self.assertEqual((stats['mode'], stats['depth'], stats['oldest_age']), ('deferred', 0, None))
+
+        self.rate(self.users[0], self.ai, overall_score=8)
+        self.rate(self.users[1], self.ai, overall_score=6)
+        self.rate(self.users[0], self.other_ai, overall_score=4)
+        DirtyAI.objects.filter(ai=self.ai).update(marked_at=timezone.now() - timedelta(seconds=5))
+        stats = queue_stats()
+        self.assertEqual(stats['depth'], 2)
+        self.assertGreaterEqual(stats['oldest_age'], 5)
+
+        # 只处理标记超过 min_delay 的AI
+        self.assertEqual(process_dirty_ais(min_delay=3), 1)
+        self.assertEqual(queue_stats()['depth'], 1)
+        self.assertEqual(process_dirty_ais(), 1)
+        self.assertEqual(queue_stats()['depth'], 0)
+
+    def test_stale_mark_recomputes_on_write(self):
+        """标记等待超过 AGGREGATE_MAX_STALENESS 后，下一次写入同步重算该AI"""
+        self.rate(self.users[0], self.ai, overall_score=8)
+        DirtyAI.objects.filter(ai=self.ai).update(marked_at=timezone.now() - timedelta(seconds=60))
+        self.rate(self.users[1], self.ai, overall_score=4)
+        self.assertFalse(DirtyAI.objects.exists())
+        self.ai.refresh_from_db()
+        self.assertEqual((self.ai.rating_count, float(self.ai.avg_score)), (2, 6.0))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RecomputeAggregatesCommandTests(TestCase):
+    """recompute_aggregates 命令找出并修复AI上冗余字段和评分汇总的偏差"""
+
+    def setUp(self):
+        users = create_users(4)
+        self.ais = [AIModel.objects.create(name=f'AI {i}') for i in range(3)]
+        for index, ai in enumerate(self.ais):
+            Rating.objects.bulk_create([Rating(user=user, ai=ai, overall_score=index + 5) for user in users[:index + 2]])
+            Favorite.objects.bulk_create([Favorite(user=user, ai=ai) for user in users[:index + 1]])
+            Reaction.objects.bulk_create([Reaction(user=user, ai=ai, reaction_type='thumbUp') for user in users[:2]])
+        # 评分等行是直接写入的，先修正一次作为基准
+        self.run_command()
+        self.expected = self.values()
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('recompute_aggregates', *args, stdout=out)
+        return out.getvalue()
+
+    def values(self):
+        return {
+            ai.ai_id: (float(ai.avg_score), ai.rating_count, ai.favorite_count, ai.reactions_thumb_up)
+            for ai in AIModel.objects.order_by('ai_id')
+        }
+
+    def corrupt(self):
+        AIModel.objects.filter(pk=self.ais[0].pk).update(favorite_count=99)
+        AIModel.objects.filter(pk=self.ais[1].pk).update(rating_count=0, reactions_thumb_up=7)
+        AIScoreSummary.objects.filter(ai=self.ais[1]).update(overall_score_sum=1000)
+
+    def test_baseline(self):
+        self.assertEqual(self.expected[self.ais[2].ai_id], (7.0, 4, 3, 2))
+        self.assertIn('成功修正 0 个AI', self.run_command())
+
+    def test_dry_run_reports_without_writing(self):
+        self.corrupt()
+        corrupted = self.values()
+        output = self.run_command('--dry-run')
+        self.assertIn(f'AI {self.ais[0].ai_id}（AI 0）：favorite_count 99 -> 1', output)
+        self.assertIn(f'AI {self.ais[1].ai_id}（AI 1）：rating_count 0 -> 3', output)
+        self.assertIn('共 2 个AI、3 个字段存在偏差（未写入）', output)
+        self.assertEqual(self.values(), corrupted)
+        self.assertEqual(AIScoreSummary.objects.get(ai=self.ais[1]).overall_score_sum, 1000)
+
+    def test_repairs(self):
+        self.corrupt()
+        output = self.run_command('--batch-size', '1')
+        self.assertIn('成功修正 2 个AI、3 个字段', output)
+        self.assertEqual(self.values(), self.expected)
+        self.assertEqual(AIScoreSummary.objects.get(ai=self.ais[1]).overall_score_sum, 18)
+        self.assertIn('共 0 个AI、0 个字段存在偏差', self.run_command('--dry-run'))
+
+    def test_ai_ids(self):
+        self.corrupt()
+        self.run_command('--ai-ids', str(self.ais[1].ai_id))
+        values = self.values()
+        self.assertEqual(values[self.ais[1].ai_id], self.expected[self.ais[1].ai_id])
+        self.assertEqual(values[self.ais[0].ai_id][2], 99)
+
+    def test_since(self):
+        self.corrupt()
+        old = timezone.now() - timedelta(days=30)
+        Rating.objects.exclude(ai=self.ais[0]).update(created_at=old)
+        Reaction.objects.exclude(ai=self.ais[0]).update(created_at=old)
+        since = (timezone.now() - timedelta(days=1)).date().isoformat()
+        self.run_command('--since', since)
+        values = self.values()
+        # 只有AI 0 在 since 之后有新评分或反应
+        self.assertEqual(values[self.ais[0].ai_id], self.expected[self.ais[0].ai_id])
+        self.assertEqual(values[self.ais[1].ai_id][1], 0)
+
+        future = (timezone.now() + timedelta(days=1)).isoformat()
+        self.assertIn('没有AI需要重算', self.run_command('--since', future))
+        with self.assertRaises(CommandError):
+            self.run_command('--since', 'yesterday')
+
+
+@override_settings(CACHES=TEST_CACHES, AGGREGATE_MODE='sync', RANK_SCORES_INTERVAL=None)
+class ConcurrentWriteTests(TransactionTestCase):
+    """多个线程同时切换收藏、反应和提交评分后，AI上的计数与实际行数、成功的请求次数一致"""
+
+    THREADS = 6
+    REQUESTS = 2000
+
+    def setUp(self):
+        self.users = create_users(12)
+        self.ai_ids = [AIModel.objects.create(name=f'AI {i}').ai_id for i in range(2)]
+        self.factory = APIRequestFactory()
+
+    def call(self, view, user, data, rnd):
+        """
+        直接调用视图（不经过session），被测的写入都在事务中，
+        SQLite 被锁时事务整体回滚，稍后重试
+        """
+        for attempt in range(100):
+            request = self.factory.post('/', data, format='json')
+            force_authenticate(request, user=user)
+            try:
+                response = view(request)
+            except OperationalError as error:
+                if 'locked' not in str(error):
+                    raise
+                time.sleep(rnd.random() * min(0.2, 0.002 * 2 ** attempt))
+                continue
+            finally:
+                connections.close_all()
+            self.assertLess(response.status_code, 400, response.data)
+            return response
+        self.fail('数据库持续被锁')
+
+    def worker(self, seed, errors, results):
+        rnd = random.Random(seed)
+        try:
+            for _ in range(self.REQUESTS // self.THREADS):
+                user = rnd.choice(self.users)
+                ai_id = rnd.choice(self.ai_ids)
+                op = rnd.random()
+                if op < 0.4:
+                    self.call(toggle_favorite, user, {'ai_id': ai_id}, rnd)
+                    results.append(('favorite', user.pk, ai_id, None))
+                elif op < 0.7:
+                    reaction_type = rnd.choice(['thumbUp', 'thumbDown', 'bad'])
+                    self.call(toggle_reaction, user, {'ai_id': ai_id, 'reaction_type': reaction_type}, rnd)
+                    results.append(('reaction', user.pk, ai_id, None))
+                else:
+                    scores = {field: rnd.choice([None, 1, 9]) for field in rnd.sample(SCORE_FIELDS, 3)}
+                    response = self.call(submit_rating, user, {'ai_id': ai_id, **scores}, rnd)
+                    results.append(('rating', user.pk, ai_id, response.status_code))
+        except BaseException as error:
+            errors.append(error)
+        finally:
+            connections.close_all()
+
+    def test_counters_match_rows(self):
+        errors, results = [], []
+        threads = [threading.Thread(target=self.worker, args=(seed, errors, results)) for seed in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        # 每个请求都成功返回
+        self.assertEqual(len(results), self.REQUESTS // self.THREADS * self.THREADS)
+
+        # 每次成功的收藏请求都切换一次状态：切换奇数次的 (用户, AI) 最终处于收藏状态
+        toggles = {}
+        for kind, user_id, ai_id, _ in results:
+            if kind == 'favorite':
+                toggles[user_id, ai_id] = toggles.get((user_id, ai_id), 0) + 1
+        favorited = {pair for pair, count in toggles.items() if count % 2}
+        self.assertEqual(set(Favorite.objects.values_list('user_id', 'ai_id')), favorited)
+        # 每个 (用户, AI) 恰好有一次评分请求返回 201（创建），其余都是更新
+        created = [(user_id, ai_id) for kind, user_id, ai_id, code in results if kind == 'rating' and code == 201]
+        self.assertEqual(len(created), len(set(created)))
+        self.assertEqual(
+            set(created),
+            {(user_id, ai_id) for kind, user_id, ai_id, _ in results if kind == 'rating'},
+        )
+        self.assertEqual(set(Rating.objects.values_list('user_id', 'ai_id')), set(created))
+        for ai in AIModel.objects.filter(ai_id__in=self.ai_ids):
+            self.assertEqual(ai.favorite_count, sum(1 for _, ai_id in favorited if ai_id == ai.ai_id))
+
+        for ai in AIModel.objects.filter(ai_id__in=self.ai_ids):
+            self.assertEqual(ai.favorite_count, Favorite.objects.filter(ai=ai).count())
+            for reaction_type, field in Reaction.COUNTER_FIELDS.items():
+                self.assertEqual(getattr(ai, field), Reaction.objects.filter(ai=ai, reaction_type=reaction_type).count())
+            self.assertEqual(
+                Reaction.objects.filter(ai=ai).count(),
+                Reaction.objects.filter(ai=ai).values('user').distinct().count(),
+            )
+
+        # 增量维护的评分汇总与从评分表重建的结果相同
+        def snapshot():
+            return {
+                summary.ai_id: [getattr(summary, f'{field}_{suffix}') for field in SCORE_FIELDS for suffix in ('sum', 'count')]
+                for summary in AIScoreSummary.objects.filter(ai_id__in=self.ai_ids)
+            }
+        incremental = snapshot()
+        rebuild_score_summaries(self.ai_ids)
+        self.assertEqual(incremental, snapshot())
+        for ai in AIModel.objects.select_related('score_summary').filter(ai_id__in=self.ai_ids):
+            self.assertEqual(ai.rating_count, ai.score_summary.rated_count)
+            self.assertEqual(float(ai.avg_score), ai.score_summary.avg_score())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CommentQueryCountTests(TestCase):
+    """评论相关接口的查询次数与评论数量无关（10 条和 10000 条评论时相同）"""
+
+    SMALL = 10
+    LARGE = 10000
+
+    def setUp(self):
+        self.user, self.other = create_users(2)
+        self.ai = AIModel.objects.create(name='AI')
+        response = self.client.post('/api/login/', {'username': self.user.username, 'password': 'secret1'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+    def create_comments(self, count, parents=None, user=None):
+        """
+        批量创建评论并写入物化路径；parents 为空时创建顶层评论，否则依次挂在 parents 的各条评论下
+        """
+        comments = Comment.objects.bulk_create([
+            Comment(
+                ai=self.ai,
+                user=user or self.user,
+                content=f'评论 {i}',
+                parent_comment=parents[i % len(parents)] if parents else None,
+            )
+            for i in range(count)
+        ])
+        for comment in comments:
+            parent = comment.parent_comment
+            comment.depth = parent.depth + 1 if parent else 0
+            comment.path = (parent.path if parent else '') + comment_path_segment(comment.comment_id)
+        Comment.objects.bulk_update(comments, ['path', 'depth'], batch_size=1000)
+        CommentImage.objects.bulk_create([CommentImage(comment=comment, url=f'/media/{comment.comment_id}.png') for comment in comments[::3]])
+        CommentLike.objects.bulk_create([CommentLike(user=self.user, comment=comment) for comment in comments[::2]])
+        return comments
+
+    def create_thread(self, root, count):
+        """在 root 下创建 count 条回复，每一批回复挂在上一批下面，形成多层嵌套"""
+        parents, created = [root], 0
+        while created < count:
+            batch = min(len(parents) * 2, count - created)
+            parents = self.create_comments(batch, parents)
+            created += batch
+
+    def assert_constant_queries(self, path, grow):
+        """SMALL 条评论时请求 path 记录查询次数，grow 把评论数增加到 LARGE 后查询次数必须相同"""
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.client.get(path).status_code, 200)
+        grow()
+        with self.assertNumQueries(len(context.captured_queries)):
+            self.assertEqual(self.client.get(path).status_code, 200)
+
+    def test_comment_thread(self):
+        root = self.create_comments(1)[0]
+        self.create_thread(root, self.SMALL)
+        self.assert_constant_queries(
+            f'/api/comments/{root.comment_id}/thread/',
+            lambda: self.create_thread(root, self.LARGE - self.SMALL),
+        )
+
+    def test_comment_thread_pages(self):
+        """按游标翻页取完整个回复串，每条回复恰好出现一次，且每页都能挂到根评论下"""
+        root = self.create_comments(1)[0]
+        self.create_thread(root, 50)
+        expected = list(
+            Comment.objects.filter(root.subtree_filter()).exclude(pk=root.pk).order_by('path').values_list('pk', flat=True)
+        )
+
+        def flatten(comment):
+            for reply in comment['replies']:
+                yield reply['comment_id']
+                yield from flatten(reply)
+
+        seen, cursor, pages = [], None, 0
+        while True:
+            path = f'/api/comments/{root.comment_id}/thread/?limit=7' + (f'&cursor={cursor}' if cursor else '')
+            data = self.client.get(path).json()
+            self.assertEqual(data['comment']['comment_id'], root.comment_id)
+            self.assertEqual(data['total_replies'], 50)
+            seen.extend(comment_id for comment_id in flatten(data['comment']) if comment_id not in seen)
+            pages += 1
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(seen, expected)
+        self.assertEqual(pages, 8)
+
+    def test_ai_comment_list(self):
+        roots = self.create_comments(self.SMALL)
+        self.create_comments(self.SMALL, roots)
+        self.assert_constant_queries(
+            f'/api/comments/?ai_id={self.ai.ai_id}',
+            lambda: self.create_comments(self.LARGE - self.SMALL, self.create_comments(self.LARGE - self.SMALL)),
+        )
+
+    def test_bad_cursor(self):
+        """created_at 无法解析的游标返回 404"""
+        self.create_comments(3)
+        params = {'ai_id': self.ai.ai_id}
+        page = self.client.get('/api/comments/', {**params, 'limit': 2}).json()
+        self.assertEqual(self.client.get('/api/comments/', {**params, 'cursor': page['next_cursor']}).status_code, 200)
+        for cursor in [make_cursor('created_at', 'notadate', 1), make_cursor('created_at', None, 1), make_cursor('created_at', 5, 1)]:
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get('/api/comments/', {**params, 'cursor': cursor}).status_code, 404)
+
+    def test_liked_per_user(self):
+        """liked 只反映当前用户的点赞；点赞再取消后点赞数回到原值"""
+        comment = Comment.objects.create(ai=self.ai, user=self.other, content='评论', path='', upvotes=3)
+        comment.path = comment_path_segment(comment.comment_id)
+        comment.save(update_fields=['path'])
+
+        def listed():
+            data = self.client.get('/api/comments/', {'ai_id': self.ai.ai_id}).json()
+            return next(row for row in data['results'] if row['comment_id'] == comment.comment_id)
+
+        self.assertFalse(listed()['liked'])
+        data = self.client.post(f'/api/comments/{comment.comment_id}/like/').json()
+        self.assertEqual((data['liked'], data['upvotes']), (True, 4))
+        self.assertEqual((listed()['liked'], listed()['upvotes']), (True, 4))
+
+        # 其他用户看到的是自己的点赞状态
+        self.client.force_login(self.other)
+        self.assertFalse(listed()['liked'])
+        self.client.post(f'/api/comments/{comment.comment_id}/like/')
+        self.assertTrue(listed()['liked'])
+        self.client.post(f'/api/comments/{comment.comment_id}/like/')
+        self.assertFalse(listed()['liked'])
+
+        self.client.force_login(self.user)
+        self.assertTrue(listed()['liked'])
+        data = self.client.post(f'/api/comments/{comment.comment_id}/like/').json()
+        self.assertEqual((data['liked'], data['upvotes']), (False, 3))
+        comment.refresh_from_db()
+        self.assertEqual(comment.upvotes, 3)
+        self.assertFalse(CommentLike.objects.filter(comment=comment).exists())
+
+        self.client.post('/api/logout/')
+        self.assertFalse(listed()['liked'])
+
+    def test_user_comments(self):
+        self.create_comments(self.SMALL)
+        self.create_comments(self.SMALL, user=self.other)
+        self.assert_constant_queries(
+            '/api/users/comments/',
+            lambda: self.create_comments(self.LARGE - self.SMALL),
+        )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class MyStateTests(TestCase):
+    """/api/me/state/ 一次返回当前用户自己的评分、反应、收藏和标签"""
+
+    def setUp(self):
+        self.user, self.other = create_users(2)
+        self.tag = Tag.objects.create(tag_name='标签')
+        self.client.post('/api/login/', {'username': self.user.username, 'password': 'secret1'}, content_type='application/json')
+
+    def add_rows(self, count):
+        """为两个用户各在 count 个新AI上写入评分、反应、收藏和标签"""
+        ais = AIModel.objects.bulk_create([AIModel(name=f'AI {i}') for i in range(count)])
+        for user, score, reaction_type in [(self.user, 8, 'thumbUp'), (self.other, 3, 'bad')]:
+            Rating.objects.bulk_create([Rating(user=user, ai=ai, overall_score=score) for ai in ais])
+            Reaction.objects.bulk_create([Reaction(user=user, ai=ai, reaction_type=reaction_type) for ai in ais])
+            Favorite.objects.bulk_create([Favorite(user=user, ai=ai) for ai in ais[::2]])
+            AITag.objects.bulk_create([AITag(user=user, ai=ai, tag=self.tag) for ai in ais[::3]])
+        return ais
+
+    def test_returns_own_rows(self):
+        ais = self.add_rows(6)
+        data = self.client.get('/api/me/state/').json()
+        self.assertEqual({int(ai_id) for ai_id in data['ratings']}, {ai.ai_id for ai in ais})
+        self.assertEqual({row['overall_score'] for row in data['ratings'].values()}, {8})
+        self.assertEqual(set(data['reactions'].values()), {'thumbUp'})
+        self.assertEqual(sorted(data['favorites']), [ai.ai_id for ai in ais[::2]])
+        self.assertEqual({int(ai_id): tags for ai_id, tags in data['tags'].items()}, {ai.ai_id: ['标签'] for ai in ais[::3]})
+
+        data = self.client.get(f'/api/me/state/?ai_ids={ais[0].ai_id}').json()
+        self.assertEqual(list(data['ratings']), [str(ais[0].ai_id)])
+
+    def test_constant_queries(self):
+        self.add_rows(3)
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.client.get('/api/me/state/').status_code, 200)
+        self.add_rows(300)
+        with self.assertNumQueries(len(context.captured_queries)):
+            data = self.client.get('/api/me/state/').json()
+        self.assertEqual(len(data['ratings']), 303)
+
+    def test_anonymous(self):
+        self.add_rows(2)
+        self.client.post('/api/logout/')
+        data = self.client.get('/api/me/state/').json()
+        self.assertEqual((data['ratings'], data['reactions'], data['favorites'], data['tags']), ({}, {}, [], {}))
+
+
+class SearchTests(TestCase):
+    """FTS5 索引由触发器与内容表同步；引号短语、短关键词和候选数上限"""
+
+    def ids(self, kind, query, **kwargs):
+        return [row_id for row_id, _ in search_hits(kind, query, limit=50, **kwargs)]
+
+    def test_ai_triggers(self):
+        ai = AIModel.objects.create(name='Orion', developer='星河实验室', description='擅长长文本摘要')
+        self.assertEqual(self.ids('ai', '星河实验室'), [ai.ai_id])
+        self.assertEqual(self.ids('ai', '长文本摘要'), [ai.ai_id])
+
+        ai.description = '擅长代码审查'
+        ai.save()
+        self.assertEqual(self.ids('ai', '长文本摘要'), [])
+        self.assertEqual(self.ids('ai', '代码审查'), [ai.ai_id])
+
+        # 绕过信号的批量写入同样由触发器同步
+        AIModel.objects.filter(pk=ai.pk).update(name='Vega')
+        self.assertEqual(self.ids('ai', 'Orion'), [])
+        self.assertEqual(self.ids('ai', 'Vega'), [ai.ai_id])
+        other = AIModel.objects.bulk_create([AIModel(name='Vega Pro')])[0]
+        self.assertEqual(set(self.ids('ai', 'Vega')), {ai.ai_id, other.ai_id})
+
+        ai.delete()
+        self.assertEqual(self.ids('ai', 'Vega'), [other.ai_id])
+
+    def test_comment_triggers(self):
+        user = create_users(1)[0]
+        ai, other_ai = AIModel.objects.create(name='AI'), AIModel.objects.create(name='其他AI')
+        comment = Comment.objects.create(ai=ai, user=user, content='翻译质量非常稳定')
+        Comment.objects.create(ai=other_ai, user=user, content='翻译质量一般')
+        self.assertEqual(len(self.ids('comment', '翻译质量')), 2)
+        self.assertEqual(self.ids('comment', '翻译质量', ai_id=ai.ai_id), [comment.comment_id])
+
+        Comment.objects.filter(pk=comment.pk).update(content='界面简洁')
+        self.assertEqual(self.ids('comment', '翻译质量', ai_id=ai.ai_id), [])
+        self.assertEqual(self.ids('comment', '界面简洁'), [comment.comment_id])
+        comment.delete()
+        self.assertEqual(self.ids('comment', '界面简洁'), [])
+
+    def test_quoted_phrases(self):
+        self.assertEqual(parse_search_query('"代码 分析" 长文本'), ('"代码 分析" "长文本"', []))
+        self.assertEqual(parse_search_query('Alpha" "a b'), ('"Alpha"', ['a', 'b']))
+        joined = AIModel.objects.create(name='A', description='擅长代码分析和长文本')
+        spaced = AIModel.objects.create(name='B', description='代码 分析，长文本')
+        self.assertEqual(self.ids('ai', '"代码 分析"'), [spaced.ai_id])
+        self.assertEqual(self.ids('ai', '"代码分析" 长文本'), [joined.ai_id])
+        self.assertEqual(set(self.ids('ai', '长文本')), {joined.ai_id, spaced.ai_id})
+
+    def test_short_terms_use_like(self):
+        self.assertEqual(parse_search_query('AI 图像生成'), ('"图像生成"', ['AI']))
+        first = AIModel.objects.create(name='画图AI', description='图像生成')
+        second = AIModel.objects.create(name='写作AI', description='长文本')
+        AIModel.objects.create(name='翻译', description='图像生成')
+        # 只有短关键词时按主键倒序，得分为0
+        self.assertEqual(search_hits('ai', '写作', limit=10), [(second.ai_id, 0.0)])
+        self.assertEqual(self.ids('ai', 'AI')[:2], [second.ai_id, first.ai_id])
+        # 长短关键词同时出现时两者都要匹配
+        self.assertEqual(self.ids('ai', 'AI 图像生成'), [first.ai_id])
+        # LIKE 的通配符按字面匹配
+        self.assertEqual(self.ids('ai', '%'), [])
+
+    def test_candidate_cap(self):
+        """命中超过 SEARCH_MAX_CANDIDATES 时只在最新的命中中排序"""
+        ais = AIModel.objects.bulk_create([AIModel(name=f'Nebula {i}') for i in range(12)])
+        with mock.patch('backend.search.SEARCH_MAX_CANDIDATES', 5):
+            hits = self.ids('ai', 'Nebula')
+            self.assertEqual(len(hits), 5)
+        self.assertEqual(set(hits), {ai.ai_id for ai in ais[-5:]})
+        self.assertEqual(len(self.ids('ai', 'Nebula')), 12)
+
+
+class RatingImportValidationTests(SimpleTestCase):
+    """批量导入评分的行校验"""
+
+    def test_rejects_fractional_ids(self):
+        valid, errors = _validate_rows([
+            {'user_id': 1.5, 'ai_id': 1, 'overall_score': 5},
+            {'user_id': 1, 'ai_id': 2.5, 'overall_score': 5},
+            {'user_id': 2.0, 'ai_id': '3', 'overall_score': 5},
+        ])
+        self.assertEqual([error['row'] for error in errors], [0, 1])
+        self.assertEqual(valid, [(2, 2, 3, {'overall_score': 5})])
+
+    def test_rejects_invalid_scores(self):
+        valid, errors = _validate_rows([
+            {'user_id': 1, 'ai_id': 1, 'overall_score': 7.5},
+            {'user_id': 1, 'ai_id': 1, 'overall_score': 11, 'versatility_score': True},
+            {'user_id': 1, 'ai_id': 1, 'overall_score': '', 'versatility_score': '8'},
+        ])
+        self.assertEqual([error['row'] for error in errors], [0, 1])
+        self.assertIn('overall_score, versatility_score', errors[1]['error'])
+        self.assertEqual(valid, [(2, 1, 1, {'overall_score': None, 'versatility_score': 8})])
+
+
+class HistogramPercentileTests(SimpleTestCase):
+    """直方图的中位数和百分位数与对展开后的分数调用 numpy.percentile 的结果一致"""
+
+    def histogram(self, counts):
+        return ScoreHistogram(**{f'bucket_{score}': count for score, count in zip(SCORE_BUCKETS, counts)})
+
+    def test_known_histograms(self):
+        histogram = self.histogram([0, 0, 0, 1, 0, 0, 0, 1, 0, 0, 2])
+        # 展开为 [3, 7, 10, 10]
+        self.assertEqual(histogram.median(), 8.5)
+        self.assertEqual(histogram.percentile(25), 6.0)
+        self.assertEqual(histogram.percentile(0), 3)
+        self.assertEqual(histogram.percentile(100), 10)
+
+        rnd = random.Random(0)
+        for _ in range(50):
+            counts = [rnd.choice([0, 0, 1, 2, 5, 40]) for _ in SCORE_BUCKETS]
+            if not any(counts):
+                continue
+            scores = np.repeat(SCORE_BUCKETS, counts)
+            histogram = self.histogram(counts)
+            for p in (0, 10, 25, 50, 75, 90, 100):
+                self.assertAlmostEqual(histogram.percentile(p), float(np.percentile(scores, p)), places=2)
+
+    def test_empty_histogram(self):
+        histogram = self.histogram([0] * 11)
+        self.assertIsNone(histogram.median())
+        self.assertIsNone(histogram.percentile(90))
+
+    def test_single_bucket(self):
+        for score in (0, 6, 10):
+            counts = [0] * 11
+            counts[score] = 7
+            histogram = self.histogram(counts)
+            for p in (0, 10, 50, 90, 100):
+                self.assertEqual(histogram.percentile(p), score)
+        # 只有一条评分
+        self.assertEqual(self.histogram([0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0]).median(), 4)
+
+
+class RankScoreMathTests(SimpleTestCase):
+    """贝叶斯收缩均值和Wilson置信下界与手算结果一致（满分10，z=1.96）"""
+
+    def assert_scores(self, sums, counts, bayes, lower):
+        actual_bayes, actual_lower = _bayes_and_lower_bound(np.array(sums, dtype=float), np.array(counts, dtype=float))
+        for actual, expected in zip(actual_bayes.tolist() + actual_lower.tolist(), bayes + lower):
+            self.assertAlmostEqual(actual, expected, places=6)
+
+    def test_no_ratings(self):
+        self.assert_scores([0, 0], [0, 0], [0, 0], [0, 0])
+
+    def test_single_rating(self):
+        # 先验均值8、先验权重1：(1*8 + 8) / (1 + 1) = 8
+        # p=0.8, n=1：(0.8 + 1.9208 - 1.96*sqrt(0.16 + 0.9604)) / 4.8416 * 10
+        self.assert_scores([8], [1], [8.0], [1.334601371463563])
+
+    def test_several_ais(self):
+        # 先验均值 58/7，先验权重 (2+5)/2=3.5，3.5*58/7 = 29
+        # 第一个AI：(29 + 18) / 5.5；第二个：(29 + 40) / 8.5；没有评分的AI为0
+        self.assert_scores(
+            [18, 40, 0], [2, 5, 0],
+            [47 / 5.5, 69 / 8.5, 0],
+            [2.786437882024584, 3.7552826411853886, 0],
+        )
+
+
+@override_settings(CACHES=TEST_CACHES, AGGREGATE_MODE='sync')
+class RankScoreWorkerTests(TestCase):
+    """评分写入只标记贝叶斯得分需要重算，由worker合并计算"""
+
+    def setUp(self):
+        self.user = create_users(1)[0]
+        self.ai = AIModel.objects.create(name='AI')
+        self.client.post('/api/login/', {'username': self.user.username, 'password': 'secret1'}, content_type='application/json')
+
+    def bayes(self, board='overall'):
+        return RankingScore.objects.get(board=board, ai=self.ai).bayes_score
+
+    def test_rating_only_marks(self):
+        DirtyRankScores.objects.all().delete()
+        response = self.client.post('/api/ratings/', {'ai_id': self.ai.ai_id, 'overall_score': 8}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(DirtyRankScores.objects.count(), 1)
+        self.assertEqual(self.bayes(), 0)
+
+        # 标记未超过间隔时不计算
+        self.assertIsNone(process_rank_scores(min_interval=3600))
+        self.assertEqual(self.bayes(), 0)
+
+        self.assertTrue(process_rank_scores(min_interval=0))
+        self.assertFalse(DirtyRankScores.objects.exists())
+        self.assertAlmostEqual(self.bayes(), 8.0)
+        self.assertIsNone(process_rank_scores(min_interval=0))
+
+    def test_overall_uses_average_score_basis(self):
+        """没有总评分时，综合榜的贝叶斯得分与原始得分一样来自细则评分"""
+        other = create_users(1, prefix='other')[0]
+        for user, scores in [(self.user, {'versatility_score': 6, 'study_assistance_score': 9}), (other, {'versatility_score': 8})]:
+            self.client.force_login(user)
+            self.client.post('/api/ratings/', {'ai_id': self.ai.ai_id, **scores}, content_type='application/json')
+        process_rank_scores(min_interval=0)
+        self.ai.refresh_from_db()
+        # 细则平均 (7 + 9) / 2 = 8；只有一个AI时先验就是它自己，收缩后不变
+        self.assertEqual(float(self.ai.avg_score), 8.0)
+        self.assertAlmostEqual(self.bayes(), 8.0)
+        self.assertGreater(RankingScore.objects.get(board='overall', ai=self.ai).lower_bound, 0)
+
+
+@override_settings(CACHES=TEST_CACHES, AGGREGATE_MODE='sync')
+class RankingTests(TestCase):
+    """评分写入时增量维护的榜单得分与整体重建的结果相同，榜单按所选得分排序"""
+
+    def setUp(self):
+        self.users = create_users(6)
+        self.ais = [
+            AIModel.objects.create(name=f'AI {i}', price_text='免费' if i % 2 else '付费')
+            for i in range(4)
+        ]
+
+    def rate(self, user, ai, **scores):
+        self.client.force_login(user)
+        response = self.client.post('/api/ratings/', {'ai_id': ai.ai_id, **scores}, content_type='application/json')
+        self.assertIn(response.status_code, (200, 201))
+
+    def snapshot(self):
+        return set(RankingScore.objects.values_list('board', 'ai_id', 'score', 'bayes_score', 'lower_bound'))
+
+    def test_scores_match_rebuild(self):
+        rnd = random.Random(0)
+        for _ in range(60):
+            scores = {field: rnd.choice([None, 2, 5, 8, 10]) for field in rnd.sample(SCORE_FIELDS, rnd.randint(1, 3))}
+            self.rate(rnd.choice(self.users), rnd.choice(self.ais), **scores)
+        process_rank_scores(min_interval=0)
+        incremental = self.snapshot()
+        self.assertEqual(len(incremental), len(self.ais) * len(RANKING_BOARDS))
+        self.assertTrue(any(row[3] for row in incremental))
+        rebuild_rankings()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_board_order(self):
+        first, second, third, unrated = self.ais
+        self.rate(self.users[0], first, overall_score=10)
+        for user in self.users[:3]:
+            self.rate(user, second, overall_score=9)
+        for user in self.users[:2]:
+            self.rate(user, third, overall_score=4)
+        process_rank_scores(min_interval=0)
+
+        def ranking(order):
+            data = self.client.get(f'/api/rankings/overall/?order={order}').json()
+            return [(entry['rank'], entry['ai_id'], entry['score']) for entry in data['results']]
+        # 原始平均分 10 > 9 > 4，没有评分的AI得分为0排在最后
+        self.assertEqual(ranking('score'), [
+            (1, first.ai_id, 10.0), (2, second.ai_id, 9.0), (3, third.ai_id, 4.0), (4, unrated.ai_id, 0.0),
+        ])
+        # 先验均值 45/6=7.5、先验权重2：(15+10)/3 ≈ 8.33 < (15+27)/5 = 8.4，只有一条评分的AI排到第二
+        data = self.client.get('/api/rankings/overall/?order=bayes').json()
+        self.assertEqual([entry['ai_id'] for entry in data['results']], [second.ai_id, first.ai_id, third.ai_id, unrated.ai_id])
+        self.assertEqual([entry['bayes_score'] for entry in data['results']], [8.4, 8.33, 5.75, 0.0])
+        self.assertEqual(self.client.get('/api/rankings/overall/?order=bad').status_code, 400)
+        self.assertEqual(self.client.get('/api/rankings/unknown/').status_code, 404)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SimilarAITests(TestCase):
+    """compute_similar_ais 在手工构造的小数据上得到手算的余弦相似度和排序"""
+
+    def setUp(self):
+        users = create_users(5)
+        self.a, self.b, self.c, self.d = [AIModel.objects.create(name=name) for name in 'ABCD']
+        for user, ais in [(0, 'ab'), (1, 'ab'), (2, 'ac'), (3, 'cd'), (4, 'ac')]:
+            for ai in ais:
+                Favorite.objects.create(user=users[user], ai=getattr(self, ai))
+        # 评分平均分 8 权重0.8，与收藏相加；点赞权重0.5
+        Rating.objects.create(user=users[2], ai=self.c, overall_score=8)
+        Reaction.objects.create(user=users[4], ai=self.c, reaction_type='thumbUp')
+        # 低分评分和点踩不算交互，否则 B 与 D 会有两个共同用户、A 与 B 的相似度会变化
+        Rating.objects.create(user=users[0], ai=self.d, overall_score=3)
+        Rating.objects.create(user=users[1], ai=self.d, versatility_score=5)
+        Reaction.objects.create(user=users[2], ai=self.b, reaction_type='thumbDown')
+
+    def similar(self):
+        rows = SimilarAI.objects.order_by('ai_id', 'rank').values_list('ai_id', 'rank', 'similar_ai_id', 'score')
+        return [(ai_id, rank, similar_ai_id, round(score, 5)) for ai_id, rank, similar_ai_id, score in rows]
+
+    def test_known_fixture(self):
+        # A=(1,1,1,0,1)、B=(1,1,0,0,0)、C=(0,0,1.8,1,1.5)、D=(0,0,0,1,0)
+        # cos(A,B) = 2/(2*sqrt(2))；cos(A,C) = 3.3/(2*sqrt(6.49))；C与D只有一个共同用户，不计
+        a, b, c = self.a.ai_id, self.b.ai_id, self.c.ai_id
+        self.assertEqual(compute_similar_ais(), 4)
+        expected = [(a, 1, b, 0.70711), (a, 2, c, 0.64768), (b, 1, a, 0.70711), (c, 1, a, 0.64768)]
+        self.assertEqual(self.similar(), expected)
+
+        # 内存预算很小时逐个AI分片、共现对逐条展开，结果相同
+        self.assertEqual(compute_similar_ais(memory_mb=0.0001), 4)
+        self.assertEqual(self.similar(), expected)
+
+        self.assertEqual(compute_similar_ais(top_n=1), 3)
+        self.assertEqual(self.similar(), [expected[0], expected[2], expected[3]])
+
+    def test_endpoint(self):
+        compute_similar_ais()
+        data = self.client.get(f'/api/ais/{self.a.ai_id}/similar/').json()
+        self.assertEqual([(row['rank'], row['ai_id']) for row in data['results']], [(1, self.b.ai_id), (2, self.c.ai_id)])
+        self.assertEqual(self.client.get(f'/api/ais/{self.d.ai_id}/similar/').json()['results'], [])
+        self.assertEqual(self.client.get('/api/ais/999999/similar/').status_code, 404)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RecommenderTests(TestCase):
+    """train_recommender 保存的模型经 load_model 读回后与训练结果相同，推荐排除已交互的AI"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(RECOMMENDER_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # 版本名按秒生成，不同测试的临时目录可能出现同名版本，清空进程内已打开的模型
+        patcher = mock.patch.dict(_loaded, {'version': None, 'model': None})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.users = create_users(6)
+        self.ais = [AIModel.objects.create(name=name) for name in 'ABCDE']
+        # 两组用户：前四个喜欢 A、B、C（第一个还没接触 C），后两个喜欢 D、E
+        a, b, c, d, e = self.ais
+        for user, ais in zip(self.users, [(a, b), (a, b, c), (a, b, c), (a, b, c), (d, e), (d, e)]):
+            for ai in ais:
+                Favorite.objects.create(user=user, ai=ai)
+        Rating.objects.create(user=self.users[1], ai=c, overall_score=9)
+
+    def test_round_trip(self):
+        self.assertIsNone(load_model())
+        version, users, ais, interactions = train_recommender(factors=4)
+        self.assertEqual((users, ais, interactions), (6, 5, 15))
+
+        # 读回的数组与在同一交互矩阵上重新训练的结果完全相同
+        user_ids, ai_ids, indptr, rows, cols, weights = build_interaction_matrix(reaction_weights={})
+        user_factors, item_factors = train_als(indptr, rows, cols, weights, n_items=len(ai_ids), factors=4)
+        model = load_model()
+        self.assertEqual(_loaded['version'], version)
+        np.testing.assert_array_equal(model['user_ids'], user_ids)
+        np.testing.assert_array_equal(model['ai_ids'], ai_ids)
+        np.testing.assert_array_equal(model['user_factors'], user_factors)
+        np.testing.assert_array_equal(model['item_factors'], item_factors)
+
+    def test_recommend_for_user(self):
+        train_recommender(factors=4)
+        a, b, c, d, e = [ai.ai_id for ai in self.ais]
+        user = self.users[0].user_id
+
+        results = recommend_for_user(user, 5, [a, b, 999999])
+        self.assertEqual([ai_id for ai_id, _ in results][:1], [c])
+        self.assertEqual({ai_id for ai_id, _ in results}, {c, d, e})
+        self.assertEqual([score for _, score in results], sorted((score for _, score in results), reverse=True))
+        self.assertEqual(recommend_for_user(user, 1, [a, b]), results[:1])
+        self.assertIsNone(recommend_for_user(create_users(1, prefix='new')[0].user_id, 5))
+
+        # 接口排除已收藏的AI
+        self.client.force_login(self.users[0])
+        data = self.client.get('/api/me/recommendations/?limit=1').json()
+        self.assertTrue(data['personalized'])
+        self.assertEqual([row['ai_id'] for row in data['results']], [c])
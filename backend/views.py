@@ -1,20 +1,113 @@
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from django.contrib.auth import login as django_login, logout as django_logout
 from django.contrib.auth.hashers import check_password
 from django.http import JsonResponse
 from django.shortcuts import redirect
 
-from .models import AIModel, Comment, User, Rating, Favorite, Tag, AITag, Reaction
-from .serializers import AIModelSerializer, CommentSerializer, UserSerializer, UserPublicSerializer, RatingSerializer
-from django.db import transaction
+from .cache import VersionedCacheMixin, bump_catalogue_version
+from .comment_threads import COMMENT_THREAD_MAX_LIMIT, COMMENT_THREAD_PAGE_SIZE, build_comment_tree, count_comment_replies, create_comment, decode_path_cursor, encode_path_cursor, get_comment_subtree, with_reply_preview
+from .aggregates import apply_rating_change, apply_rollup_change, snapshot_scores
+from .aggregate_worker import aggregates_deferred, defer_rating_aggregates, queue_stats
+from .models import AIModel, Comment, CommentLike, User, Rating, RatingMonthlyRollup, ScoreHistogram, Favorite, Tag, AITag, AITagCount, Reaction, COMMENT_MAX_DEPTH, SCORE_FIELDS
+from .pagination import AlwaysKeysetPagination
+from .rating_import import import_ratings
+from .recommender import recommend_for_user
+from .rankings import RANKING_BOARDS, RANKING_ORDERS, RANKING_TOP_K, get_ranking_page, update_ai_rankings
+from .search import SEARCH_INDEXES, SEARCH_MAX_CANDIDATES, SEARCH_MAX_LIMIT, search_hits
+from .similarity import SIMILAR_TOP_N, get_similar_ais
+from .serializers import AIModelSerializer, CommentSerializer, CommentThreadSerializer, UserSerializer, UserPublicSerializer, RatingSerializer, get_sparse_fields
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.db.models.functions import Greatest
+from decimal import Decimal, InvalidOperation
 
 
-class AIModelList(generics.ListAPIView):
-    queryset = AIModel.objects.all()
+class AIModelList(VersionedCacheMixin, generics.ListAPIView):
+    """
+    AI列表，支持服务端筛选、排序和游标分页
+
+    查询参数：
+        q          按名称、开发商、标签名或简介（全文索引）搜索
+        tags       逗号分隔的标签名，命中任意一个即可
+        min_score  最低平均分
+        ai_ids     逗号分隔的AI ID，只返回这些AI
+        sort       id（默认）、alpha（按名称）、rating_count（按评分人数）、score（按平均分）
+        cursor     上一页返回的 next_cursor
+        limit      每页数量，默认20，最多100
+        fields     只返回指定字段（逗号分隔），未请求的字段不会查询
+        exclude    排除指定字段（逗号分隔）
+
+    响应按目录版本号缓存并带有ETag，If-None-Match 命中时返回304。
+    """
     serializer_class = AIModelSerializer
+    # 目录会持续增长，总是分页，不再一次返回全部AI
+    pagination_class = AlwaysKeysetPagination
+    cache_namespace = 'ais'
+    # 列表内容与当前用户无关，不做认证以免读取session和用户表
+    authentication_classes = []
+
+    # 排序方式 -> (排序字段, 是否降序)，每个字段都有 (字段, ai_id) 组合索引
+    SORT_OPTIONS = {
+        'id': ('ai_id', False),
+        'alpha': ('name', False),
+        'rating_count': ('rating_count', True),
+        'score': ('avg_score', True),
+    }
+    DEFAULT_SORT = 'id'
+
+    def get_sort(self, request):
+        sort = request.query_params.get('sort') or self.DEFAULT_SORT
+        if sort not in self.SORT_OPTIONS:
+            raise ValidationError({'error': f'sort 必须是以下之一：{", ".join(self.SORT_OPTIONS)}'})
+        return self.SORT_OPTIONS[sort]
+
+    def get_queryset(self):
+        """评分平均值和反应数量在同一条SQL中注解，标签统计由序列化器按页批量查询"""
+        params = self.request.query_params
+        qs = AIModel.objects.all()
+
+        search = params.get('q', '').strip()
+        if search:
+            # 简介只通过全文索引匹配，避免对长文本逐行做 LIKE
+            text_hits = [ai_id for ai_id, _ in search_hits('ai', search, 0, SEARCH_MAX_CANDIDATES)]
+            qs = qs.filter(
+                Q(name__icontains=search) |
+                Q(developer__icontains=search) |
+                Q(ai_id__in=text_hits) |
+                Exists(AITagCount.objects.filter(ai=OuterRef('pk'), count__gt=0, tag__tag_name__icontains=search))
+            )
+
+        raw_ids = params.get('ai_ids', '').strip()
+        if raw_ids:
+            try:
+                qs = qs.filter(ai_id__in=[int(ai_id) for ai_id in raw_ids.split(',') if ai_id.strip()])
+            except ValueError:
+                raise ValidationError({'error': 'ai_ids 必须是逗号分隔的整数'})
+
+        tag_names = [name.strip() for name in params.get('tags', '').split(',') if name.strip()]
+        if tag_names:
+            qs = qs.filter(Exists(AITagCount.objects.filter(ai=OuterRef('pk'), count__gt=0, tag__tag_name__in=tag_names)))
+
+        min_score = params.get('min_score')
+        if min_score:
+            try:
+                min_score = Decimal(min_score)
+            except InvalidOperation:
+                raise ValidationError({'error': 'min_score 必须是数字'})
+            # NaN、Infinity 也能被 Decimal 解析，但无法用于比较
+            if not min_score.is_finite():
+                raise ValidationError({'error': 'min_score 必须是数字'})
+            qs = qs.filter(avg_score__gte=min_score)
+
+        sort_field, descending = self.get_sort(self.request)
+        prefix = '-' if descending else ''
+        qs = qs.order_by(*dict.fromkeys([f'{prefix}{sort_field}', f'{prefix}ai_id']))
+        fields = get_sparse_fields(params, AIModelSerializer.Meta.fields)
+        return AIModelSerializer.setup_eager_loading(qs, fields, extra_columns=[sort_field])
     
     def get_serializer_context(self):
         """传递request到序列化器，以便获取当前用户"""
@@ -23,13 +116,111 @@ class AIModelList(generics.ListAPIView):
         return context
 
 
-class CommentList(generics.ListAPIView):
+class AIModelDetail(generics.RetrieveAPIView):
+    """单个AI的详情（评分、标签、反应数量），支持 ?fields= / ?exclude="""
+    serializer_class = AIModelSerializer
+    lookup_field = 'ai_id'
+
+    def get_queryset(self):
+        fields = get_sparse_fields(self.request.query_params, AIModelSerializer.Meta.fields)
+        return AIModelSerializer.setup_eager_loading(AIModel.objects.all(), fields)
+
+
+class AICommentList(generics.ListAPIView):
+    """单个AI的评论，按发布时间倒序，游标分页（cursor / limit）"""
     serializer_class = CommentSerializer
+    pagination_class = AlwaysKeysetPagination
+
+    def get_sort(self, request):
+        return 'created_at', True
 
     def get_queryset(self):
-        qs = Comment.objects.select_related('ai', 'user', 'parent_comment')
-        ai_id = self.request.query_params.get('ai_id')
-        return qs.filter(ai_id=ai_id) if ai_id else qs
+        ai_id = self.kwargs['ai_id']
+        if not AIModel.objects.filter(ai_id=ai_id).exists():
+            raise NotFound('AI不存在')
+        return Comment.objects.filter(ai_id=ai_id).select_related('ai', 'user').prefetch_related('images')
+
+
+class CommentList(generics.ListAPIView):
+    """
+    某个AI的评论（必须提供 ?ai_id=），游标分页（cursor / limit）
+
+    默认返回顶层评论，按发布时间倒序，每条附带回复总数和最早的几条回复；
+    ?parent_id= 返回某条评论的回复，按发布时间正序。
+    """
+    serializer_class = CommentThreadSerializer
+    pagination_class = AlwaysKeysetPagination
+
+    def get_sort(self, request):
+        return 'created_at', 'parent_id' not in request.query_params
+
+    def get_queryset(self):
+        params = self.request.query_params
+        try:
+            ai_id = int(params['ai_id'])
+            parent_id = int(params['parent_id']) if 'parent_id' in params else None
+        except KeyError:
+            raise ValidationError({'error': '请提供 ai_id'})
+        except ValueError:
+            raise ValidationError({'error': 'ai_id 和 parent_id 必须是整数'})
+        if not AIModel.objects.filter(ai_id=ai_id).exists():
+            raise NotFound('AI不存在')
+
+        # 两种情况都按 (ai, parent_comment, created_at) 索引读取
+        qs = Comment.objects.filter(ai_id=ai_id, parent_comment_id=parent_id).select_related('ai', 'user')
+        return with_reply_preview(qs)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_comment_thread(request, comment_id):
+    """
+    获取一条评论及其回复（嵌套的 replies），回复按发布时间正序，游标分页
+
+    子树按物化路径做范围查询、按 path 顺序分页（?limit= 默认100、最多500，?cursor= 为上一页的
+    next_cursor），图片一条查询预取，在服务端一次遍历组装成树。翻页返回的树只包含本页的回复
+    和它们的上级评论，客户端按ID合并；total_replies 为子树中全部回复的数量。
+    """
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', COMMENT_THREAD_PAGE_SIZE)), COMMENT_THREAD_MAX_LIMIT))
+    except ValueError:
+        return Response(
+            {'error': 'limit 必须是整数'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    root = Comment.objects.filter(comment_id=comment_id).only('path').first()
+    if root is None:
+        return Response(
+            {'error': '评论不存在'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    after = None
+    cursor = request.query_params.get('cursor')
+    if cursor:
+        after = decode_path_cursor(cursor)
+        if after is None or not after.startswith(root.path):
+            return Response(
+                {'error': '无效的游标'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    
+    nodes, has_more = get_comment_subtree(root, limit, after)
+    thread = build_comment_tree(nodes, comment_id)
+    if thread is None:
+        return Response(
+            {'error': '评论不存在'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    serializer = CommentThreadSerializer(thread, context={'request': request})
+    return Response({
+        'success': True,
+        'total_replies': count_comment_replies(root),
+        'next_cursor': encode_path_cursor(nodes[-1].path) if has_more else None,
+        'comment': serializer.data
+    })
 
 
 @api_view(['POST'])
@@ -163,36 +354,39 @@ def toggle_favorite(request):
     # 从session中获取当前登录用户
     user = request.user
     
-    try:
-        ai = AIModel.objects.get(ai_id=ai_id)
-    except AIModel.DoesNotExist:
-        return Response(
-            {'error': 'AI不存在'},
-            status=status.HTTP_404_NOT_FOUND
-        )
-    
-    # 检查是否已收藏
-    favorite, created = Favorite.objects.get_or_create(user=user, ai=ai)
+    with transaction.atomic():
+        # 直接删除已有收藏，删除成功即为取消收藏；计数用 F() 原子更新
+        deleted, _ = Favorite.objects.filter(user=user, ai_id=ai_id).delete()
+        if deleted:
+            AIModel.objects.filter(ai_id=ai_id).update(favorite_count=Greatest(F('favorite_count') - 1, 0))
+            result = {
+                'success': True,
+                'is_favorite': False,
+                'message': '已取消收藏'
+            }
+        else:
+            if not AIModel.objects.filter(ai_id=ai_id).exists():
+                return Response(
+                    {'error': 'AI不存在'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            try:
+                with transaction.atomic():
+                    Favorite.objects.create(user=user, ai_id=ai_id)
+            except IntegrityError:
+                # 同一用户的并发请求已经收藏，计数已由该请求增加
+                pass
+            else:
+                AIModel.objects.filter(ai_id=ai_id).update(favorite_count=F('favorite_count') + 1)
+            result = {
+                'success': True,
+                'is_favorite': True,
+                'message': '收藏成功'
+            }
+        
+        bump_catalogue_version()
     
-    if not created:
-        # 如果已存在，则取消收藏
-        favorite.delete()
-        ai.favorite_count = max(0, ai.favorite_count - 1)
-        ai.save()
-        return Response({
-            'success': True,
-            'is_favorite': False,
-            'message': '已取消收藏'
-        })
-    else:
-        # 新增收藏
-        ai.favorite_count = (ai.favorite_count or 0) + 1
-        ai.save()
-        return Response({
-            'success': True,
-            'is_favorite': True,
-            'message': '收藏成功'
-        })
+    return Response(result)
 
 
 @api_view(['GET'])
@@ -285,63 +479,44 @@ def submit_rating(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # 获取或创建评分对象
-    rating, created = Rating.objects.get_or_create(user=user, ai=ai)
-    
-    # 更新评分字段（只更新提供的字段）
-    for key, value in rating_scores.items():
-        setattr(rating, key, value)
-    rating.save()
-    
-    # 更新AI的平均分（使用总评分作为avg_score，如果有的话）
-    from django.db.models import Avg
-    ratings_with_overall = Rating.objects.filter(ai=ai, overall_score__isnull=False)
-    
-    if ratings_with_overall.exists():
-        overall_avg = ratings_with_overall.aggregate(avg=Avg('overall_score'))['avg']
-        ai.avg_score = round(float(overall_avg), 1) if overall_avg else 0.0
-    else:
-        # 如果没有总评分，使用五个细则的平均值作为总评分
-        ratings_with_details = Rating.objects.filter(ai=ai).exclude(
-            versatility_score__isnull=True,
-            image_generation_score__isnull=True,
-            information_query_score__isnull=True,
-            study_assistance_score__isnull=True,
-            value_for_money_score__isnull=True
-        )
-        if ratings_with_details.exists():
-            avg_scores = ratings_with_details.aggregate(
-                versatility=Avg('versatility_score'),
-                image_generation=Avg('image_generation_score'),
-                information_query=Avg('information_query_score'),
-                study_assistance=Avg('study_assistance_score'),
-                value_for_money=Avg('value_for_money_score')
-            )
-            scores_list = [
-                avg_scores['versatility'],
-                avg_scores['image_generation'],
-                avg_scores['information_query'],
-                avg_scores['study_assistance'],
-                avg_scores['value_for_money']
-            ]
-            valid_scores = [s for s in scores_list if s is not None]
-            if valid_scores:
-                ai.avg_score = round(sum(valid_scores) / len(valid_scores), 1)
-            else:
-                ai.avg_score = 0.0
+    with transaction.atomic():
+        # 锁定已有评分行，保证并发修改同一评分时汇总增量基于最新的旧值
+        rating = Rating.objects.select_for_update().filter(user=user, ai=ai).first()
+        created = rating is None
+        if created:
+            try:
+                with transaction.atomic():
+                    rating = Rating.objects.create(user=user, ai=ai, **rating_scores)
+            except IntegrityError:
+                # 同一用户的并发请求刚创建了评分，改为更新该评分
+                rating = Rating.objects.select_for_update().get(user=user, ai=ai)
+                created = False
+        
+        if created:
+            old_scores = snapshot_scores(None)
+        else:
+            old_scores = snapshot_scores(rating)
+            # 只更新提供的字段
+            for key, value in rating_scores.items():
+                setattr(rating, key, value)
+            rating.save(update_fields=list(rating_scores))
+        
+        if aggregates_deferred():
+            # 延迟聚合模式只标记AI，由worker合并后统一重算
+            defer_rating_aggregates(ai.ai_id)
         else:
-            ai.avg_score = 0.0
-    
-    # 更新评分数量（至少有一个非空评分的用户数）
-    ai.rating_count = Rating.objects.filter(ai=ai).exclude(
-        overall_score__isnull=True,
-        versatility_score__isnull=True,
-        image_generation_score__isnull=True,
-        information_query_score__isnull=True,
-        study_assistance_score__isnull=True,
-        value_for_money_score__isnull=True
-    ).count()
-    ai.save()
+            # 增量更新评分汇总和按月汇总，平均分直接从汇总读取
+            new_scores = snapshot_scores(rating)
+            summary = apply_rating_change(ai.ai_id, old_scores, new_scores)
+            apply_rollup_change(ai.ai_id, rating.created_at, old_scores, new_scores)
+            
+            # 平均分和评分数量都直接由汇总得出，不再扫描该AI的全部评分
+            ai.avg_score = summary.avg_score()
+            ai.rating_count = summary.rated_count
+            update_ai_rankings(ai, summary)
+            # 只写回这两列，不覆盖其他请求并发修改的计数字段
+            ai.save(update_fields=['avg_score', 'rating_count'])
+            bump_catalogue_version()
     
     # 返回序列化后的评分数据
     serializer = RatingSerializer(rating)
@@ -353,6 +528,50 @@ def submit_rating(request):
     }, status=status.HTTP_200_OK if not created else status.HTTP_201_CREATED)
 
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_aggregate_queue_stats(request):
+    """延迟聚合队列的指标（队列长度、最早标记的等待秒数）- 仅管理员"""
+    return Response({
+        'success': True,
+        **queue_stats()
+    })
+
+
+# 单次批量提交的最大行数，更大的文件请使用 import_ratings 命令
+BULK_RATING_MAX_ROWS = 5000
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def submit_ratings_bulk(request):
+    """
+    批量导入评分API - 仅管理员
+
+    请求体为 {"ratings": [{"user_id" 或 "username", "ai_id", 各评分字段...}, ...]}，
+    每行与 /api/ratings/ 一样只更新提供的字段。单行错误不会中断整批导入，
+    会在 errors 中按行号（从0开始）返回。
+    """
+    rows = request.data.get('ratings') if isinstance(request.data, dict) else request.data
+    if not isinstance(rows, list) or not rows:
+        return Response(
+            {'error': '请提供评分列表'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(rows) > BULK_RATING_MAX_ROWS:
+        return Response(
+            {'error': f'单次最多导入{BULK_RATING_MAX_ROWS}条评分'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    result = import_ratings(rows)
+    return Response({
+        'success': True,
+        'message': f'成功导入{result["created"] + result["updated"]}条评分，失败{len(result["errors"])}条',
+        **result
+    })
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def submit_comment(request):
@@ -398,14 +617,14 @@ def submit_comment(request):
                 {'error': '父评论不存在'},
                 status=status.HTTP_404_NOT_FOUND
             )
+        if parent_comment.depth >= COMMENT_MAX_DEPTH:
+            return Response(
+                {'error': '回复层级过深'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
     
-    # 创建评论
-    comment = Comment.objects.create(
-        user=user,
-        ai=ai,
-        parent_comment=parent_comment,
-        content=content.strip()
-    )
+    # 创建评论（同时写入物化路径）
+    comment = create_comment(ai, user, content.strip(), parent_comment)
     
     # 处理评论图片（如果有）
     images = request.data.get('images', [])
@@ -423,6 +642,49 @@ def submit_comment(request):
     }, status=status.HTTP_201_CREATED)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def toggle_comment_like(request, comment_id):
+    """点赞/取消点赞评论 - 需要登录"""
+    if not request.user.is_authenticated:
+        return Response(
+            {'error': '请先登录', 'detail': 'Session认证失败，请重新登录'},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    
+    user = request.user
+    
+    with transaction.atomic():
+        # 直接删除已有点赞，删除成功即为取消点赞；点赞数用 F() 原子更新
+        deleted, _ = CommentLike.objects.filter(user=user, comment_id=comment_id).delete()
+        if deleted:
+            Comment.objects.filter(comment_id=comment_id).update(upvotes=Greatest(F('upvotes') - 1, 0))
+            liked = False
+        else:
+            if not Comment.objects.filter(comment_id=comment_id).exists():
+                return Response(
+                    {'error': '评论不存在'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            try:
+                with transaction.atomic():
+                    CommentLike.objects.create(user=user, comment_id=comment_id)
+            except IntegrityError:
+                # 同一用户的并发请求已经点赞，点赞数已由该请求增加
+                pass
+            else:
+                Comment.objects.filter(comment_id=comment_id).update(upvotes=F('upvotes') + 1)
+            liked = True
+        upvotes = Comment.objects.filter(comment_id=comment_id).values_list('upvotes', flat=True).first()
+    
+    return Response({
+        'success': True,
+        'liked': liked,
+        'upvotes': upvotes,
+        'message': '点赞成功' if liked else '已取消点赞'
+    })
+
+
 # 预定义的标签列表（与前端保持一致）
 ALLOWED_TAG_NAMES = ['万能', '最适合学生', '做PPT很强', '画图一流', '难用', '贵但好用', '免费', '中文友好', '长文本', '多模态']
 
@@ -471,19 +733,26 @@ def add_tag_to_ai(request):
     # 获取或创建标签
     tag, created = Tag.objects.get_or_create(tag_name=tag_name)
     
-    # 检查用户是否已经为该AI添加过这个标签
-    aitag, aitag_created = AITag.objects.get_or_create(
-        ai=ai, 
-        tag=tag, 
-        user=user,
-        defaults={'ai': ai, 'tag': tag, 'user': user}
-    )
-    
-    if not aitag_created:
-        return Response({
-            'success': False,
-            'error': '您已经为该AI添加过这个标签了'
-        }, status=status.HTTP_400_BAD_REQUEST)
+    with transaction.atomic():
+        # 检查用户是否已经为该AI添加过这个标签
+        aitag, aitag_created = AITag.objects.get_or_create(
+            ai=ai, 
+            tag=tag, 
+            user=user,
+            defaults={'ai': ai, 'tag': tag, 'user': user}
+        )
+        
+        if not aitag_created:
+            return Response({
+                'success': False,
+                'error': '您已经为该AI添加过这个标签了'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # 同一事务中累加(AI, 标签)计数
+        AITagCount.objects.get_or_create(ai=ai, tag=tag)
+        AITagCount.objects.filter(ai=ai, tag=tag).update(count=F('count') + 1)
+        
+        bump_catalogue_version()
     
     return Response({
         'success': True,
@@ -560,60 +829,70 @@ def toggle_reaction(request):
         )
     
     user = request.user
+    counter = Reaction.COUNTER_FIELDS[reaction_type]
     
-    try:
-        ai = AIModel.objects.get(ai_id=ai_id)
-    except AIModel.DoesNotExist:
-        return Response(
-            {'error': 'AI不存在'},
-            status=status.HTTP_404_NOT_FOUND
-        )
-    
-    # 检查用户是否已经对该AI有相同类型的反应
-    existing_reaction = Reaction.objects.filter(
-        user=user, 
-        ai=ai, 
-        reaction_type=reaction_type
-    ).first()
-    
-    if existing_reaction:
-        # 如果已存在，则取消反应（删除）
-        existing_reaction.delete()
-        return Response({
-            'success': True,
-            'is_active': False,
-            'message': '已取消反应'
-        })
-    else:
-        # 检查用户是否已经有其他类型的反应
-        other_reaction = Reaction.objects.filter(
-            user=user, 
-            ai=ai
-        ).exclude(reaction_type=reaction_type).first()
+    with transaction.atomic():
+        # 一次查询取出用户对该AI的现有反应（任意类型）
+        existing_reaction = Reaction.objects.select_for_update().filter(user=user, ai_id=ai_id).first()
         
-        if other_reaction:
-            # 如果已有其他反应，则替换为新的反应类型
-            other_reaction.reaction_type = reaction_type
-            other_reaction.save()
-            return Response({
+        if existing_reaction is None:
+            if not AIModel.objects.filter(ai_id=ai_id).exists():
+                return Response(
+                    {'error': 'AI不存在'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            try:
+                with transaction.atomic():
+                    Reaction.objects.create(
+                        user=user,
+                        ai_id=ai_id,
+                        reaction_type=reaction_type
+                    )
+            except IntegrityError:
+                # 同一用户的并发请求已经添加了反应（每个用户对每个AI只能有一个），以该反应为准
+                current = Reaction.objects.get(user=user, ai_id=ai_id)
+                result = {
+                    'success': True,
+                    'is_active': True,
+                    'reaction_type': current.reaction_type,
+                    'message': '反应已添加'
+                }
+            else:
+                AIModel.objects.filter(ai_id=ai_id).update(**{counter: F(counter) + 1})
+                result = {
+                    'success': True,
+                    'is_active': True,
+                    'reaction_type': reaction_type,
+                    'message': '反应已添加'
+                }
+        elif existing_reaction.reaction_type == reaction_type:
+            # 如果已存在相同类型的反应，则取消反应（删除）
+            existing_reaction.delete()
+            AIModel.objects.filter(ai_id=ai_id).update(**{counter: Greatest(F(counter) - 1, 0)})
+            result = {
                 'success': True,
-                'is_active': True,
-                'reaction_type': reaction_type,
-                'message': '反应已更新'
-            })
+                'is_active': False,
+                'message': '已取消反应'
+            }
         else:
-            # 创建新反应
-            Reaction.objects.create(
-                user=user,
-                ai=ai,
-                reaction_type=reaction_type
-            )
-            return Response({
+            # 如果已有其他反应，则替换为新的反应类型
+            old_counter = Reaction.COUNTER_FIELDS.get(existing_reaction.reaction_type)
+            existing_reaction.reaction_type = reaction_type
+            existing_reaction.save(update_fields=['reaction_type'])
+            updates = {counter: F(counter) + 1}
+            if old_counter:
+                updates[old_counter] = Greatest(F(old_counter) - 1, 0)
+            AIModel.objects.filter(ai_id=ai_id).update(**updates)
+            result = {
                 'success': True,
                 'is_active': True,
                 'reaction_type': reaction_type,
-                'message': '反应已添加'
-            })
+                'message': '反应已更新'
+            }
+        
+        bump_catalogue_version()
+    
+    return Response(result)
 
 
 @api_view(['GET'])
@@ -659,15 +938,405 @@ def get_user_comments(request):
         )
     
     user = request.user
-    comments = Comment.objects.filter(user=user).select_related('ai', 'parent_comment').order_by('-created_at')
+    comments = Comment.objects.filter(user=user).select_related('ai', 'user').prefetch_related('images').order_by('-created_at')
     
-    serializer = CommentSerializer(comments, many=True)
+    serializer = CommentSerializer(comments, many=True, context={'request': request})
     return Response({
         'success': True,
         'comments': serializer.data
     })
 
 
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_my_state(request):
+    """
+    一次返回当前用户在所有AI（或 ?ai_ids=1,2,3 指定的AI）上的评分、反应、收藏和标签
+
+    结果以ai_id为键，固定4条查询，未登录时返回空结果。
+    """
+    empty_state = {
+        'success': True,
+        'ratings': {},
+        'reactions': {},
+        'favorites': [],
+        'tags': {},
+    }
+    if not request.user.is_authenticated:
+        return Response(empty_state)
+    
+    ai_ids = None
+    raw_ids = request.query_params.get('ai_ids', '').strip()
+    if raw_ids:
+        try:
+            ai_ids = [int(ai_id) for ai_id in raw_ids.split(',') if ai_id.strip()]
+        except ValueError:
+            return Response(
+                {'error': 'ai_ids 必须是逗号分隔的整数'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    
+    def scoped(queryset):
+        queryset = queryset.filter(user=request.user)
+        return queryset.filter(ai_id__in=ai_ids) if ai_ids is not None else queryset
+    
+    ratings = {}
+    for row in scoped(Rating.objects.all()).values('ai_id', *SCORE_FIELDS):
+        ratings[row.pop('ai_id')] = row
+    
+    reactions = dict(scoped(Reaction.objects.all()).values_list('ai_id', 'reaction_type'))
+    
+    favorites = list(scoped(Favorite.objects.all()).values_list('ai_id', flat=True))
+    
+    tags = {}
+    for ai_id, tag_name in scoped(AITag.objects.all()).values_list('ai_id', 'tag__tag_name'):
+        tags.setdefault(ai_id, []).append(tag_name)
+    
+    return Response({
+        **empty_state,
+        'ratings': ratings,
+        'reactions': reactions,
+        'favorites': favorites,
+        'tags': tags,
+    })
+
+
+# 分布接口返回的百分位数
+DISTRIBUTION_PERCENTILES = [10, 25, 75, 90]
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_ai_distribution(request, ai_id):
+    """
+    获取AI各评分维度的分数分布（0-10分每档的人数）及中位数、百分位数
+
+    ?dimension= 可只取一个维度；数据直接读取分数直方图，不扫描评分表。
+    """
+    dimension = request.query_params.get('dimension')
+    if dimension and dimension not in SCORE_FIELDS:
+        return Response(
+            {'error': f'dimension 必须是以下之一：{", ".join(SCORE_FIELDS)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    dimensions = [dimension] if dimension else SCORE_FIELDS
+    
+    histograms = {
+        histogram.dimension: histogram
+        for histogram in ScoreHistogram.objects.filter(ai_id=ai_id, dimension__in=dimensions)
+    }
+    if not histograms and not AIModel.objects.filter(ai_id=ai_id).exists():
+        return Response(
+            {'error': 'AI不存在'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    # 没有直方图行的维度视为尚无评分
+    for field in dimensions:
+        histograms.setdefault(field, ScoreHistogram(ai_id=ai_id, dimension=field))
+    
+    return Response({
+        'success': True,
+        'ai_id': ai_id,
+        'distribution': {
+            field: histograms[field].counts()
+            for field in dimensions
+        },
+        'stats': {
+            field: {
+                'count': sum(histograms[field].counts()),
+                'median': histograms[field].median(),
+                'percentiles': {
+                    str(p): histograms[field].percentile(p)
+                    for p in DISTRIBUTION_PERCENTILES
+                },
+            }
+            for field in dimensions
+        }
+    })
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_ai_trend(request, ai_id):
+    """获取AI某个评分维度的按月平均分趋势（?dimension= 默认总评分，?months= 默认12个月）"""
+    dimension = request.query_params.get('dimension', 'overall_score')
+    if dimension not in SCORE_FIELDS:
+        return Response(
+            {'error': f'dimension 必须是以下之一：{", ".join(SCORE_FIELDS)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        months = max(1, min(int(request.query_params.get('months', 12)), 120))
+    except ValueError:
+        return Response(
+            {'error': 'months 必须是整数'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    # 按 (ai, dimension, month) 唯一索引读取最近若干个月的汇总
+    rows = list(RatingMonthlyRollup.objects.filter(
+        ai_id=ai_id,
+        dimension=dimension,
+        score_count__gt=0
+    ).order_by('-month')[:months])
+    if not rows and not AIModel.objects.filter(ai_id=ai_id).exists():
+        return Response(
+            {'error': 'AI不存在'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    return Response({
+        'success': True,
+        'ai_id': ai_id,
+        'dimension': dimension,
+        'trend': [
+            {
+                'month': row.month.strftime('%Y-%m'),
+                'score': round(row.score_sum / row.score_count, 1),
+                'count': row.score_count
+            }
+            for row in reversed(rows)
+        ]
+    })
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_ai_similar(request, ai_id):
+    """
+    获取与AI最相似的AI（?limit= 默认10个，最多 SIMILAR_TOP_N 个）
+
+    数据由 compute_similar_ais 离线计算，这里只按 (ai, rank) 索引读取一次。
+    """
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 10)), SIMILAR_TOP_N))
+    except ValueError:
+        return Response(
+            {'error': 'limit 必须是整数'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    rows = get_similar_ais(ai_id, limit)
+    if not rows and not AIModel.objects.filter(ai_id=ai_id).exists():
+        return Response(
+            {'error': 'AI不存在'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    return Response({
+        'success': True,
+        'ai_id': ai_id,
+        'results': [
+            {
+                'rank': row.rank,
+                'score': round(row.score, 4),
+                'ai_id': row.similar_ai.ai_id,
+                'name': row.similar_ai.name,
+                'developer': row.similar_ai.developer,
+                'avg_score': float(row.similar_ai.avg_score),
+                'rating_count': row.similar_ai.rating_count,
+            }
+            for row in rows
+        ]
+    })
+
+
+RECOMMENDATION_MAX_LIMIT = 50
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_my_recommendations(request):
+    """
+    获取当前用户的个性化推荐（?limit= 默认10个，最多 RECOMMENDATION_MAX_LIMIT 个）
+
+    使用 train_recommender 训练的因子模型，已评分或已收藏的AI不会出现；
+    尚未训练模型或用户不在模型中（新用户）时按综合榜的贝叶斯得分推荐，personalized 为False。
+    """
+    if not request.user.is_authenticated:
+        return Response(
+            {'error': '请先登录', 'detail': 'Session认证失败，请重新登录'},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 10)), RECOMMENDATION_MAX_LIMIT))
+    except ValueError:
+        return Response(
+            {'error': 'limit 必须是整数'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    user = request.user
+    seen = set(
+        Rating.objects.filter(user=user).values_list('ai_id', flat=True)
+        .union(Favorite.objects.filter(user=user).values_list('ai_id', flat=True))
+    )
+    recommendations = recommend_for_user(user.user_id, limit, seen)
+    personalized = recommendations is not None
+    if not personalized:
+        entries = get_ranking_page('overall', 0, limit + len(seen), 'bayes')
+        recommendations = [(ai_id, bayes_score) for _, ai_id, _, bayes_score, _ in entries if ai_id not in seen][:limit]
+    
+    ais = AIModel.objects.only('ai_id', 'name', 'developer', 'avg_score', 'rating_count').in_bulk(
+        [ai_id for ai_id, _ in recommendations]
+    )
+    return Response({
+        'success': True,
+        'personalized': personalized,
+        'results': [
+            {
+                'score': round(score, 4),
+                'ai_id': ai_id,
+                'name': ais[ai_id].name,
+                'developer': ais[ai_id].developer,
+                'avg_score': float(ais[ai_id].avg_score),
+                'rating_count': ais[ai_id].rating_count,
+            }
+            for ai_id, score in recommendations
+            if ai_id in ais
+        ]
+    })
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_rankings(request, board):
+    """
+    获取排行榜的一页（offset/limit 分页，最多到前 RANKING_TOP_K 名）
+
+    ?order= 可选 score（默认，原始平均分）、bayes（贝叶斯收缩均值）、
+    lower_bound（Wilson置信下界），后两种不会让评分人数很少的AI排在前面。
+    三种得分口径相同：综合榜都以AI的综合平均分为准（有总评分时用总评分，否则用细则评分的平均）。
+    """
+    if board not in RANKING_BOARDS:
+        return Response(
+            {'error': '排行榜不存在'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    order = request.query_params.get('order', 'score')
+    if order not in RANKING_ORDERS:
+        return Response(
+            {'error': f'order 必须是以下之一：{", ".join(RANKING_ORDERS)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        offset = max(0, int(request.query_params.get('offset', 0)))
+        limit = max(1, int(request.query_params.get('limit', 20)))
+    except ValueError:
+        return Response(
+            {'error': 'offset 和 limit 必须是整数'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    limit = min(limit, max(0, RANKING_TOP_K - offset))
+    
+    entries = get_ranking_page(board, offset, limit, order) if limit else []
+    
+    # 按榜单顺序批量取出AI信息，支持 ?fields= / ?exclude=
+    fields = get_sparse_fields(request.query_params, AIModelSerializer.Meta.fields)
+    ais = AIModelSerializer.setup_eager_loading(
+        AIModel.objects.filter(ai_id__in=[entry[1] for entry in entries]),
+        fields
+    )
+    ais_by_id = {ai.ai_id: ai for ai in ais}
+    ordered = [ais_by_id[entry[1]] for entry in entries if entry[1] in ais_by_id]
+    serializer = AIModelSerializer(ordered, many=True, context={'request': request})
+    ai_data = dict(zip([ai.ai_id for ai in ordered], serializer.data))
+    
+    return Response({
+        'success': True,
+        'board': board,
+        'name': RANKING_BOARDS[board][0],
+        'order': order,
+        'offset': offset,
+        'has_more': offset + len(entries) < RANKING_TOP_K and len(entries) == limit,
+        'results': [
+            {
+                'rank': rank,
+                'ai_id': ai_id,
+                'score': round(score, 2),
+                'bayes_score': round(bayes_score, 2),
+                'lower_bound': round(lower_bound, 2),
+                'ai': ai_data.get(ai_id),
+            }
+            for rank, ai_id, score, bayes_score, lower_bound in entries
+        ]
+    })
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def search(request):
+    """
+    全文搜索AI或评论（offset/limit 分页，按相关度排序）
+
+    ?q= 为关键词，多个关键词用空格分隔，需全部匹配；?type= 可选 ai（默认）或 comment，
+    搜索评论时可用 ?ai_id= 限定某个AI。AI结果支持 ?fields= / ?exclude=。
+    """
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response(
+            {'error': '请输入搜索关键词'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    kind = request.query_params.get('type', 'ai')
+    if kind not in SEARCH_INDEXES:
+        return Response(
+            {'error': f'type 必须是以下之一：{", ".join(SEARCH_INDEXES)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        offset = max(0, int(request.query_params.get('offset', 0)))
+        limit = max(1, min(int(request.query_params.get('limit', 20)), SEARCH_MAX_LIMIT))
+        ai_id = request.query_params.get('ai_id')
+        ai_id = int(ai_id) if ai_id else None
+    except ValueError:
+        return Response(
+            {'error': 'offset、limit 和 ai_id 必须是整数'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    # 多取一条用于判断是否还有下一页
+    hits = search_hits(kind, query, offset, limit + 1, ai_id=ai_id)
+    has_more = len(hits) > limit
+    hits = hits[:limit]
+    
+    # 按相关度顺序批量取出并序列化命中的AI或评论
+    ids = [hit_id for hit_id, _ in hits]
+    if kind == 'ai':
+        fields = get_sparse_fields(request.query_params, AIModelSerializer.Meta.fields)
+        objects = AIModelSerializer.setup_eager_loading(AIModel.objects.filter(ai_id__in=ids), fields)
+        serializer_class = AIModelSerializer
+    else:
+        objects = Comment.objects.filter(comment_id__in=ids).select_related('ai', 'user').prefetch_related('images')
+        serializer_class = CommentSerializer
+    by_id = {obj.pk: obj for obj in objects}
+    ordered = [by_id[hit_id] for hit_id in ids if hit_id in by_id]
+    serializer = serializer_class(ordered, many=True, context={'request': request})
+    data = dict(zip([obj.pk for obj in ordered], serializer.data))
+    
+    return Response({
+        'success': True,
+        'query': query,
+        'type': kind,
+        'offset': offset,
+        'has_more': has_more,
+        'results': [
+            {
+                'id': hit_id,
+                'score': round(score, 4),
+                kind: data[hit_id],
+            }
+            for hit_id, score in hits
+            if hit_id in data
+        ]
+    })
+
+
 def api_root(request):
     """API根路径，显示API信息和链接"""
     from django.http import HttpResponse
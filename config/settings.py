@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -128,6 +129,57 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# 缓存配置
+# AI目录接口的响应缓存后端，通过环境变量 RATEAI_API_CACHE 选择：
+#   file    文件缓存（默认），同一台机器上的多个进程共享，目录由 RATEAI_API_CACHE_DIR 指定
+#   redis   本地Redis（或兼容Redis协议的服务），地址由 RATEAI_REDIS_URL 指定，多台机器部署时使用
+#   locmem  进程内缓存，只适用于单进程运行（如开发服务器）：目录版本号保存在各进程内，
+#           一个进程中的写入不会使其他进程的缓存和ETag失效
+# 多进程或多机部署必须使用共享的后端，否则客户端可能一直收到带旧数据的304
+API_CACHE_ALIAS = 'api'
+API_CACHE_TIMEOUT = 600  # 缓存条目的最长保留时间（秒），失效主要依靠版本号
+
+_API_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'rateai-api',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('RATEAI_API_CACHE_DIR', str(BASE_DIR / '.cache' / 'api')),
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('RATEAI_REDIS_URL', 'redis://127.0.0.1:6379/1'),
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    API_CACHE_ALIAS: _API_CACHE_BACKENDS[os.environ.get('RATEAI_API_CACHE', 'file')],
+}
+
+# 评分聚合的维护方式，通过环境变量 RATEAI_AGGREGATE_MODE 选择：
+#   sync      每次评分写入时同步增量更新（默认）
+#   deferred  写入时只记录评分并把AI标记为待重算，由后台worker合并后每个AI每轮只重算一次；
+#             worker 可以是 run_aggregate_worker 命令，也可以设置
+#             RATEAI_AGGREGATE_WORKER_THREAD=1 在Web进程内启动后台线程
+AGGREGATE_MODE = os.environ.get('RATEAI_AGGREGATE_MODE', 'sync')
+AGGREGATE_WORKER_THREAD = os.environ.get('RATEAI_AGGREGATE_WORKER_THREAD') == '1'
+AGGREGATE_WORKER_INTERVAL = 1.0  # worker每轮的间隔（秒）
+AGGREGATE_BATCH_SIZE = 500  # 每轮最多重算的AI数量
+AGGREGATE_MIN_DELAY = 0  # AI被标记后至少等待多久才重算（秒），用于合并突发写入
+AGGREGATE_MAX_STALENESS = 30  # 聚合允许落后的最长时间（秒），超过后写入请求会同步重算该AI
+
+# 评分变化后由聚合worker重新计算榜单贝叶斯得分和置信下界的最短间隔（秒），None 表示只由命令计算；
+# Web请求只标记需要计算，不在请求进程中计算
+RANK_SCORES_INTERVAL = 60
+
+# 个性化推荐模型（train_recommender 生成的用户、AI因子数组）的保存目录
+RECOMMENDER_DIR = os.environ.get('RATEAI_RECOMMENDER_DIR', str(BASE_DIR / '.cache' / 'recommender'))
+
 # 自定义认证后端
 AUTHENTICATION_BACKENDS = [
     'backend.authentication.CustomUserBackend',
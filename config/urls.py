@@ -18,7 +18,7 @@ from django.contrib import admin
 from django.contrib.auth.models import Group
 from django.urls import path
 
-from backend.views import AIModelList, CommentList, register, login, logout, check_auth, api_root, submit_rating, toggle_favorite, get_user_favorites, submit_comment, add_tag_to_ai, get_user_comments, get_user_rating, toggle_reaction, get_user_reaction
+from backend.views import AIModelList, AIModelDetail, AICommentList, CommentList, register, login, logout, check_auth, api_root, submit_rating, submit_ratings_bulk, get_aggregate_queue_stats, toggle_favorite, get_user_favorites, submit_comment, add_tag_to_ai, get_user_comments, get_user_rating, toggle_reaction, get_user_reaction, get_rankings, get_my_state, get_ai_distribution, get_ai_trend, get_ai_similar, get_my_recommendations, get_comment_thread, toggle_comment_like, search
 
 # 隐藏Django内置的Group和User（因为我们使用自定义的User模型）
 admin.site.unregister(Group)
@@ -27,8 +27,15 @@ urlpatterns = [
     path('', api_root, name='api-root'),
     path('admin/', admin.site.urls),
     path('api/ais/', AIModelList.as_view()),
+    path('api/ais/<int:ai_id>/', AIModelDetail.as_view(), name='ai-detail'),
+    path('api/ais/<int:ai_id>/comments/', AICommentList.as_view(), name='ai-comments'),
+    path('api/ais/<int:ai_id>/distribution/', get_ai_distribution, name='ai-distribution'),
+    path('api/ais/<int:ai_id>/trend/', get_ai_trend, name='ai-trend'),
+    path('api/ais/<int:ai_id>/similar/', get_ai_similar, name='ai-similar'),
     path('api/comments/', CommentList.as_view()),
     path('api/comments/create/', submit_comment, name='submit-comment'),
+    path('api/comments/<int:comment_id>/thread/', get_comment_thread, name='comment-thread'),
+    path('api/comments/<int:comment_id>/like/', toggle_comment_like, name='toggle-comment-like'),
     path('api/tags/add/', add_tag_to_ai, name='add-tag'),
     path('api/users/comments/', get_user_comments, name='get-user-comments'),
     path('api/register/', register, name='register'),
@@ -36,9 +43,15 @@ urlpatterns = [
     path('api/logout/', logout, name='logout'),
     path('api/check-auth/', check_auth, name='check-auth'),
     path('api/ratings/', submit_rating, name='submit-rating'),
+    path('api/ratings/bulk/', submit_ratings_bulk, name='submit-ratings-bulk'),
     path('api/ratings/<int:ai_id>/', get_user_rating, name='get-user-rating'),
     path('api/reactions/', toggle_reaction, name='toggle-reaction'),
     path('api/reactions/<int:ai_id>/', get_user_reaction, name='get-user-reaction'),
     path('api/favorites/', toggle_favorite, name='toggle-favorite'),
     path('api/favorites/list/', get_user_favorites, name='get-favorites'),
+    path('api/aggregates/queue/', get_aggregate_queue_stats, name='aggregate-queue-stats'),
+    path('api/rankings/<str:board>/', get_rankings, name='get-rankings'),
+    path('api/search/', search, name='search'),
+    path('api/me/state/', get_my_state, name='get-my-state'),
+    path('api/me/recommendations/', get_my_recommendations, name='get-my-recommendations'),
 ]
@@ -7,15 +7,19 @@ import ReportForm from './ReportForm'
 import { useAppContext } from '../context/AppContext'
 import './CommentSection.css'
 
-function CommentSection({ aiId, comments, onAddComment }) {
+function CommentSection({ aiId, comments, hasMore, onLoadMore, onAddComment }) {
   const navigate = useNavigate()
   const location = useLocation()
-  const { user, addReply } = useAppContext()
+  const { user, addReply, loadCommentThread } = useAppContext()
   const [showCommentForm, setShowCommentForm] = useState(false)
   const [expandedReplies, setExpandedReplies] = useState({})
   const [replyingTo, setReplyingTo] = useState(null) // { commentId, replyId, author }
 
   const toggleReplies = (commentId) => {
+    // 展开时加载完整回复串，列表只带有最早的几条回复
+    if (!expandedReplies[commentId]) {
+      loadCommentThread(commentId)
+    }
     setExpandedReplies({
       ...expandedReplies,
       [commentId]: !expandedReplies[commentId]
@@ -80,6 +84,12 @@ function CommentSection({ aiId, comments, onAddComment }) {
         ))}
       </div>
 
+      {hasMore && (
+        <div className="load-more-comments">
+          <button className="comment-btn" onClick={onLoadMore}>加载更多评论</button>
+        </div>
+      )}
+
       {comments.length === 0 && (
         <div className="empty-comments">
           <p>还没有评论，快来第一个评论吧！</p>
@@ -92,7 +102,7 @@ function CommentSection({ aiId, comments, onAddComment }) {
 function CommentItem({ comment, onToggleReplies, onReply, showReplies, replyingTo, onSubmitReply, onCancelReply }) {
   const navigate = useNavigate()
   const location = useLocation()
-  const { user } = useAppContext()
+  const { user, toggleCommentLike, loadCommentThread, threadCursors } = useAppContext()
   const [helpful, setHelpful] = useState(comment.helpful || false)
   const [notHelpful, setNotHelpful] = useState(comment.notHelpful || false)
   const [upvotes, setUpvotes] = useState(comment.upvotes || 0)
@@ -115,15 +125,15 @@ function CommentItem({ comment, onToggleReplies, onReply, showReplies, replyingT
     setTimeout(() => setReportMessage(''), 4000)
   }
 
-  const handleUpvote = () => {
-    // 后端会验证登录（如果需要）
-    if (helpful) {
-      setUpvotes(upvotes - 1)
-      setHelpful(false)
-    } else {
-      setUpvotes(upvotes + 1)
-      setHelpful(true)
-      setNotHelpful(false)
+  const handleUpvote = async () => {
+    // 后端会验证登录
+    const result = await toggleCommentLike(comment.id)
+    if (result && result.success) {
+      setUpvotes(result.upvotes)
+      setHelpful(result.liked)
+      if (result.liked) {
+        setNotHelpful(false)
+      }
     }
   }
 
@@ -185,12 +195,12 @@ function CommentItem({ comment, onToggleReplies, onReply, showReplies, replyingT
           </button>
         </div>
         <div className="action-group">
-          {(comment.replies && comment.replies.length > 0) && (
+          {(comment.replyCount > 0 || (comment.replies && comment.replies.length > 0)) && (
             <button 
               className="action-btn" 
               onClick={onToggleReplies}
             >
-              <span>{showReplies ? '收起' : '查看'}回复 ({getTotalRepliesCount(comment.replies || [])})</span>
+              <span>{showReplies ? '收起' : '查看'}回复 ({Math.max(comment.replyCount || 0, getTotalRepliesCount(comment.replies || []))})</span>
             </button>
           )}
           <button 
@@ -249,6 +259,14 @@ function CommentItem({ comment, onToggleReplies, onReply, showReplies, replyingT
                   depth={0}
                 />
               ))}
+              {threadCursors[comment.id] && (
+                <button
+                  className="action-btn"
+                  onClick={() => loadCommentThread(comment.id, threadCursors[comment.id])}
+                >
+                  <span>加载更多回复</span>
+                </button>
+              )}
             </div>
           )}
         </div>
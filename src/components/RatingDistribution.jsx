@@ -0,0 +1,49 @@
+import { BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer } from 'recharts'
+import './RatingDistribution.css'
+
+// counts 为0-10分每档的评分人数，stats 为后端按直方图计算的人数、中位数和百分位数
+function RatingDistribution({ counts, stats }) {
+  if (!counts || !stats || stats.count === 0) {
+    return (
+      <div className="rating-distribution-empty">
+        <p>暂无评分分布数据</p>
+      </div>
+    )
+  }
+
+  const data = counts.map((count, score) => ({ score: `${score}分`, count }))
+
+  return (
+    <div className="rating-distribution-container">
+      <div className="rating-distribution-stats">
+        <span>共 {stats.count} 人评分</span>
+        <span>中位数 {Number(stats.median).toFixed(1)}</span>
+        {stats.percentiles?.['25'] != null && stats.percentiles?.['75'] != null && (
+          <span>
+            中间50%：{Number(stats.percentiles['25']).toFixed(1)} - {Number(stats.percentiles['75']).toFixed(1)}
+          </span>
+        )}
+      </div>
+      <ResponsiveContainer width="100%" height={220}>
+        <BarChart data={data} margin={{ top: 5, right: 30, left: 20, bottom: 5 }}>
+          <CartesianGrid strokeDasharray="3 3" stroke="var(--border)" />
+          <XAxis dataKey="score" stroke="var(--text-secondary)" style={{ fontSize: '12px' }} />
+          <YAxis allowDecimals={false} stroke="var(--text-secondary)" style={{ fontSize: '12px' }} />
+          <Tooltip
+            contentStyle={{
+              backgroundColor: 'var(--bg-secondary)',
+              border: '1px solid var(--border)',
+              borderRadius: '8px',
+              color: 'var(--text-primary)'
+            }}
+            labelStyle={{ color: 'var(--text-primary)' }}
+            formatter={(value) => [value, '评分人数']}
+          />
+          <Bar dataKey="count" fill="var(--primary)" name="评分人数" />
+        </BarChart>
+      </ResponsiveContainer>
+    </div>
+  )
+}
+
+export default RatingDistribution
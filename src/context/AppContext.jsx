@@ -1,4 +1,4 @@
-import { createContext, useContext, useMemo, useState, useEffect } from 'react'
+import { createContext, useCallback, useContext, useMemo, useRef, useState, useEffect } from 'react'
 import { apiRequest } from '../utils/api'
 
 const AppContext = createContext(null)
@@ -13,9 +13,101 @@ const loadUserFromStorage = () => {
   }
 }
 
+// 将后端返回的评论（含预取的回复）转换为前端格式
+const normalizeComment = (c) => {
+  // 如果用户被删除，user 可能为 null，显示"已删除用户"
+  const author = c.user && c.user.username ? c.user.username : '已删除用户'
+  return {
+    id: c.comment_id,
+    aiId: c.ai_id || (c.ai?.ai_id || (typeof c.ai === 'number' ? c.ai : parseInt(c.ai_id))),
+    author: author,
+    date: (c.created_at || '').slice(0, 10),
+    rating: null,
+    content: c.content || '',
+    images: c.images || [],
+    upvotes: c.upvotes || 0,
+    helpful: c.liked || false,
+    notHelpful: false,
+    replyCount: c.reply_count || 0,
+    replies: (c.replies || []).map(normalizeComment)
+  }
+}
+
+// 把新一页的回复（已转换格式）按ID合并到已有回复中：已有的评论合并其子回复，新的评论追加在后面
+const mergeReplies = (existing, incoming) => {
+  const merged = [...existing]
+  incoming.forEach((reply) => {
+    const index = merged.findIndex((r) => r.id === reply.id)
+    if (index === -1) {
+      merged.push(reply)
+    } else {
+      merged[index] = { ...merged[index], replies: mergeReplies(merged[index].replies || [], reply.replies) }
+    }
+  })
+  return merged
+}
+
+// 将后端返回的AI转换为前端格式
+const normalizeAI = (ai) => {
+  // 辅助函数：安全地将值转换为数字
+  const toNumber = (val, defaultValue = 0) => {
+    if (val === null || val === undefined) return defaultValue
+    const num = typeof val === 'string' ? parseFloat(val) : Number(val)
+    return isNaN(num) ? defaultValue : num
+  }
+  
+  return {
+    id: ai.ai_id,
+    name: ai.name || '',
+    developer: ai.developer || '',
+    description: ai.description || '',
+    price: ai.price_text || ai.price || '—',
+    link: ai.official_url || ai.link || '',
+    averageScore: Number(toNumber(ai.avg_score, 0).toFixed(1)),
+    ratingCount: toNumber(ai.rating_count, 0),
+    favoriteCount: toNumber(ai.favorite_count, 0),
+    ratings: {
+      overall: toNumber(ai.overall_score, 0), // 总评分（通用性评价）
+      versatility: toNumber(ai.versatility_score, 0),
+      imageGeneration: toNumber(ai.image_generation_score, 0),
+      informationQuery: toNumber(ai.information_query_score, 0),
+      studyAssistance: toNumber(ai.study_assistance_score, 0),
+      valueForMoney: toNumber(ai.value_for_money_score, 0)
+    },
+    tags: Array.isArray(ai.tags) 
+      ? ai.tags.map(t => {
+          // 处理标签：可能是对象 {tag_id, tag_name, count} 或字符串
+          if (typeof t === 'string') return { tag_name: t, count: 1 }
+          if (t && typeof t === 'object') {
+            return {
+              tag_id: t.tag_id,
+              tag_name: t.tag_name || t.name || String(t),
+              count: t.count || 1
+            }
+          }
+          return { tag_name: String(t), count: 1 }
+        }).filter(Boolean) // 过滤掉空值
+      : [],
+    reactions: {
+      thumbUp: toNumber(ai.reactions_thumb_up, 0),
+      thumbDown: toNumber(ai.reactions_thumb_down, 0),
+      amazing: toNumber(ai.reactions_amazing, 0),
+      bad: toNumber(ai.reactions_bad, 0)
+    },
+    ratingTrend: ai.ratingTrend || []
+  }
+}
+
 export function AppProvider({ children }) {
   const [ais, setAIs] = useState([])
+  // loadAIs 通过 ref 读取最新的 ais，避免回调随 ais 变化而重建
+  const aisRef = useRef(ais)
+  aisRef.current = ais
   const [comments, setComments] = useState([])
+  // 每个AI评论列表的下一页游标，null 表示没有更多
+  const [commentCursors, setCommentCursors] = useState({})
+  // 每条评论回复串的下一页游标，null 表示已全部加载
+  const [threadCursors, setThreadCursors] = useState({})
   const storedUser = loadUserFromStorage()
   const [user, setUser] = useState(storedUser)
   const [favoriteIds, setFavoriteIds] = useState(storedUser?.favoriteIds || [])
@@ -36,172 +128,63 @@ export function AppProvider({ children }) {
       tags: {}
     }
   })
+  // 当前用户对各AI的评分（后端评分字段，以ai_id为键），由 /api/me/state/ 加载
+  const [userRatings, setUserRatings] = useState({})
 
-  // 从后端加载初始数据
-  useEffect(() => {
-    const normalizeAI = (ai) => {
-      // 辅助函数：安全地将值转换为数字
-      const toNumber = (val, defaultValue = 0) => {
-        if (val === null || val === undefined) return defaultValue
-        const num = typeof val === 'string' ? parseFloat(val) : Number(val)
-        return isNaN(num) ? defaultValue : num
-      }
-      
-      return {
-        id: ai.ai_id,
-        name: ai.name || '',
-        developer: ai.developer || '',
-        description: ai.description || '',
-        price: ai.price_text || ai.price || '—',
-        link: ai.official_url || ai.link || '',
-        averageScore: Number(toNumber(ai.avg_score, 0).toFixed(1)),
-        ratingCount: toNumber(ai.rating_count, 0),
-        favoriteCount: toNumber(ai.favorite_count, 0),
-        ratings: {
-          overall: toNumber(ai.overall_score, 0), // 总评分（通用性评价）
-          versatility: toNumber(ai.versatility_score, 0),
-          imageGeneration: toNumber(ai.image_generation_score, 0),
-          informationQuery: toNumber(ai.information_query_score, 0),
-          studyAssistance: toNumber(ai.study_assistance_score, 0),
-          valueForMoney: toNumber(ai.value_for_money_score, 0)
-        },
-        tags: Array.isArray(ai.tags) 
-          ? ai.tags.map(t => {
-              // 处理标签：可能是对象 {tag_id, tag_name, count} 或字符串
-              if (typeof t === 'string') return { tag_name: t, count: 1 }
-              if (t && typeof t === 'object') {
-                return {
-                  tag_id: t.tag_id,
-                  tag_name: t.tag_name || t.name || String(t),
-                  count: t.count || 1
-                }
-              }
-              return { tag_name: String(t), count: 1 }
-            }).filter(Boolean) // 过滤掉空值
-          : [],
-        reactions: {
-          thumbUp: toNumber(ai.reactions_thumb_up, 0),
-          thumbDown: toNumber(ai.reactions_thumb_down, 0),
-          amazing: toNumber(ai.reactions_amazing, 0),
-          bad: toNumber(ai.reactions_bad, 0)
-        },
-        ratingTrend: ai.ratingTrend || []
+  // 登录后一次加载当前用户在所有AI上的评分、反应、收藏和标签，详情页等直接从这里读取
+  const loadMyState = useCallback(async () => {
+    try {
+      const response = await apiRequest('/api/me/state/', { method: 'GET' })
+      if (!response.ok) return null
+      const data = await response.json()
+      if (!data.success) return null
+      setUserRatings(data.ratings || {})
+      setFavoriteIds(data.favorites || [])
+      setUserActivity((prev) => ({
+        ...prev,
+        reactions: data.reactions || {},
+        tags: data.tags || {}
+      }))
+      return data
+    } catch (error) {
+      // apiRequest会自动处理401跳转，这里只记录其他错误
+      if (error.message !== '未登录，已跳转到登录页') {
+        console.error('加载用户状态失败:', error)
       }
+      return null
     }
+  }, [])
 
-    const normalizeComment = (c) => {
-      // 如果用户被删除，user 可能为 null，但评论本身可能还在（这种情况不应该发生，因为设置了CASCADE）
-      // 如果确实出现了，显示"已删除用户"
-      let author = '已删除用户'
-      if (c.user && c.user.username) {
-        author = c.user.username
-      } else if (c.user_id && !c.user) {
-        // 如果只有 user_id 但没有 user 对象，说明用户可能被删除了
-        author = '已删除用户'
-      }
-      
-      return {
-        id: c.comment_id,
-        aiId: c.ai_id || (c.ai?.ai_id || (typeof c.ai === 'number' ? c.ai : parseInt(c.ai_id))),
-        author: author,
-        date: (c.created_at || '').slice(0, 10),
-        rating: null,
-        content: c.content || '',
-        images: c.images || [],
-        upvotes: c.upvotes || 0,
-        helpful: false,
-        notHelpful: false,
-        replies: []
-      }
-    }
+  // AI目录按需加载：首页、排行榜、详情页等把后端返回的AI合并进来（按ID去重），
+  // 不在启动时下载整个目录
+  const mergeAIs = useCallback((items) => {
+    const incoming = items.filter(Boolean).map(normalizeAI)
+    if (incoming.length === 0) return
+    setAIs((prev) => {
+      const byId = new Map(prev.map((ai) => [ai.id, ai]))
+      incoming.forEach((ai) => byId.set(ai.id, ai))
+      return Array.from(byId.values())
+    })
+  }, [])
 
-    const fetchInitialData = async () => {
+  // 加载指定ID的AI（已加载的跳过），每次请求最多100个
+  const loadAIs = useCallback(async (aiIds) => {
+    const loaded = new Set(aisRef.current.map((ai) => ai.id))
+    const missing = [...new Set(aiIds)].filter((aiId) => aiId && !loaded.has(aiId))
+    for (let i = 0; i < missing.length; i += 100) {
+      const chunk = missing.slice(i, i + 100)
       try {
-        console.log('[AppContext] 开始加载数据...')
-        
-        const [aiRes, commentRes] = await Promise.all([
-          fetch('/api/ais/', { credentials: 'include' }),
-          fetch('/api/comments/', { credentials: 'include' })
-        ])
-
-        console.log('[AppContext] API响应状态:', {
-          ais: { ok: aiRes.ok, status: aiRes.status, statusText: aiRes.statusText },
-          comments: { ok: commentRes.ok, status: commentRes.status, statusText: commentRes.statusText }
-        })
-
-        if (aiRes.ok) {
-          const aiData = await aiRes.json()
-          console.log('[AppContext] 收到AI数据:', {
-            type: typeof aiData,
-            isArray: Array.isArray(aiData),
-            length: Array.isArray(aiData) ? aiData.length : 'N/A',
-            firstItem: Array.isArray(aiData) && aiData.length > 0 ? aiData[0] : null
-          })
-          
-          if (!Array.isArray(aiData)) {
-            console.error('[AppContext] 错误: AI数据不是数组!', aiData)
-            setAIs([])
-          } else {
-            try {
-              const mapped = aiData.map(normalizeAI)
-              console.log('[AppContext] 转换后的AI数据:', {
-                count: mapped.length,
-                firstItem: mapped.length > 0 ? mapped[0] : null,
-                sample: mapped.slice(0, 2)
-              })
-              setAIs(mapped)
-              
-              if (mapped.length === 0) {
-                console.warn('[AppContext] 警告: AI数据数组为空（转换后）')
-              } else {
-                console.log('[AppContext] ✓ 成功加载', mapped.length, '条AI数据')
-              }
-            } catch (error) {
-              console.error('[AppContext] 数据转换错误:', error)
-              console.error('[AppContext] 错误的数据项:', aiData)
-              setAIs([])
-            }
-          }
-        } else {
-          const errorText = await aiRes.text()
-          console.error('[AppContext] AI数据加载失败:', {
-            status: aiRes.status,
-            statusText: aiRes.statusText,
-            error: errorText
-          })
-        }
-
-        if (commentRes.ok) {
-          const commentData = await commentRes.json()
-          console.log('[AppContext] 收到评论数据:', commentData)
-          const mapped = Array.isArray(commentData) ? commentData.map(normalizeComment) : []
-          console.log('[AppContext] 转换后的评论数据:', mapped)
-          setComments(mapped)
-        } else {
-          const errorText = await commentRes.text()
-          console.error('[AppContext] 评论数据加载失败:', {
-            status: commentRes.status,
-            statusText: commentRes.statusText,
-            error: errorText
-          })
-        }
-      } catch (err) {
-        // 详细记录错误信息
-        console.error('[AppContext] 加载初始数据失败:', {
-          error: err,
-          message: err.message,
-          stack: err.stack,
-          name: err.name
-        })
-        // 显示用户友好的错误提示
-        if (err.name === 'TypeError' && err.message.includes('fetch')) {
-          console.error('[AppContext] 网络错误: 无法连接到后端服务器。请确保后端服务正在运行 (python3 manage.py runserver)')
+        const params = new URLSearchParams({ ai_ids: chunk.join(','), limit: chunk.length })
+        const response = await fetch(`/api/ais/?${params}`, { credentials: 'include' })
+        if (response.ok) {
+          const data = await response.json()
+          mergeAIs(data.results || [])
         }
+      } catch (error) {
+        console.error('[AppContext] 加载AI数据失败:', error)
       }
     }
-
-    fetchInitialData()
-  }, [])
+  }, [mergeAIs])
 
   // 初始化时加载用户数据并验证登录状态
   useEffect(() => {
@@ -252,27 +235,14 @@ export function AppProvider({ children }) {
           setFavoriteIds(verifiedUser.favoriteIds)
           setUserActivity(verifiedUser.userActivity)
           
-          // 从后端加载收藏列表
-          try {
-            const favResponse = await apiRequest('/api/favorites/list/', { method: 'GET' })
-            if (favResponse.ok) {
-              const favData = await favResponse.json()
-              if (favData.success && favData.favorite_ids) {
-                verifiedUser.favoriteIds = favData.favorite_ids
-                setFavoriteIds(favData.favorite_ids)
-              }
-            }
-          } catch (error) {
-            // apiRequest会自动处理401跳转，这里只记录其他错误
-            if (error.message !== '未登录，已跳转到登录页') {
-              console.error('加载收藏列表失败:', error)
-            }
-          }
+          // 从后端加载收藏、评分、反应和标签
+          await loadMyState()
         } else {
           // Session无效，清除本地数据
           localStorage.removeItem('rateAI_user')
           setUser(null)
           setFavoriteIds([])
+          setUserRatings({})
           setUserActivity({ ratings: [], comments: [], reactions: {}, tags: {} })
         }
       } catch (error) {
@@ -298,7 +268,7 @@ export function AppProvider({ children }) {
     }
     
     verifyUser()
-  }, [])
+  }, [loadMyState])
 
   // 监听user变化，保存到localStorage（但不包括favoriteIds和userActivity，它们单独保存）
   useEffect(() => {
@@ -442,23 +412,6 @@ export function AppProvider({ children }) {
           }
         }
         
-        // 从后端加载用户的收藏列表
-        try {
-          const favResponse = await apiRequest('/api/favorites/list/', { method: 'GET' })
-          if (favResponse.ok) {
-            const favData = await favResponse.json()
-            if (favData.success && favData.favorite_ids) {
-              userData.favoriteIds = favData.favorite_ids
-              setFavoriteIds(favData.favorite_ids)
-            }
-          }
-        } catch (error) {
-          // apiRequest会自动处理401跳转，这里只记录其他错误
-          if (error.message !== '未登录，已跳转到登录页') {
-            console.error('加载收藏列表失败:', error)
-          }
-        }
-        
         // 尝试从localStorage恢复用户的活动数据
         const storedUser = loadUserFromStorage()
         if (storedUser && storedUser.user_id === userData.user_id) {
@@ -468,6 +421,12 @@ export function AppProvider({ children }) {
           }
         }
         
+        // 从后端加载收藏、评分、反应和标签（覆盖本地恢复的反应和标签）
+        const state = await loadMyState()
+        if (state) {
+          userData.favoriteIds = state.favorites || []
+        }
+        
         setUser(userData)
         return { success: true, user: userData }
       } else {
@@ -496,6 +455,7 @@ export function AppProvider({ children }) {
     } finally {
       setUser(null)
       setFavoriteIds([])
+      setUserRatings({})
       setUserActivity({ ratings: [], comments: [] })
     }
   }
@@ -662,40 +622,8 @@ export function AppProvider({ children }) {
         comments: [{ aiId, commentId: newComment.id, content: payload.content }, ...prev.comments]
       }))
 
-      // 重新加载评论列表，确保获取最新数据
-      try {
-        const commentRes = await fetch('/api/comments/', { credentials: 'include' })
-        if (commentRes.ok) {
-          const commentData = await commentRes.json()
-          const normalizeCommentForList = (c) => {
-            // 如果用户被删除，显示"已删除用户"
-            let author = '已删除用户'
-            if (c.user && c.user.username) {
-              author = c.user.username
-            } else if (c.user_id && !c.user) {
-              author = '已删除用户'
-            }
-            
-            return {
-              id: c.comment_id,
-              aiId: typeof c.ai_id === 'number' ? c.ai_id : (c.ai?.ai_id || parseInt(c.ai_id)),
-              author: author,
-              date: (c.created_at || '').slice(0, 10),
-              rating: null,
-              content: c.content || '',
-              images: c.images || [],
-              upvotes: c.upvotes || 0,
-              helpful: false,
-              notHelpful: false,
-              replies: []
-            }
-          }
-          const mapped = Array.isArray(commentData) ? commentData.map(normalizeCommentForList) : []
-          setComments(mapped)
-        }
-      } catch (error) {
-        console.error('重新加载评论失败:', error)
-      }
+      // 重新加载该AI的第一页评论，确保获取最新数据
+      await refreshComments(aiId)
 
       return { success: true, comment: newComment }
     } catch (error) {
@@ -757,13 +685,15 @@ export function AppProvider({ children }) {
       }
 
       const data = await response.json()
+      if (data.rating) {
+        setUserRatings((prev) => ({ ...prev, [aiId]: data.rating }))
+      }
 
-      // 成功后重新从后端加载AI数据以获取最新的平均分
+      // 成功后重新从后端加载该AI的数据以获取最新的平均分
       try {
-        const aiResponse = await fetch('/api/ais/', { credentials: 'include' })
+        const aiResponse = await fetch(`/api/ais/${aiId}/`, { credentials: 'include' })
         if (aiResponse.ok) {
-          const aiData = await aiResponse.json()
-          const updatedAI = aiData.find(a => a.ai_id === aiId)
+          const updatedAI = await aiResponse.json()
           if (updatedAI) {
             // 辅助函数：安全地将值转换为数字
             const toNumber = (val, defaultValue = 0) => {
@@ -982,12 +912,11 @@ export function AppProvider({ children }) {
       })
       }
 
-      // 重新加载AI数据以获取最新的反应数
+      // 重新加载该AI的数据以获取最新的反应数
       try {
-        const aiResponse = await fetch('/api/ais/', { credentials: 'include' })
+        const aiResponse = await fetch(`/api/ais/${aiId}/`, { credentials: 'include' })
         if (aiResponse.ok) {
-          const aiData = await aiResponse.json()
-          const updatedAI = aiData.find(a => a.ai_id === aiId)
+          const updatedAI = await aiResponse.json()
           if (updatedAI) {
             setAIs((prev) =>
               prev.map((ai) => {
@@ -1024,48 +953,86 @@ export function AppProvider({ children }) {
     }
   }
 
-  // 刷新评论数据
-  const refreshComments = async () => {
+  // 点赞/取消点赞评论，返回最新的点赞状态和点赞数
+  const toggleCommentLike = async (commentId) => {
+    try {
+      const response = await apiRequest(`/api/comments/${commentId}/like/`, {
+        method: 'POST'
+      })
+      const data = await response.json().catch(() => ({}))
+      if (!response.ok) {
+        return { success: false, error: data.error || data.detail || '操作失败' }
+      }
+      return { success: true, liked: data.liked, upvotes: data.upvotes }
+    } catch (error) {
+      // 如果是因为未登录而跳转，不返回错误（用户已经被重定向）
+      if (error.message === '未登录，已跳转到登录页') {
+        return { success: false, error: null }
+      }
+      console.error('点赞失败:', error)
+      return { success: false, error: `网络错误：${error.message || '请重试'}` }
+    }
+  }
+
+  // 加载某个AI的评论（顶层评论分页，每条附带前几条回复）；不传 cursor 时重新加载第一页
+  const refreshComments = async (aiId, cursor = null) => {
+    if (!aiId) return
     try {
-      const commentRes = await fetch('/api/comments/', { credentials: 'include' })
+      const params = new URLSearchParams({ ai_id: aiId, limit: 20 })
+      if (cursor) params.set('cursor', cursor)
+      const commentRes = await fetch(`/api/comments/?${params}`, { credentials: 'include' })
       if (commentRes.ok) {
         const commentData = await commentRes.json()
-        const mapped = Array.isArray(commentData) ? commentData.map((c) => {
-          // 如果用户被删除，显示"已删除用户"
-          let author = '已删除用户'
-          if (c.user && c.user.username) {
-            author = c.user.username
-          } else if (c.user_id && !c.user) {
-            author = '已删除用户'
-          }
-          
-          return {
-            id: c.comment_id,
-            aiId: c.ai_id || (c.ai?.ai_id || (typeof c.ai === 'number' ? c.ai : parseInt(c.ai_id))),
-            author: author,
-            date: (c.created_at || '').slice(0, 10),
-            rating: null,
-            content: c.content || '',
-            images: c.images || [],
-            upvotes: c.upvotes || 0,
-            helpful: false,
-            notHelpful: false,
-            replies: []
-          }
-        }) : []
-        setComments(mapped)
+        const mapped = (commentData.results || []).map(normalizeComment)
+        setComments((prev) => cursor
+          ? [...prev, ...mapped]
+          : [...prev.filter(c => c.aiId !== aiId), ...mapped]
+        )
+        setCommentCursors((prev) => ({ ...prev, [aiId]: commentData.next_cursor }))
       }
     } catch (error) {
       console.error('刷新评论失败:', error)
     }
   }
 
+  // 加载一条评论的回复串（服务端组装好的嵌套回复）：第一页替换列表中的预览回复，
+  // 之后按 cursor 翻页，把新一页的回复按ID合并到已加载的回复串中
+  const loadCommentThread = async (commentId, cursor = null) => {
+    try {
+      const params = cursor ? `?${new URLSearchParams({ cursor })}` : ''
+      const response = await fetch(`/api/comments/${commentId}/thread/${params}`, { credentials: 'include' })
+      if (response.ok) {
+        const data = await response.json()
+        const thread = normalizeComment(data.comment)
+        setComments((prev) => prev.map(c => {
+          if (c.id !== commentId) return c
+          return cursor ? { ...thread, replies: mergeReplies(c.replies || [], thread.replies) } : thread
+        }))
+        setThreadCursors((prev) => ({ ...prev, [commentId]: data.next_cursor || null }))
+      }
+    } catch (error) {
+      console.error('加载回复失败:', error)
+    }
+  }
+
+  // 加载某个AI的下一页评论
+  const loadMoreComments = async (aiId) => {
+    const cursor = commentCursors[aiId]
+    if (cursor) {
+      await refreshComments(aiId, cursor)
+    }
+  }
+
   const value = useMemo(
     () => ({
       ais,
+      mergeAIs,
+      loadAIs,
       comments,
+      commentCursors,
       favoriteIds,
       userActivity,
+      userRatings,
       user,
       toggleFavorite,
       addTag,
@@ -1073,13 +1040,17 @@ export function AppProvider({ children }) {
       addReply,
       submitRating,
       refreshComments,
+      loadMoreComments,
+      loadCommentThread,
+      threadCursors,
+      toggleCommentLike,
       handleReaction,
       register,
       login,
       logout,
       updateUser
     }),
-    [ais, comments, favoriteIds, userActivity, user]
+    [ais, comments, commentCursors, threadCursors, favoriteIds, userActivity, userRatings, user]
   )
 
   return <AppContext.Provider value={value}>{children}</AppContext.Provider>
@@ -7,6 +7,7 @@ import TagInput from '../components/TagInput'
 import ReactionButtons from '../components/ReactionButtons'
 import RatingStars from '../components/RatingStars'
 import RatingTrend from '../components/RatingTrend'
+import RatingDistribution from '../components/RatingDistribution'
 import ReportForm from '../components/ReportForm'
 import { useAppContext } from '../context/AppContext'
 import './AIDetail.css'
@@ -21,64 +22,81 @@ function AIDetail() {
     comments,
     favoriteIds,
     userActivity,
+    userRatings,
     toggleFavorite,
     submitRating,
     addComment,
     addTag,
     handleReaction,
-    refreshComments
+    refreshComments,
+    loadMoreComments,
+    commentCursors,
+    loadAIs
   } = useAppContext()
   const ai = ais.find(a => a.id === parseInt(id))
+  // 直接打开详情页时全局数据中还没有该AI，按ID单独加载
+  const aiMissing = !ai
+  const [aiLoading, setAiLoading] = useState(aiMissing)
+
+  useEffect(() => {
+    if (!aiMissing) {
+      setAiLoading(false)
+      return
+    }
+    setAiLoading(true)
+    loadAIs([parseInt(id)]).finally(() => setAiLoading(false))
+  }, [id, aiMissing, loadAIs])
   const [isFavoriteLocal, setIsFavoriteLocal] = useState(false)
   const [showRatingForm, setShowRatingForm] = useState(false)
   const [showReportForm, setShowReportForm] = useState(false)
   const [shareMessage, setShareMessage] = useState('')
   const [reportMessage, setReportMessage] = useState('')
   const [ratingError, setRatingError] = useState('')
-  const [userRatingFromBackend, setUserRatingFromBackend] = useState(null)
-  
-  const [userReactionFromBackend, setUserReactionFromBackend] = useState(null)
-  
-  // 从后端获取用户的详细评分数据和反应
-  useEffect(() => {
-    const fetchUserData = async () => {
-      if (!ai) return
-      
-      try {
-        // 获取用户评分（未登录时返回null）
-        const ratingResponse = await fetch(`/api/ratings/${ai.id}/`, { credentials: 'include' })
-        if (ratingResponse.ok) {
-          const ratingData = await ratingResponse.json()
-          if (ratingData.success && ratingData.rating) {
-            setUserRatingFromBackend(ratingData.rating)
-          } else {
-            setUserRatingFromBackend(null)
-          }
-        }
-        
-        // 获取用户反应（未登录时返回null）
-        const reactionResponse = await fetch(`/api/reactions/${ai.id}/`, { credentials: 'include' })
-        if (reactionResponse.ok) {
-          const reactionData = await reactionResponse.json()
-          if (reactionData.success) {
-            setUserReactionFromBackend(reactionData.reaction)
-          } else {
-            setUserReactionFromBackend(null)
-          }
-        }
-      } catch (error) {
-        console.error('获取用户数据失败:', error)
+  const [trendData, setTrendData] = useState([])
+  const [distribution, setDistribution] = useState(null)
+
+  // 评分趋势由后端按月汇总表计算（默认最近12个月的总评分）
+  const loadTrend = async () => {
+    try {
+      const response = await fetch(`/api/ais/${id}/trend/`, { credentials: 'include' })
+      if (response.ok) {
+        const data = await response.json()
+        setTrendData(data.trend || [])
       }
+    } catch (error) {
+      console.error('获取评分趋势失败:', error)
     }
-    
-    fetchUserData()
-  }, [ai?.id])
-  
+  }
+
+  // 总评分的分数分布和中位数，后端直接读取0-10分的直方图
+  const loadDistribution = async () => {
+    try {
+      const response = await fetch(`/api/ais/${id}/distribution/?dimension=overall_score`, { credentials: 'include' })
+      if (response.ok) {
+        const data = await response.json()
+        setDistribution({
+          counts: data.distribution?.overall_score,
+          stats: data.stats?.overall_score
+        })
+      }
+    } catch (error) {
+      console.error('获取评分分布失败:', error)
+    }
+  }
+
+  useEffect(() => {
+    setTrendData([])
+    setDistribution(null)
+    loadTrend()
+    loadDistribution()
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [id])
+
   // 检查用户是否已经评分过，并获取之前的评分
   const userRating = user && userActivity.ratings.find(r => r.aiId === ai?.id)
   // 检查是否所有细致分数都有值（不仅仅是overall_score）
-  // 优先使用后端数据，如果没有则使用本地数据
-  const backendRating = userRatingFromBackend
+  // 优先使用登录时从 /api/me/state/ 加载的后端数据，如果没有则使用本地数据
+  const backendRating = (ai && userRatings[ai.id]) || null
   const hasDetailedRatings = backendRating ? (
     (backendRating.versatility_score && backendRating.versatility_score > 0) ||
     (backendRating.image_generation_score && backendRating.image_generation_score > 0) ||
@@ -99,11 +117,11 @@ function AIDetail() {
     // 立即滚动到顶部
     window.scrollTo({ top: 0, behavior: 'instant' })
     
-    // 异步刷新评论数据，不阻塞页面渲染
+    // 异步加载该AI的第一页评论，不阻塞页面渲染
     if (refreshComments) {
       // 延迟执行，确保页面已经渲染完成
       const timer = setTimeout(() => {
-        refreshComments()
+        refreshComments(parseInt(id))
       }, 100)
       
       return () => clearTimeout(timer)
@@ -182,7 +200,7 @@ function AIDetail() {
     return (
       <div className="container">
         <div className="not-found">
-          <h2>AI 未找到</h2>
+          <h2>{aiLoading ? '加载中...' : 'AI 未找到'}</h2>
           <Link to="/">返回首页</Link>
         </div>
       </div>
@@ -226,14 +244,10 @@ function AIDetail() {
               <ReactionButtons 
                 reactions={ai.reactions}
                 aiId={ai.id}
-                userReaction={userReactionFromBackend || userActivity.reactions[ai.id]}
+                userReaction={userActivity.reactions[ai.id]}
                 onReaction={async (type) => {
-                  // 后端会验证登录
-                  const result = await handleReaction(ai.id, type)
-                  if (result && result.success) {
-                    // 更新本地反应状态
-                    setUserReactionFromBackend(result.reaction_type || null)
-                  }
+                  // 后端会验证登录，handleReaction 成功后更新 userActivity.reactions
+                  await handleReaction(ai.id, type)
                 }}
               />
             </div>
@@ -332,20 +346,11 @@ function AIDetail() {
                       setRatingError(result.error)
                       setTimeout(() => setRatingError(''), 3000)
                     } else if (result && result.success) {
+                      // submitRating 已用返回的评分更新 userRatings
                       setShowRatingForm(false)
                       setRatingError('')
-                      // 重新获取用户评分数据
-                      try {
-                        const response = await fetch(`/api/ratings/${ai.id}/`, { credentials: 'include' })
-                        if (response.ok) {
-                          const data = await response.json()
-                          if (data.success && data.rating) {
-                            setUserRatingFromBackend(data.rating)
-                          }
-                        }
-                      } catch (error) {
-                        console.error('重新获取用户评分失败:', error)
-                      }
+                      loadTrend()
+                      loadDistribution()
                     }
                     // 如果result.error为null，说明已跳转，不做任何操作
                   }}
@@ -397,7 +402,15 @@ function AIDetail() {
                 <span className="icon-chip">📈</span>
                 <h2>评分趋势</h2>
               </div>
-              <RatingTrend trendData={ai.ratingTrend} />
+              <RatingTrend trendData={trendData} />
+            </section>
+
+            <section className="rating-distribution-section">
+              <div className="title-with-img">
+                <span className="icon-chip">📊</span>
+                <h2>评分分布</h2>
+              </div>
+              <RatingDistribution counts={distribution?.counts} stats={distribution?.stats} />
             </section>
 
             <section className="tags-section">
@@ -428,6 +441,8 @@ function AIDetail() {
             <CommentSection
               aiId={ai.id}
               comments={aiComments}
+              hasMore={!!commentCursors[ai.id]}
+              onLoadMore={() => loadMoreComments(ai.id)}
               onAddComment={(payload) => addComment(ai.id, payload)}
             />
           </div>
@@ -1,4 +1,4 @@
-import { useMemo, useState } from 'react'
+import { useEffect, useMemo, useState } from 'react'
 import { Filter, ArrowUpAZ, ArrowDownAZ, Sparkles } from 'lucide-react'
 import AICard from '../components/AICard'
 import SearchBar from '../components/SearchBar'
@@ -6,8 +6,18 @@ import FilterPanel from '../components/FilterPanel'
 import { useAppContext } from '../context/AppContext'
 import './Home.css'
 
+// 首页排序选项 -> 后端 sort 参数
+const SORT_PARAMS = {
+  alpha: 'alpha',
+  name: 'alpha',
+  ratingCount: 'rating_count',
+  score: 'score'
+}
+
+const PAGE_SIZE = 20
+
 function Home() {
-  const { ais } = useAppContext()
+  const { ais, mergeAIs } = useAppContext()
   const [searchQuery, setSearchQuery] = useState('')
   const [showFilters, setShowFilters] = useState(false)
   const [filters, setFilters] = useState({
@@ -16,47 +26,74 @@ function Home() {
     sortBy: 'alpha'
   })
 
-  // 调试信息
-  console.log('[Home] 当前AI数据:', {
-    count: ais.length,
-    ais: ais.slice(0, 2), // 只显示前两条用于调试
-    isEmpty: ais.length === 0
-  })
+  // 搜索、筛选和排序都由后端完成（/api/ais/ 的 q、tags、min_score、sort），按页加载
+  const [pageIds, setPageIds] = useState([])
+  const [nextCursor, setNextCursor] = useState(null)
+  const [loading, setLoading] = useState(false)
 
-  const filteredAIs = useMemo(() => {
-    const search = searchQuery.trim().toLowerCase()
-    const matched = ais.filter((ai) => {
-      const matchesSearch =
-        ai.name.toLowerCase().includes(search) ||
-        ai.developer?.toLowerCase().includes(search) ||
-        ai.tags.some((tag) => {
-          const tagName = typeof tag === 'string' ? tag : (tag.tag_name || tag.name || String(tag))
-          return tagName.toLowerCase().includes(search)
-        })
-
-      const matchesTags =
-        filters.tags.length === 0 || filters.tags.some((filterTag) => 
-          ai.tags.some((tag) => {
-            const tagName = typeof tag === 'string' ? tag : (tag.tag_name || tag.name || String(tag))
-            return tagName === filterTag
-          })
-        )
-
-      const matchesScore = ai.averageScore >= filters.minScore
-
-      return matchesSearch && matchesTags && matchesScore
-    })
-
-    return matched.sort((a, b) => {
-      if (filters.sortBy === 'alpha') {
-      return a.name.localeCompare(b.name)
-      }
-      if (filters.sortBy === 'ratingCount') {
-        return b.ratingCount - a.ratingCount
+  const queryParams = useMemo(() => {
+    const params = new URLSearchParams({ sort: SORT_PARAMS[filters.sortBy] || 'id', limit: PAGE_SIZE })
+    const search = searchQuery.trim()
+    if (search) params.set('q', search)
+    if (filters.tags.length > 0) params.set('tags', filters.tags.join(','))
+    if (filters.minScore > 0) params.set('min_score', filters.minScore)
+    return params.toString()
+  }, [filters.minScore, filters.sortBy, filters.tags, searchQuery])
+
+  const fetchPage = async (cursor) => {
+    const params = new URLSearchParams(queryParams)
+    if (cursor) params.set('cursor', cursor)
+    const response = await fetch(`/api/ais/?${params}`, { credentials: 'include' })
+    if (!response.ok) {
+      throw new Error(`加载AI列表失败 (状态码: ${response.status})`)
+    }
+    const data = await response.json()
+    mergeAIs(data.results)
+    return { ids: data.results.map((ai) => ai.ai_id), cursor: data.next_cursor }
+  }
+
+  // 条件变化时重新加载第一页；输入停顿后再请求，避免每个字符都发起搜索
+  useEffect(() => {
+    let cancelled = false
+    const timer = setTimeout(async () => {
+      setLoading(true)
+      try {
+        const page = await fetchPage(null)
+        if (!cancelled) {
+          setPageIds(page.ids)
+          setNextCursor(page.cursor)
+        }
+      } catch (error) {
+        console.error('[Home] 加载AI列表失败:', error)
+      } finally {
+        if (!cancelled) setLoading(false)
       }
-      return 0
-    })
-  }, [ais, filters.minScore, filters.sortBy, filters.tags, searchQuery])
+    }, 250)
+    return () => {
+      cancelled = true
+      clearTimeout(timer)
+    }
+  }, [queryParams])
+
+  const loadMore = async () => {
+    if (!nextCursor || loading) return
+    setLoading(true)
+    try {
+      const page = await fetchPage(nextCursor)
+      setPageIds((prev) => [...prev, ...page.ids.filter((id) => !prev.includes(id))])
+      setNextCursor(page.cursor)
+    } catch (error) {
+      console.error('[Home] 加载更多AI失败:', error)
+    } finally {
+      setLoading(false)
+    }
+  }
+
+  // 展示数据取自全局的AI数据，评分、收藏等操作的更新会同步到卡片上
+  const filteredAIs = useMemo(() => {
+    const aisById = new Map(ais.map((ai) => [ai.id, ai]))
+    return pageIds.map((id) => aisById.get(id)).filter(Boolean)
+  }, [ais, pageIds])
 
   return (
     <div className="home">
@@ -77,7 +114,7 @@ function Home() {
           <SearchBar
             value={searchQuery}
             onChange={setSearchQuery}
-            placeholder="搜索 AI 名称、标签或开发商..."
+            placeholder="搜索 AI 名称、标签、开发商或简介..."
           />
           <div className="search-actions">
             <button 
@@ -115,7 +152,15 @@ function Home() {
           ))}
         </div>
 
-        {filteredAIs.length === 0 && (
+        {nextCursor && (
+          <div className="load-more">
+            <button className="filter-toggle" onClick={loadMore} disabled={loading}>
+              {loading ? '加载中...' : '加载更多'}
+            </button>
+          </div>
+        )}
+
+        {filteredAIs.length === 0 && !loading && (
           <div className="empty-state">
             <p>没有找到匹配的 AI</p>
           </div>
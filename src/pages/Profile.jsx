@@ -7,7 +7,7 @@ import './Profile.css'
 
 function Profile() {
   const navigate = useNavigate()
-  const { user, ais, favoriteIds, comments, userActivity, updateUser } = useAppContext()
+  const { user, ais, loadAIs, favoriteIds, comments, userActivity, updateUser } = useAppContext()
   const [activeTab, setActiveTab] = useState('favorites')
   const [settingsData, setSettingsData] = useState({
     username: '',
@@ -86,6 +86,15 @@ function Profile() {
   )
   const findAIName = (aiId) => ais.find(ai => ai.id === aiId)?.name || '未知 AI'
 
+  // 按ID加载收藏、评分和评论涉及的AI（全局数据中只有浏览过的AI）
+  useEffect(() => {
+    loadAIs([
+      ...favoriteIds,
+      ...userActivity.ratings.map(rating => rating.aiId),
+      ...myComments.map(comment => comment.aiId)
+    ])
+  }, [favoriteIds, userActivity.ratings, myComments, loadAIs])
+
   // 如果未登录，不渲染内容
   if (!user) {
     return null
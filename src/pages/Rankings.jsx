@@ -13,7 +13,7 @@ const RANKING_TYPES = [
 ]
 
 function Rankings() {
-  const { ais } = useAppContext()
+  const { ais, mergeAIs } = useAppContext()
   const [selectedType, setSelectedType] = useState('overall')
 
   // 进入排行榜页面时滚动到顶部
@@ -21,25 +21,33 @@ function Rankings() {
     window.scrollTo(0, 0)
   }, [selectedType])
 
-  const getRankedAIs = () => {
-    const sorted = [...ais]
-    const valueScore = (ai) => ai.ratings.valueForMoney / (ai.price.includes('免费') ? 1 : 5)
-    
-    switch (selectedType) {
-      case 'overall':
-        return sorted.sort((a, b) => b.averageScore - a.averageScore)
-      case 'students':
-        return sorted.sort((a, b) => b.ratings.studyAssistance - a.ratings.studyAssistance)
-      case 'value':
-        return sorted.sort((a, b) => valueScore(b) - valueScore(a))
-      case 'image':
-        return sorted.sort((a, b) => b.ratings.imageGeneration - a.ratings.imageGeneration)
-      default:
-        return sorted
+  // 排名由后端计算，榜单返回的AI数据合并到全局数据中，展示时按名次顺序取用
+  const [rankedIds, setRankedIds] = useState([])
+
+  useEffect(() => {
+    let cancelled = false
+    const fetchRanking = async () => {
+      try {
+        const response = await fetch(`/api/rankings/${selectedType}/?limit=100`, { credentials: 'include' })
+        if (!response.ok) return
+        const data = await response.json()
+        if (!cancelled) {
+          const results = data.results || []
+          mergeAIs(results.map((entry) => entry.ai))
+          setRankedIds(results.map((entry) => entry.ai_id))
+        }
+      } catch (error) {
+        console.error('[Rankings] 加载排行榜失败:', error)
+      }
+    }
+    fetchRanking()
+    return () => {
+      cancelled = true
     }
-  }
+  }, [selectedType, mergeAIs])
 
-  const rankedAIs = getRankedAIs()
+  const aisById = new Map(ais.map((ai) => [ai.id, ai]))
+  const rankedAIs = rankedIds.map((id) => aisById.get(id)).filter(Boolean)
 
   return (
     <div className="rankings">